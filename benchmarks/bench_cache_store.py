@@ -0,0 +1,91 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Fill, reopen and query the http cache with each of its stores
+
+Run from the top of the source tree::
+
+    python -m benchmarks.bench_cache_store [count ...]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from pymaven.client import CACHE_STORES
+from pymaven.client import Cache
+
+BODY = b"<metadata>%s</metadata>" % (b"x" * 512)
+
+
+class Response(object):
+    status_code = 200
+    reason = "OK"
+    headers = {}
+
+    def iter_content(self, size):
+        yield BODY
+
+
+def uris(count):
+    return ["http://repo.example.com/maven2/org/example/a%d/%d.0/a%d-%d.0.pom"
+            % (i % 997, i, i % 997, i) for i in range(count)]
+
+
+def run(store, count):
+    cache_dir = tempfile.mkdtemp(prefix="bench-cache-")
+    try:
+        names = uris(count)
+        cache = Cache(cache_dir, store=store)
+        start = time.time()
+        for uri in names:
+            cache.cache(Response(), "GET", uri)
+        fill = time.time() - start
+        cache.close()
+
+        start = time.time()
+        cache = Cache(cache_dir, store=store)
+        load = time.time() - start
+
+        lookups = random.Random(0).sample(names, min(count, 10000))
+        start = time.time()
+        for uri in lookups:
+            with cache.get("GET", uri) as fh:
+                fh.read()
+        get = (time.time() - start) / len(lookups)
+        cache.close()
+
+        print("%-8s %7d entries %6d files  fill %7.2f s  open %6.3f s"
+              "  get %6.1f us" % (store, count, len(os.listdir(cache_dir)),
+                                  fill, load, get * 1e6))
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def main(argv):
+    counts = [int(a) for a in argv[1:]] or [10000, 100000]
+    for count in counts:
+        for store in sorted(CACHE_STORES):
+            run(store, count)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,78 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Measure the cost of checksum verification when downloading artifacts
+
+Run from the top of the source tree::
+
+    python -m benchmarks.bench_checksum [count] [size in KiB]
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from pymaven.client import MavenClient
+from tests.test_client import MavenServer
+
+
+def files(count, size):
+    files = {}
+    for i in range(count):
+        body = os.urandom(size)
+        path = "/repo/foo/bar/%d/bar-%d.jar" % (i, i)
+        files[path] = body
+        files[path + ".sha1"] = hashlib.sha1(body).hexdigest().encode()
+    return files
+
+
+def bench(server, count, verify, cached):
+    cache_dir = tempfile.mkdtemp(prefix="bench-checksum-")
+    try:
+        client = MavenClient(server.url + "/repo", verify=verify,
+                             cache_dir=cache_dir)
+        if cached:
+            for i in range(count):
+                client.get_artifact("foo:bar:%d" % i)
+        start = time.time()
+        for i in range(count):
+            client.get_artifact("foo:bar:%d" % i)
+        elapsed = time.time() - start
+        client.close()
+        return elapsed / count * 1000
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 100
+    size = int(argv[2]) if len(argv) > 2 else 1024
+    with MavenServer(files(count, size * 1024)) as server:
+        for cached in (False, True):
+            for verify in (False, True):
+                latency = bench(server, count, verify, cached)
+                print("%-6s verify=%-5s %4d x %5d KiB %8.3f ms/artifact"
+                      % ("cached" if cached else "cold", verify, count, size,
+                         latency))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,59 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Compare one connection per request against a pooled keep-alive session
+
+Run from the top of the source tree::
+
+    python -m benchmarks.bench_http_session [requests]
+"""
+
+import sys
+import time
+
+import requests
+
+from pymaven.client import new_session
+from tests.test_client import MavenServer
+
+
+def bench(request, server, count):
+    server.connections = 0
+    start = time.time()
+    for i in range(count):
+        request("HEAD", "%s/repo/foo/bar/%d/bar-%d.pom" % (server.url, i, i))
+    elapsed = time.time() - start
+    return server.connections, elapsed / count * 1000
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 1000
+    files = dict(("/repo/foo/bar/%d/bar-%d.pom" % (i, i), b"<project/>")
+                 for i in range(count))
+    with MavenServer(files) as server:
+        for name, request in (
+                ("requests.request", requests.request),
+                ("pooled session", new_session().request),
+                ):
+            connections, latency = bench(request, server, count)
+            print("%-18s %6d requests %6d connections %8.3f ms/request"
+                  % (name, count, connections, latency))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
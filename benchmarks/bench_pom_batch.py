@@ -0,0 +1,115 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Compare loading poms one at a time against pymaven.batch.PomBatch
+
+Run from the top of the source tree::
+
+    python -m benchmarks.bench_pom_batch [poms] [workers ...]
+"""
+
+import multiprocessing
+import sys
+import time
+
+from pymaven.batch import PomBatch
+from pymaven.pom import POM_CACHE
+from pymaven.pom import EffectiveModel
+from pymaven.pom import Pom
+
+
+PARENT = """\
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <groupId>com.test</groupId>
+  <artifactId>parent</artifactId>
+  <version>1</version>
+  <properties><dep.version>2.0</dep.version></properties>
+</project>
+"""
+
+CHILD = """\
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <parent>
+    <groupId>com.test</groupId>
+    <artifactId>parent</artifactId>
+    <version>1</version>
+  </parent>
+  <artifactId>child%d</artifactId>
+  <properties><own.version>1.%d</own.version></properties>
+  <dependencies>
+%s  </dependencies>
+  <build><plugins>%s</plugins></build>
+</project>
+"""
+
+DEPENDENCY = """\
+    <dependency>
+      <groupId>com.test</groupId>
+      <artifactId>dep%d</artifactId>
+      <version>${dep.version}</version>
+    </dependency>
+"""
+
+PLUGIN = "<plugin><artifactId>plugin%d</artifactId></plugin>"
+
+
+def documents(count):
+    items = [("com.test:parent:1", PARENT)]
+    for i in range(count):
+        items.append((
+            "com.test:child%d:1" % i,
+            CHILD % (i, i, "".join(DEPENDENCY % d for d in range(20)),
+                     "".join(PLUGIN % p for p in range(20)))))
+    return items
+
+
+def serial(items):
+    """Parse and resolve every document in this process"""
+    poms = [Pom.fromstring(coordinate, text) for coordinate, text in items]
+    parent = poms[0]
+    for pom in poms[1:]:
+        # what Pom.fromcache would return for the parent
+        pom._parent = parent
+    return [EffectiveModel.frompom(pom) for pom in poms]
+
+
+def batch(items, workers):
+    pom_batch = PomBatch(workers=workers)
+    pom_batch.add(items)
+    return list(pom_batch.models())
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 5000
+    workers = [int(w) for w in argv[2:]] or sorted(set(
+        [0, 1, 2, multiprocessing.cpu_count()]))
+    items = documents(count)
+    runs = [("serial", lambda: serial(items))]
+    for w in workers:
+        runs.append(("batch %d" % w, lambda w=w: batch(items, w)))
+    for label, run in runs:
+        POM_CACHE.clear()
+        start = time.time()
+        models = run()
+        elapsed = time.time() - start
+        print("%-9s %6d poms %8.0f poms/s"
+              % (label, len(models), len(models) / elapsed))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
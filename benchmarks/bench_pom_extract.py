@@ -0,0 +1,84 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Compare the cost per dependency of extracting a pom with the path helpers
+that built their paths on every call against the memoized ones
+
+Run from the top of the source tree::
+
+    python -m benchmarks.bench_pom_extract [dependencies]
+"""
+
+from io import BytesIO
+import sys
+import time
+
+from pymaven.pom import POM
+from pymaven.pom import RawPom
+from pymaven.pom import parse_pom
+
+from .bench_pom_parse import document
+
+
+def _findall(elem, tag):
+    tag = tag.replace("/", "/" + POM)
+    return elem.findall(POM + tag)
+
+
+def _findtext(elem, tag):
+    tag = tag.replace("/", "/" + POM)
+    return elem.findtext(POM + tag)
+
+
+def rebuilt(root):
+    """The dependency management extraction before the paths were cached"""
+    dependencies = []
+    for elem in _findall(root, "dependencyManagement/dependencies/dependency"):
+        dependencies.append((_findtext(elem, "groupId"),
+                             _findtext(elem, "artifactId"),
+                             _findtext(elem, "version"),
+                             _findtext(elem, "scope"),
+                             _findtext(elem, "optional")))
+    return dependencies
+
+
+def cached(root):
+    return RawPom.fromelement("com.test:bom:1", root).dependency_management[0]
+
+
+def main(argv):
+    dependencies = int(argv[1]) if len(argv) > 1 else 2000
+    data = document(dependencies, 0)
+    for label, namespace in (("pom", True), ("old pom", False)):
+        if not namespace:
+            data = data.replace(
+                b' xmlns="http://maven.apache.org/POM/4.0.0"', b"")
+        root = parse_pom(BytesIO(data))
+        for name, extract in (("rebuilt", rebuilt), ("cached", cached)):
+            rounds = 20
+            start = time.time()
+            for _ in range(rounds):
+                found = extract(root)
+            elapsed = (time.time() - start) / rounds
+            print("%-7s %-7s %5d dependencies found %6.2f us/dependency"
+                  % (label, name, len(found),
+                     elapsed / dependencies * 1000000))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
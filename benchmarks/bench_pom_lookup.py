@@ -0,0 +1,70 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Count the requests needed to load a pom with HEAD probes and GET-first
+
+Run from the top of the source tree::
+
+    python -m benchmarks.bench_pom_lookup [poms]
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+
+from pymaven.client import MavenClient
+from tests.test_client import MavenServer
+
+
+POM = b"""\
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <groupId>foo</groupId><artifactId>bar</artifactId><version>%d</version>
+</project>
+"""
+
+
+def bench(server, count, workers):
+    cache_dir = tempfile.mkdtemp(prefix="bench-pom-lookup-")
+    try:
+        client = MavenClient(server.url + "/repo", workers=workers,
+                             cache_dir=cache_dir)
+        del server.requests[:]
+        start = time.time()
+        for i in range(count):
+            client.get_metadata("foo:bar:%d" % i).pom_data
+        elapsed = time.time() - start
+        client.close()
+        return len(server.requests) / float(count), elapsed / count * 1000
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 500
+    files = dict(("/repo/foo/bar/%d/bar-%d.pom" % (i, i), POM % i)
+                 for i in range(count))
+    with MavenServer(files) as server:
+        for name, workers in (("HEAD probes", 1), ("GET-first", None)):
+            requests, latency = bench(server, count, workers)
+            print("%-12s %6d poms %5.2f requests/pom %8.3f ms/pom"
+                  % (name, count, requests, latency))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,129 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Compare extracting raw poms from parsed documents against RawPom.parse,
+which extracts them in a single streaming pass
+
+Each measurement runs in its own process so its peak memory can be told
+apart.
+
+Run from the top of the source tree::
+
+    python -m benchmarks.bench_pom_parse [dependencies] [plugins]
+"""
+
+from io import BytesIO
+import multiprocessing
+import resource
+import sys
+import time
+
+from pymaven.pom import RawPom
+from pymaven.pom import parse_pom
+
+
+DEPENDENCY = """\
+      <dependency>
+        <groupId>com.test</groupId>
+        <artifactId>dep%d</artifactId>
+        <version>${dep.version}</version>
+        <exclusions>
+          <exclusion><groupId>*</groupId><artifactId>*</artifactId></exclusion>
+        </exclusions>
+      </dependency>
+"""
+
+PLUGIN = """\
+      <plugin>
+        <groupId>org.apache.maven.plugins</groupId>
+        <artifactId>plugin%d</artifactId>
+        <version>1.0</version>
+        <executions>
+          <execution>
+            <id>default</id>
+            <phase>package</phase>
+            <goals><goal>run</goal></goals>
+            <configuration>
+              <target><echo message="step %d"/><copy todir="out"/></target>
+            </configuration>
+          </execution>
+        </executions>
+      </plugin>
+"""
+
+
+def document(dependencies, plugins):
+    return ("""\
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <modelVersion>4.0.0</modelVersion>
+  <groupId>com.test</groupId>
+  <artifactId>bom</artifactId>
+  <version>1</version>
+  <dependencyManagement>
+    <dependencies>
+%s    </dependencies>
+  </dependencyManagement>
+  <build>
+    <plugins>
+%s    </plugins>
+  </build>
+</project>
+""" % ("".join(DEPENDENCY % i for i in range(dependencies)),
+       "".join(PLUGIN % (i, i) for i in range(plugins)))).encode("utf-8")
+
+
+def tree(fh):
+    return RawPom.fromelement("com.test:bom:1", parse_pom(fh))
+
+
+def stream(fh):
+    return RawPom.parse("com.test:bom:1", fh)
+
+
+def bench(parse, data, rounds, queue):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    for _ in range(rounds):
+        raw = parse(BytesIO(data))
+    elapsed = time.time() - start
+    # ru_maxrss is in KiB on linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    queue.put((len(raw.dependency_management[0]), elapsed / rounds * 1000,
+               peak // 1024))
+
+
+def main(argv):
+    dependencies = int(argv[1]) if len(argv) > 1 else 2000
+    plugins = int(argv[2]) if len(argv) > 2 else 2000
+    for name, data in (
+            ("bom", document(dependencies, 0)),
+            ("build", document(10, plugins)),
+            ):
+        for label, parse in (("tree", tree), ("stream", stream)):
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=bench, args=(parse, data, 20, queue))
+            process.start()
+            found, latency, peak = queue.get()
+            process.join()
+            print("%-6s %-7s %7d KiB %7d managed %8.3f ms/pom %5d MiB peak"
+                  % (name, label, len(data) // 1024, found, latency, peak))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
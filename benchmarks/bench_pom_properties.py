@@ -0,0 +1,76 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Compare the regular expression loop Pom used to expand properties against
+pymaven.pom.PropertyInterpolator
+
+Run from the top of the source tree::
+
+    python -m benchmarks.bench_pom_properties [properties] [depth]
+"""
+
+import re
+import sys
+import time
+
+from pymaven.pom import PropertyInterpolator
+
+
+PROPERTY_RE = re.compile(r'\$\{(.*?)\}')
+
+
+def regex(properties, texts):
+    """The expansion of Pom._replace_properties before the interpolator"""
+    def subfunc(matchobj):
+        return properties.get(matchobj.group(1))
+
+    for text in texts:
+        result = PROPERTY_RE.sub(subfunc, text)
+        while result and PROPERTY_RE.match(result):
+            result = PROPERTY_RE.sub(subfunc, result)
+
+
+def interpolator(properties, texts):
+    interpolate = PropertyInterpolator(properties).interpolate
+    for text in texts:
+        interpolate(text)
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 500
+    depth = int(argv[2]) if len(argv) > 2 else 4
+    # chains of *depth* properties, each referring to the next
+    properties = {}
+    for i in range(count):
+        for d in range(depth - 1):
+            properties["p%d.%d" % (i, d)] = "${p%d.%d}" % (i, d + 1)
+        properties["p%d.%d" % (i, depth - 1)] = "%d.0" % i
+    # one lookup per dependency version, as Pom._find_deps does
+    texts = ["${p%d.0}" % i for i in range(count)] * 4
+    for label, expand in (("regex", regex), ("interpolator", interpolator)):
+        rounds = 20
+        start = time.time()
+        for _ in range(rounds):
+            expand(properties, texts)
+        elapsed = (time.time() - start) / rounds
+        print("%-12s %5d properties depth %d %8.3f ms/pom"
+              % (label, len(properties), depth, elapsed * 1000))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,89 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Sort version strings with Version's sort key and with the item-by-item
+maven comparison it replaces
+
+Run from the top of the source tree::
+
+    python -m benchmarks.bench_version_sort [count]
+"""
+
+import functools
+import operator
+import random
+import sys
+import time
+
+from pymaven.versioning import Version
+
+QUALIFIERS = ("-SNAPSHOT", "-alpha-1", "-beta2", ".M3", ".RC1", "-rc-2",
+              ".RELEASE", ".Final", "-jre", "-android", "-incubating",
+              "-20150521.051651-3")
+
+
+def version_strings(count, seed=0):
+    """Return *count* version strings shaped like those on maven central"""
+    rng = random.Random(seed)
+    versions = []
+    for _ in range(count):
+        version = ".".join(str(rng.randint(0, 30))
+                           for _ in range(rng.randint(1, 4)))
+        if rng.random() < 0.4:
+            version += rng.choice(QUALIFIERS)
+        versions.append(version)
+    return versions
+
+
+def _legacy_compare(v1, v2):
+    return v1._compare(v1._parsed, v2._parsed)
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 100000
+    strings = version_strings(count)
+
+    start = time.time()
+    versions = [Version(s) for s in strings]
+    print("parse          %8.3f s" % (time.time() - start))
+
+    start = time.time()
+    sorted(versions, key=operator.attrgetter("_key"))
+    print("sort key       %8.3f s" % (time.time() - start))
+
+    start = time.time()
+    sorted(versions)
+    print("sort __lt__    %8.3f s" % (time.time() - start))
+
+    start = time.time()
+    sorted(versions, key=functools.cmp_to_key(_legacy_compare))
+    print("item compare   %8.3f s" % (time.time() - start))
+
+    # the item comparison is not transitive for some qualifiers, so compare
+    # pairs instead of the two sorted lists
+    rng = random.Random(1)
+    pairs = [(rng.choice(versions), rng.choice(versions))
+             for _ in range(count)]
+    agree = sum(1 for v1, v2 in pairs
+                if (_legacy_compare(v1, v2) > 0) == (v1._key > v2._key)
+                and (_legacy_compare(v1, v2) < 0) == (v1._key < v2._key))
+    print("pairs agreeing %8.2f %%" % (100.0 * agree / count))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
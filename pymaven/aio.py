@@ -0,0 +1,485 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Asyncio access to maven repositories
+
+Requires aiohttp, available with the ``async`` extra::
+
+    pip install pymaven[async]
+"""
+
+from concurrent import futures
+import asyncio
+import io
+import logging
+import time
+
+from six.moves.urllib.parse import urlparse
+import aiohttp
+
+from . import utils
+from .artifact import Artifact
+from .client import DEFAULT_CHUNK_SIZE
+from .client import DEFAULT_METADATA_TTL
+from .client import DEFAULT_NEGATIVE_TTL
+from .client import MISSING_STATUS_CODES
+from .client import Cache
+from .client import LocalRepository
+from .client import NegativeCache
+from .client import cache_ttl
+from .client import matching_artifacts
+from .client import parse_metadata_versions
+from .errors import MissingArtifactError
+from .errors import MissingPathError
+from .pom import POM_CACHE
+from .pom import Pom
+
+log = logging.getLogger(__name__)
+
+# connection limits of an AsyncMavenClient
+DEFAULT_LIMIT = 100
+DEFAULT_LIMIT_PER_HOST = 10
+
+
+async def _in_thread(executor, func, *args):
+    """Run the blocking *func*, a cache or disk access, in a worker thread of
+    *executor*, the default executor of the loop if ``None``
+    """
+    return await asyncio.get_event_loop().run_in_executor(executor, func,
+                                                          *args)
+
+
+class _Response(object):
+    """A failed aiohttp response, read whole"""
+    def __init__(self, status_code, reason, headers, body):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self._body = body
+
+
+class _StreamedResponse(object):
+    """An aiohttp response in the shape :py:class:`Cache` expects
+
+    The cache consumes :py:meth:`iter_content` in a worker thread, each chunk
+    is read on the event loop, so neither the download nor the writes block
+    the loop and the body is never held in memory whole.
+    """
+    def __init__(self, res, loop):
+        self.status_code = res.status
+        self.reason = res.reason
+        self.headers = res.headers
+        self._res = res
+        self._loop = loop
+
+    def iter_content(self, size=None):
+        chunks = self._res.content.iter_chunked(size or DEFAULT_CHUNK_SIZE)
+        while True:
+            future = asyncio.run_coroutine_threadsafe(chunks.__anext__(),
+                                                      self._loop)
+            try:
+                chunk = future.result()
+            except StopAsyncIteration:
+                return
+            yield chunk
+
+
+class AsyncHttpRepository(object):
+    """Access a maven repository via http from asyncio
+
+    Behaves like :py:class:`pymaven.client.HttpRepository`, and can share its
+    response and negative caches with one, but requests are made with an
+    :py:class:`aiohttp.ClientSession`. Cache accesses run in *executor*, each
+    download being written by one of its threads.
+    """
+    def __init__(self, url, session, username=None, password=None,
+                 timeout=None, cache=None, metadata_ttl=DEFAULT_METADATA_TTL,
+                 negative_cache=None, executor=None):
+        if cache is None:
+            cache = Cache()
+        if negative_cache is None:
+            negative_cache = NegativeCache()
+        self._url = url
+        self._session = session
+        self._auth = None
+        if username is not None:
+            self._auth = aiohttp.BasicAuth(username, password or "")
+        self._timeout = None
+        if timeout is not None:
+            self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._cache = cache
+        self._metadata_ttl = metadata_ttl
+        self._negative_cache = negative_cache
+        self._executor = executor
+
+    def __repr__(self):
+        return "<%s.AsyncHttpRepository(%r)>" % (self.__module__, self._url)
+
+    async def _in_thread(self, func, *args):
+        return await _in_thread(self._executor, func, *args)
+
+    async def _send(self, method, url, headers=None):
+        """Request *url*, streaming a successful response into the cache
+
+        :return: the cached response, or the failed response
+        """
+        log.debug("requesting %s %s", method, url)
+        kwargs = {}
+        if self._auth is not None:
+            kwargs["auth"] = self._auth
+        if self._timeout is not None:
+            kwargs["timeout"] = self._timeout
+        async with self._session.request(method, url, headers=headers,
+                                         **kwargs) as res:
+            if res.status == 200:
+                return await self._in_thread(
+                    self._cache.cache,
+                    _StreamedResponse(res, asyncio.get_event_loop()),
+                    method, url)
+            body = await res.read()
+            return _Response(res.status, res.reason, res.headers, body)
+
+    async def _revalidate(self, res, method, url):
+        headers = {}
+        if res.etag:
+            headers["If-None-Match"] = res.etag
+        if res.last_modified:
+            headers["If-Modified-Since"] = res.last_modified
+        try:
+            fresh = await self._send(method, url, headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.warning("unable to revalidate %s, using the cached copy: %r",
+                        url, e)
+            return res
+        if fresh.status_code == 304:
+            return await self._in_thread(self._cache.refresh, fresh, method,
+                                         url)
+        if fresh.status_code == 200:
+            return fresh
+        if fresh.status_code in MISSING_STATUS_CODES:
+            await self._in_thread(self._cache.invalidate, method, url)
+            return self._miss(fresh, url)
+        log.warning("unable to revalidate %s, using the cached copy: %s %s",
+                    url, fresh.status_code, fresh.reason)
+        return res
+
+    def _miss(self, res, url):
+        if res.status_code in MISSING_STATUS_CODES:
+            self._negative_cache.add(url)
+        return res
+
+    async def _request(self, method, uri):
+        """Return the cached response for *uri*, requesting it if needed
+
+        :raises: :py:exc:`pymaven.errors.MissingPathError` if the request
+                 fails
+        """
+        url = utils.urljoin(self._url, uri)
+        if url in self._negative_cache:
+            raise MissingPathError(uri)
+        res = await self._in_thread(self._cache.get, method, url)
+        if res is not None:
+            ttl = cache_ttl(uri, self._metadata_ttl)
+            if ttl is not None and time.time() - res.fetched > ttl:
+                res = await self._revalidate(res, method, url)
+        if res is None:
+            res = await self._send(method, url)
+            if res.status_code != 200:
+                res = self._miss(res, url)
+        if res.status_code != 200:
+            raise MissingPathError(uri)
+        return res
+
+    async def exists(self, path):
+        """Return ``True`` if *path* exists in the repository"""
+        try:
+            await self._request("HEAD", path)
+        except (MissingPathError, aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+        return True
+
+    async def listdir(self, path):
+        """List the versions in the ``maven-metadata.xml`` of *path*
+
+        :raises: MissingPathError if *path* does not exist
+        """
+        try:
+            res = await self._request("GET", path + "/maven-metadata.xml")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            raise MissingPathError(path)
+        return await self._in_thread(self._read_versions, res)
+
+    @staticmethod
+    def _read_versions(res):
+        with res as fh:
+            return parse_metadata_versions(fh)
+
+    async def open(self, path):
+        """Return the cached response for *path*, a context manager that
+        opens the body
+
+        :raises: MissingPathError if *path* does not exist
+        """
+        try:
+            return await self._request("GET", path)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            raise MissingPathError("No such file: %s" % path)
+
+    async def get_versions(self, coordinate):
+        query = Artifact(coordinate)
+        if await self.exists(query.path):
+            if query.version and query.version.version:
+                return [Artifact(coordinate)]
+            return matching_artifacts(query, await self.listdir(query.path))
+
+
+class AsyncLocalRepository(object):
+    """Coroutine interface to a :py:class:`pymaven.client.LocalRepository`
+
+    Disk accesses run in *executor*, so a slow or network file system does
+    not stall the event loop.
+    """
+    def __init__(self, path, executor=None):
+        self._repo = LocalRepository(path)
+        self._executor = executor
+
+    def __repr__(self):
+        return "<%s.AsyncLocalRepository(%r)>" % (self.__module__,
+                                                  self._repo._url)
+
+    async def exists(self, path):
+        return await _in_thread(self._executor, self._repo.exists, path)
+
+    async def listdir(self, path):
+        return await _in_thread(self._executor, self._repo.listdir, path)
+
+    async def open(self, path):
+        return await _in_thread(self._executor, self._repo.open, path)
+
+    async def get_versions(self, coordinate):
+        return await _in_thread(self._executor, self._repo.get_versions,
+                                coordinate)
+
+
+class _Unfetched(Exception):
+    """Raised by :py:class:`_PomLoader` for poms that were not fetched yet"""
+    def __init__(self, path):
+        super(_Unfetched, self).__init__(path)
+        self.path = path
+
+
+class _PomLoader(object):
+    """Serve poms fetched by an :py:class:`AsyncMavenClient` to
+    :py:class:`pymaven.pom.Pom`, which expects a blocking client
+    """
+    def __init__(self):
+        self._bodies = utils.LRUCache(1024)
+
+    def add(self, path, body):
+        """Record the pom at *path*, ``None`` if it does not exist"""
+        self._bodies.invalidate(path)
+        self._bodies.get_or_create(path, lambda: body)
+
+    def forget_snapshots(self):
+        """Drop the snapshot poms, so they are fetched again"""
+        self._bodies.invalidate_if(lambda path: "-SNAPSHOT" in path)
+
+    def get_artifact(self, coordinate):
+        query = Artifact(coordinate)
+        if query.path not in self._bodies:
+            raise _Unfetched(query.path)
+        body = self._bodies.get(query.path)
+        if body is None:
+            # look again next time, the negative cache prevents a storm
+            self._bodies.invalidate(query.path)
+            raise MissingArtifactError(coordinate)
+        query.contents = io.BytesIO(body)
+        return query
+
+
+class AsyncMavenClient(object):
+    """Asyncio client for maven repositories
+
+    Offers the lookups of :py:class:`pymaven.client.MavenClient` as
+    coroutines. All repositories are probed at once, lookups prefer the first
+    repository in order that has the requested file.
+
+    Http repositories share one :py:class:`aiohttp.ClientSession` that keeps
+    at most *limit* connections open, *limit_per_host* of them to the same
+    host. The *timeout*, *metadata_ttl*, *negative_ttl*,
+    *negative_cache_path*, *chunk_size* and ``cache_*`` keyword arguments are
+    those of :py:class:`pymaven.client.MavenClient`. Responses are streamed
+    into the cache by a worker thread, so large artifacts neither stall the
+    event loop nor are held in memory. Cache and disk accesses run in a pool
+    of *limit* threads owned by the client, so every connection can write
+    its download at once.
+
+    The client must be closed with :py:meth:`close`, or used as an
+    asynchronous context manager.
+    """
+    def __init__(self, *urls, **kwargs):
+        self._limit = kwargs.pop("limit", DEFAULT_LIMIT)
+        self._limit_per_host = kwargs.pop("limit_per_host",
+                                          DEFAULT_LIMIT_PER_HOST)
+        timeout = kwargs.pop("timeout", None)
+        metadata_ttl = kwargs.pop("metadata_ttl", DEFAULT_METADATA_TTL)
+        self._negative_cache = NegativeCache(
+            ttl=kwargs.pop("negative_ttl", DEFAULT_NEGATIVE_TTL),
+            path=kwargs.pop("negative_cache_path", None),
+            )
+        cache_args = dict(
+            cacheDir=kwargs.pop("cache_dir", None),
+            max_bytes=kwargs.pop("cache_max_bytes", None),
+            max_entries=kwargs.pop("cache_max_entries", None),
+            trim_interval=kwargs.pop("cache_trim_interval", None),
+            store=kwargs.pop("cache_store", "file"),
+            chunk_size=kwargs.pop("chunk_size", DEFAULT_CHUNK_SIZE),
+            )
+        if kwargs:
+            raise TypeError("Unexpected keyword arguments: %s"
+                            % ", ".join(sorted(kwargs)))
+        self._session = None
+        self._cache = None
+        self._executor = futures.ThreadPoolExecutor(max_workers=self._limit)
+        self._poms = _PomLoader()
+        self._repos = []
+        for url in urls:
+            url = urlparse(url)
+            if not url.scheme or url.scheme == "file":
+                self._repos.append(AsyncLocalRepository(url.path,
+                                                        self._executor))
+            elif url.scheme.startswith("http"):
+                if self._cache is None:
+                    self._cache = Cache(**cache_args)
+                self._repos.append(AsyncHttpRepository(
+                    url.geturl(), self, timeout=timeout, cache=self._cache,
+                    metadata_ttl=metadata_ttl,
+                    negative_cache=self._negative_cache,
+                    executor=self._executor))
+            else:
+                msg = "Unknown scheme: %s"
+                log.error(msg, url)
+                raise ValueError(msg % url.geturl())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def request(self, method, url, **kwargs):
+        """Make a request with the shared session, creating it on first use
+
+        Repositories use the client as their session so the session is
+        created inside the running event loop.
+        """
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self._limit, limit_per_host=self._limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session.request(method, url, **kwargs)
+
+    async def find_artifacts(self, coordinate):
+        """Find all artifacts matching the coordinate
+
+        :param str coordinate: maven coordinate
+        :return: list of Artifacts, newest first
+        """
+        artifacts = set()
+        for versions in await asyncio.gather(
+                *[repo.get_versions(coordinate) for repo in self._repos]):
+            artifacts.update(versions or [])
+        return sorted(artifacts, reverse=True)
+
+    async def _find_repository(self, path):
+        """Return the first repository that contains *path*, or ``None``"""
+        found = await asyncio.gather(
+            *[repo.exists(path) for repo in self._repos])
+        for repo, exists in zip(self._repos, found):
+            if exists:
+                return repo
+        return None
+
+    async def get_artifact(self, coordinate):
+        """Return the actual artifact specified by the coordinate
+
+        :param str coordinate: maven coordinate
+        :raises: :py:exc:`pymaven.errors.MissingArtifactError`
+        :return: the artifact requested
+        :rtype: :py:class:`pymaven.Artifact`
+        """
+        query = Artifact(coordinate)
+        assert query.version.version is not None, \
+            "Cannot get artifact for version range"
+
+        repo = await self._find_repository(query.path)
+        if repo is None:
+            raise MissingArtifactError(coordinate)
+        query.contents = await repo.open(query.path)
+        return query
+
+    async def _fetch_pom(self, path):
+        repo = await self._find_repository(path)
+        if repo is None:
+            self._poms.add(path, None)
+            return
+        with await repo.open(path) as fh:
+            body = fh.read()
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+        self._poms.add(path, body)
+
+    async def get_metadata(self, coordinate):
+        """Return the metadata associated with the coordinates
+
+        The parent and imported poms are fetched before the pom is returned,
+        so its dependencies can be read without blocking.
+
+        :param str coordinate: maven coordinate
+        :raises: :py:exc:`pymaven.errors.MissingArtifactError`
+        :return: the metadata requested
+        :rtype: :py:class:`pymaven.pom.Pom`
+        """
+        query = Artifact(coordinate)
+        assert query.version.version is not None, \
+            "Cannot get metadata for version range"
+
+        if query.type != "pom":
+            query.type = "pom"
+
+        # snapshots change, the cache of their repository revalidates them
+        # once they are older than metadata_ttl
+        self._poms.forget_snapshots()
+        pom = Pom.fromcache(query.coordinate, self._poms)
+        while True:
+            try:
+                pom.dependencies
+                return pom
+            except _Unfetched as e:
+                await self._fetch_pom(e.path)
+
+    async def close(self):
+        """Release the connections and caches held by this client"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._executor.shutdown(wait=False)
+        if self._cache is not None:
+            self._cache.close()
+        self._negative_cache.save()
+        POM_CACHE.invalidate_if(lambda key: key[0] is self._poms)
@@ -0,0 +1,213 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Load many poms at once, parsing them in a pool of processes
+"""
+
+from collections import OrderedDict
+from collections import deque
+from concurrent import futures
+import logging
+import multiprocessing
+
+from .artifact import Artifact
+from .pom import EffectiveModel
+from .pom import Pom
+from .pom import RawPom
+
+# documents sent to a worker process at a time
+DEFAULT_CHUNK_SIZE = 64
+
+log = logging.getLogger(__name__)
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _key(coordinate):
+    artifact = Artifact(coordinate)
+    return (artifact.group_id, artifact.artifact_id, str(artifact.version))
+
+
+def _parse_chunk(chunk):
+    """Extract the raw poms of a list of ``(coordinate, data)`` pairs
+
+    Runs in a worker process, errors are returned as messages so a bad
+    document does not fail the rest of the chunk.
+    """
+    results = []
+    for coordinate, data in chunk:
+        try:
+            results.append(
+                (coordinate, RawPom.fromstring(coordinate, data), None))
+        except Exception as e:
+            results.append(
+                (coordinate, None, "%s: %s" % (e.__class__.__name__, e)))
+    return results
+
+
+def parse_poms(items, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Extract the :py:class:`pymaven.pom.RawPom` of many pom documents
+
+    Parsing is CPU bound and holds the GIL, so the documents are parsed in a
+    pool of *workers* processes, one per cpu by default, *chunk_size*
+    documents at a time. Only a few chunks per worker are in flight, so
+    *items* may be a generator over more documents than fit in memory.
+    ``workers=0`` parses in this process.
+
+    :param items: iterable of ``(coordinate, data)`` pairs, *data* being the
+                  bytes or text of the pom
+    :return: ``(coordinate, raw pom, error)`` triples in the order of
+             *items*, the raw pom is ``None`` and *error* a message if the
+             document could not be parsed
+    """
+    chunks = _chunks(items, chunk_size)
+    if workers == 0:
+        for chunk in chunks:
+            for result in _parse_chunk(chunk):
+                yield result
+        return
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    pending = deque()
+    with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunks:
+            pending.append(pool.submit(_parse_chunk, chunk))
+            if len(pending) > 2 * workers:
+                for result in pending.popleft().result():
+                    yield result
+        while pending:
+            for result in pending.popleft().result():
+                yield result
+
+
+class _BatchPom(Pom):
+    """A pom of a :py:class:`PomBatch`, whose client is the batch
+
+    Only the raw pom of the document is kept, the document itself is gone.
+    """
+    __slots__ = ()
+
+    @property
+    def pom_data(self):
+        raise ValueError("the document of %s is not kept by the batch"
+                         % self.coordinate)
+
+    def _pom_factory(self, group, artifact, version):
+        return self._client.get_pom(
+            "%s:%s:pom:%s" % (group, artifact, version))
+
+
+class PomBatch(object):
+    """Load many poms from their documents
+
+    :py:meth:`add` parses the documents with :py:func:`parse_poms` in a pool
+    of *workers* processes, which only extract the raw data of each pom.
+    Parents, imported poms and properties are resolved in this process from
+    those raw poms when a pom is asked for, each pom of the batch is
+    resolved once no matter how many others refer to it. Parents and
+    imported poms that are not part of the batch are loaded through
+    *client*.
+
+    :param client: a :py:class:`pymaven.client.MavenClient` or ``None``
+    :param int workers: number of processes, see :py:func:`parse_poms`
+    :param int chunk_size: documents sent to a process at a time
+    """
+    def __init__(self, client=None, workers=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        self._client = client
+        self._workers = workers
+        self._chunk_size = chunk_size
+        self._raw = OrderedDict()
+        self._poms = {}
+        #: coordinate -> message, for the documents that could not be parsed
+        self.failed = OrderedDict()
+
+    def __contains__(self, coordinate):
+        return _key(coordinate) in self._raw
+
+    def __iter__(self):
+        for raw in self._raw.values():
+            yield raw.coordinate
+
+    def __len__(self):
+        return len(self._raw)
+
+    @property
+    def system_properties(self):
+        return getattr(self._client, "system_properties", None)
+
+    @property
+    def environment(self):
+        return getattr(self._client, "environment", None)
+
+    def add(self, items):
+        """Parse pom documents into the batch
+
+        :param items: iterable of ``(coordinate, data)`` pairs, *data* being
+                      the bytes or text of the pom
+        :return: the number of poms added
+        """
+        added = 0
+        for coordinate, raw, error in parse_poms(items, self._workers,
+                                                 self._chunk_size):
+            if raw is None:
+                log.warning("unable to parse %s: %s", coordinate, error)
+                self.failed[coordinate] = error
+                continue
+            key = _key(coordinate)
+            self._raw[key] = raw
+            self._poms.pop(key, None)
+            added += 1
+        return added
+
+    def get_pom(self, coordinate):
+        """Return the :ref:`Pom` object of *coordinate*
+
+        Poms that are not part of the batch are loaded through the client.
+        """
+        key = _key(coordinate)
+        pom = self._poms.get(key)
+        if pom is None:
+            raw = self._raw.get(key)
+            if raw is None:
+                return Pom.fromcache(coordinate, self._client)
+            pom = self._poms[key] = _BatchPom.fromraw(raw, self)
+        return pom
+
+    def get_effective_model(self, coordinate):
+        """Return the :py:class:`pymaven.pom.EffectiveModel` of
+        *coordinate*
+        """
+        return EffectiveModel.frompom(self.get_pom(coordinate))
+
+    def models(self):
+        """Yield the :py:class:`pymaven.pom.EffectiveModel` of every pom of
+        the batch, in the order they were added
+        """
+        for raw in list(self._raw.values()):
+            yield EffectiveModel.frompom(self.get_pom(raw.coordinate))
@@ -15,23 +15,38 @@
 #
 
 
+from collections import OrderedDict
+from concurrent import futures
+import errno
 import getpass
 import hashlib
+import io
 import json
 import logging
 import os
 import posixpath
+import sqlite3
 import tempfile
+import threading
+import time
 
+from requests.adapters import HTTPAdapter
 from six.moves.urllib.parse import urlparse
+from urllib3.util.retry import Retry
 import requests
 import six
 
 from . import utils
 from .artifact import Artifact
+from .errors import ChecksumMismatchError
 from .errors import MissingArtifactError
 from .errors import MissingPathError
+from .errors import RepositoryError
+from .index import LocalIndex
+from .pom import POM_CACHE
+from .pom import EffectiveModel
 from .pom import Pom
+from .versioning import VersionIndex
 from .versioning import VersionRange
 
 try:
@@ -41,17 +56,141 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
+# connection pool defaults for http(s) repositories
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.1
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+# seconds before cached maven-metadata.xml and snapshots are revalidated
+DEFAULT_METADATA_TTL = 15 * 60
+# seconds a missing file is remembered before it is requested again
+DEFAULT_NEGATIVE_TTL = 60
+# responses that mean a file does not exist
+MISSING_STATUS_CODES = (404, 410)
+# bytes read from the network or disk at a time when streaming bodies
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+# checksum files published next to artifacts, in order of preference
+CHECKSUM_ALGORITHMS = ("sha1", "sha256", "md5")
+
+# fetches checksum files while the artifacts they describe download
+_checksum_executor = None
+_checksum_executor_lock = threading.Lock()
+
+
+def _get_checksum_executor():
+    global _checksum_executor
+    with _checksum_executor_lock:
+        if _checksum_executor is None:
+            _checksum_executor = futures.ThreadPoolExecutor(
+                max_workers=DEFAULT_POOL_SIZE)
+        return _checksum_executor
+
+
+def new_session(pool_size=DEFAULT_POOL_SIZE, max_retries=DEFAULT_MAX_RETRIES,
+                backoff_factor=DEFAULT_BACKOFF_FACTOR):
+    """Create a keep-alive :py:class:`requests.Session` for a maven host
+
+    :param int pool_size: number of connections to keep open per host
+    :param int max_retries: number of times to retry a failed request
+    :param float backoff_factor: backoff factor between retries
+    :return: a new session
+    :rtype: :py:class:`requests.Session`
+    """
+    retries = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        raise_on_status=False,
+        )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=retries)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def cache_ttl(uri, metadata_ttl):
+    """Return how many seconds a cached response for *uri* is fresh, or
+    ``None`` if it never expires
+
+    Release artifacts and poms never change, ``maven-metadata.xml`` files and
+    snapshots are fresh for *metadata_ttl* seconds.
+    """
+    if posixpath.basename(uri).startswith("maven-metadata") \
+            or "-SNAPSHOT" in uri:
+        return metadata_ttl
+    return None
+
+
+def parse_metadata_versions(fh):
+    """Return the versions listed by the ``maven-metadata.xml`` in *fh*
+
+    The document is parsed as a stream, elements are discarded once read.
+    """
+    versions = []
+    path = []
+    for event, elem in ElementTree.iterparse(fh, events=("start", "end")):
+        if event == "start":
+            path.append(elem.tag)
+            continue
+        if path[1:] == ["versioning", "versions", "version"] and elem.text:
+            versions.append(elem.text.strip())
+        path.pop()
+        elem.clear()
+    return versions
+
+
+def matching_artifacts(query, versions):
+    """Return the artifacts of *versions* that match the version range of
+    *query*, newest first
+
+    :param query: an artifact with an optional version range
+    :type query: :py:class:`pymaven.Artifact`
+    :param versions: version strings listed for the artifact
+    :rtype: [:py:class:`pymaven.Artifact`, ...]
+    """
+    version_range = query.version
+    if version_range is None:
+        version_range = VersionRange.fromstring("[,)")
+
+    # base coordinate for all return values is everything up to the
+    # version of the query
+    base_coordinate = "%s:%s" % (query.group_id, query.artifact_id)
+    if query.classifier:
+        base_coordinate += "%s:%s" % (query.type, query.classifier)
+    elif query.type != "jar":
+        base_coordinate += ":%s" % query.type
+
+    versions = VersionIndex(versions)
+    return [Artifact(':'.join([base_coordinate, version]))
+            for version in reversed(versions.matching(version_range))]
+
 
 class Struct(object):
     """ Simple object to mimic a requests.Response object
+
+    *content* is either the path of the file holding the body or the body
+    itself.
     """
     def __init__(self):
         self.status_code = None
         self.content = None
+        self.etag = None
+        self.last_modified = None
+        self.fetched = 0
+        self.sha1 = None
+        self.sha256 = None
+        self.md5 = None
+        self.verified = None
         self._json = None
 
     def __enter__(self):
-        self._content = open(self.content, 'rb')
+        if isinstance(self.content, bytes):
+            self._content = io.BytesIO(self.content)
+        else:
+            self._content = open(self.content, 'rb')
         return self._content
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -64,38 +203,569 @@ class Struct(object):
             return json.load(fh)
 
     def iter_content(self, size=None):
+        """Iterate over the body in chunks of *size* bytes"""
+        size = size or DEFAULT_CHUNK_SIZE
         with self as fh:
-            for chunk in fh.read(size):
+            for chunk in iter(lambda: fh.read(size), b""):
                 yield chunk
 
 
+class FileStore(object):
+    """Cache store keeping every response in a body file and a json sidecar
+
+    The modification time of the sidecar records when the entry was last
+    used.
+    """
+    def __init__(self, path):
+        if not os.path.exists(path):
+            os.makedirs(path, mode=0o700)
+        self.path = path
+
+    def _paths(self, h):
+        return os.path.join(self.path, h), os.path.join(self.path,
+                                                        "%s.data" % h)
+
+    def _size(self, h):
+        """Return the bytes used by entry *h*, 0 if it does not exist"""
+        size = 0
+        for path in self._paths(h):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def entries(self):
+        """Return ``(hash, size)`` of every entry, least recently used
+        first
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".data"):
+                continue
+            h = name[:-len(".data")]
+            hpath, dhpath = self._paths(h)
+            try:
+                dstat = os.stat(dhpath)
+                size = os.stat(hpath).st_size + dstat.st_size
+            except OSError:
+                # removed or still being written
+                continue
+            entries.append((dstat.st_mtime, h, size))
+        entries.sort()
+        return [(h, size) for _, h, size in entries]
+
+    def get(self, h):
+        """Return the metadata and the body file of entry *h*, or ``None``"""
+        hpath, dhpath = self._paths(h)
+        if os.path.exists(hpath) and os.path.exists(dhpath):
+            with open(dhpath) as fh:
+                return json.load(fh), hpath
+        return None
+
+    def _write(self, path, chunks):
+        """Write *chunks* to a temporary file that is renamed to *path* once
+        complete, so readers never see a partial file
+        """
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=self.path)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def put(self, h, metadata, chunks):
+        """Store the entry *h*
+
+        The body is streamed to disk. *metadata* is written once all of
+        *chunks* has been consumed.
+
+        :param dict metadata: json serializable response metadata
+        :param chunks: iterable of the body
+        :return: the number of bytes the store grew by, less than the size
+                 of the entry if it replaced an older one
+        """
+        replaced = self._size(h)
+        self._write(self._paths(h)[0], chunks)
+        self.update(h, metadata)
+        return self._size(h) - replaced
+
+    def update(self, h, metadata):
+        """Replace the metadata of entry *h*, keeping its body"""
+        self._write(self._paths(h)[1], [json.dumps(metadata).encode("utf-8")])
+
+    def touch(self, h):
+        try:
+            os.utime(self._paths(h)[1], None)
+        except OSError:
+            pass
+
+    def remove(self, *hashes):
+        """Remove entries
+
+        :return: the number of bytes freed
+        """
+        freed = 0
+        for h in hashes:
+            freed += self._size(h)
+            for path in self._paths(h):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        return freed
+
+    def quarantine(self, h):
+        """Move entry *h* out of the cache into the quarantine directory
+
+        :return: the number of bytes moved out of the cache
+        """
+        quarantine = os.path.join(self.path, "quarantine")
+        if not os.path.exists(quarantine):
+            os.makedirs(quarantine, mode=0o700)
+        freed = self._size(h)
+        for path in self._paths(h):
+            try:
+                os.replace(path, os.path.join(quarantine,
+                                              os.path.basename(path)))
+            except OSError:
+                pass
+        return freed
+
+    def close(self):
+        pass
+
+
+class ContentStore(FileStore):
+    """Cache store keeping every distinct body once
+
+    Bodies are stored in ``blobs/`` named by the sha256 of their content and
+    the body file of every entry is a hard link to its blob, so the same
+    file fetched from several repositories or urls takes its space once. The
+    link count of a blob counts the entries using it, the blob is removed
+    with the last of them. Sizes reported by the store count a shared body
+    once, against the entry that will free it.
+    """
+    def __init__(self, path):
+        super(ContentStore, self).__init__(path)
+        self.blobs = os.path.join(path, "blobs")
+        if not os.path.exists(self.blobs):
+            os.makedirs(self.blobs, mode=0o700)
+
+    def _blob(self, h):
+        """Return the blob path of entry *h*, or ``None`` if unknown"""
+        try:
+            with open(self._paths(h)[1]) as fh:
+                digest = json.load(fh).get("sha256")
+        except (OSError, IOError, ValueError):
+            return None
+        return digest and os.path.join(self.blobs, digest)
+
+    def _release(self, blob):
+        """Remove *blob* if no entry links to it anymore"""
+        try:
+            if os.stat(blob).st_nlink == 1:
+                os.unlink(blob)
+        except OSError:
+            pass
+
+    def _size(self, h):
+        hpath, dhpath = self._paths(h)
+        size = 0
+        try:
+            size += os.path.getsize(dhpath)
+            stat = os.stat(hpath)
+        except OSError:
+            return size
+        # the body is freed with the last entry, linked only with its blob
+        if stat.st_nlink <= 2:
+            size += stat.st_size
+        return size
+
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".data"):
+                continue
+            h = name[:-len(".data")]
+            hpath, dhpath = self._paths(h)
+            try:
+                dstat = os.stat(dhpath)
+                hstat = os.stat(hpath)
+            except OSError:
+                continue
+            entries.append((dstat.st_mtime, h, dstat.st_size, hstat))
+        entries.sort(key=lambda entry: entry[:2])
+
+        # count every body once, and drop blobs left by interrupted removals
+        inodes = set()
+        result = []
+        for _, h, size, hstat in entries:
+            inode = (hstat.st_dev, hstat.st_ino)
+            if inode not in inodes:
+                inodes.add(inode)
+                size += hstat.st_size
+            result.append((h, size))
+        for name in os.listdir(self.blobs):
+            self._release(os.path.join(self.blobs, name))
+        return result
+
+    def _link(self, path, blob):
+        """Make *path* a link to *blob*, creating it from *path* if it does
+        not exist yet
+        """
+        while True:
+            try:
+                os.link(path, blob)
+                return
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            shared = path + ".blob"
+            try:
+                os.link(blob, shared)
+            except OSError as e:
+                # removed in the meantime
+                if e.errno != errno.ENOENT:
+                    raise
+                continue
+            os.replace(shared, path)
+            return
+
+    def put(self, h, metadata, chunks):
+        replaced = self._size(h)
+        old = self._blob(h)
+        hpath = self._paths(h)[0]
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=self.path)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+            if not metadata.get("sha256"):
+                digest = hashlib.sha256()
+                with open(tmp, "rb") as fh:
+                    for chunk in iter(lambda: fh.read(DEFAULT_CHUNK_SIZE),
+                                      b""):
+                        digest.update(chunk)
+                metadata["sha256"] = digest.hexdigest()
+            blob = os.path.join(self.blobs, metadata["sha256"])
+            self._link(tmp, blob)
+            os.replace(tmp, hpath)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.update(h, metadata)
+        if old and old != blob:
+            self._release(old)
+        return self._size(h) - replaced
+
+    def remove(self, *hashes):
+        freed = 0
+        for h in hashes:
+            blob = self._blob(h)
+            freed += super(ContentStore, self).remove(h)
+            if blob:
+                self._release(blob)
+        return freed
+
+    def quarantine(self, h):
+        # the blob is dropped even if it is shared, entries still linking the
+        # body keep it but nothing new is linked to it
+        blob = self._blob(h)
+        freed = super(ContentStore, self).quarantine(h)
+        if blob:
+            try:
+                os.unlink(blob)
+            except OSError:
+                pass
+        return freed
+
+
+class SQLiteStore(object):
+    """Cache store keeping every response in a single sqlite database
+
+    A lookup is one query on the primary key and returns the body with the
+    metadata, no other files are created. Bodies are held in memory while
+    they are read and written, so this store suits poms and metadata better
+    than large artifacts.
+    """
+    FILENAME = "cache.sqlite"
+    # seconds access times are collected for before they are written
+    TOUCH_INTERVAL = 1.0
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            os.makedirs(path, mode=0o700)
+        self.path = os.path.join(path, self.FILENAME)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._atimes = {}
+        self._flushed = time.time()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " hash TEXT PRIMARY KEY,"
+                " metadata TEXT NOT NULL,"
+                " body BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " atime REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_atime"
+                             " ON entries (atime)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS quarantine ("
+                " hash TEXT PRIMARY KEY,"
+                " metadata TEXT NOT NULL,"
+                " body BLOB NOT NULL)")
+            self._db.commit()
+
+    def _flush(self):
+        """Write the access times collected by :py:meth:`touch` in one short
+        transaction, called with the lock held
+        """
+        if self._atimes:
+            self._db.executemany(
+                "UPDATE entries SET atime = ? WHERE hash = ?",
+                [(atime, h) for h, atime in self._atimes.items()])
+            self._db.commit()
+            self._atimes.clear()
+        self._flushed = time.time()
+
+    def entries(self):
+        with self._lock:
+            self._flush()
+            return self._db.execute(
+                "SELECT hash, size FROM entries ORDER BY atime").fetchall()
+
+    def get(self, h):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT metadata, body FROM entries WHERE hash = ?",
+                (h,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), bytes(row[1])
+
+    def _sizes(self, hashes):
+        """Return the bytes used by the entries in *hashes*"""
+        size = 0
+        for h in hashes:
+            row = self._db.execute("SELECT size FROM entries WHERE hash = ?",
+                                   (h,)).fetchone()
+            if row:
+                size += row[0]
+        return size
+
+    def put(self, h, metadata, chunks):
+        body = b"".join(chunks)
+        metadata = json.dumps(metadata)
+        size = len(body) + len(metadata)
+        with self._lock:
+            self._flush()
+            replaced = self._sizes([h])
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (h, metadata, sqlite3.Binary(body), size, time.time()))
+            self._db.commit()
+        return size - replaced
+
+    def update(self, h, metadata):
+        metadata = json.dumps(metadata)
+        with self._lock:
+            self._flush()
+            self._db.execute(
+                "UPDATE entries SET metadata = ?, size = length(body) + ?,"
+                " atime = ? WHERE hash = ?",
+                (metadata, len(metadata), time.time(), h))
+            self._db.commit()
+
+    def touch(self, h):
+        # a write transaction left open would lock out other processes, so
+        # hits are only recorded here and written every TOUCH_INTERVAL
+        now = time.time()
+        with self._lock:
+            self._atimes[h] = now
+            if now - self._flushed >= self.TOUCH_INTERVAL:
+                self._flush()
+
+    def remove(self, *hashes):
+        with self._lock:
+            self._flush()
+            freed = self._sizes(hashes)
+            self._db.executemany("DELETE FROM entries WHERE hash = ?",
+                                 [(h,) for h in hashes])
+            self._db.commit()
+        return freed
+
+    def quarantine(self, h):
+        with self._lock:
+            self._flush()
+            freed = self._sizes([h])
+            self._db.execute(
+                "INSERT OR REPLACE INTO quarantine"
+                " SELECT hash, metadata, body FROM entries WHERE hash = ?",
+                (h,))
+            self._db.execute("DELETE FROM entries WHERE hash = ?", (h,))
+            self._db.commit()
+        return freed
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._db.close()
+
+
+# cache stores that can be selected by name
+CACHE_STORES = {
+    "content": ContentStore,
+    "file": FileStore,
+    "sqlite": SQLiteStore,
+}
+
+
 class Cache(object):
     """ Local http cache
+
+    Responses are stored in *cacheDir*, a new temporary directory by default.
+    Passing the same directory again reuses the responses of earlier
+    processes. *store* selects how they are stored, it is either the name of
+    one of :py:data:`CACHE_STORES`, by default ``"file"``, or a store object
+    implementing the same methods as :py:class:`FileStore`. ``"content"``
+    selects :py:class:`ContentStore`, which stores identical bodies fetched
+    from different urls once.
+
+    The cache holds at most *max_bytes* bytes in at most *max_entries*
+    responses, the least recently used responses are evicted first. Access
+    order is kept in an in-memory index that is loaded from the store when
+    the cache is created, so evicting never scans the store. If
+    *trim_interval* is given, a background thread reloads the index every
+    *trim_interval* seconds to pick up responses written by other processes
+    and trims the cache back to its budget.
     """
-    def __init__(self, cacheDir=None):
-        if cacheDir is None:
-            cacheDir = tempfile.mkdtemp(prefix=getpass.getuser())
-        if not os.path.exists(cacheDir):
-            os.makedirs(cacheDir, mode=0o700)
+    def __init__(self, cacheDir=None, max_bytes=None, max_entries=None,
+                 trim_interval=None, store="file",
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        if isinstance(store, six.string_types):
+            if cacheDir is None:
+                cacheDir = tempfile.mkdtemp(prefix=getpass.getuser())
+            try:
+                store = CACHE_STORES[store](cacheDir)
+            except KeyError:
+                raise ValueError("Unknown cache store: %s" % store)
         self.cacheDir = cacheDir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.chunk_size = chunk_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.quarantined = 0
+        self._store = store
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._load()
+        self.trim()
+
+        self._trimmer = None
+        if trim_interval:
+            self._trimmer = threading.Thread(target=self._run_trimmer,
+                                             args=(trim_interval,))
+            self._trimmer.daemon = True
+            self._trimmer.start()
 
     def _gen_key(self, method, uri, query_params):
         key = method + " " + uri
         if query_params:
             key += "?" + "&".join(
-                ("%s=%s" % kv for kv in query_params.iteritems()))
+                ("%s=%s" % kv for kv in six.iteritems(query_params)))
 
         return key
 
     def _gen_hash(self, key):
-        h = hashlib.sha1(key).hexdigest()
+        h = hashlib.sha1(key.encode("utf-8")).hexdigest()
         return h
 
-    def _gen_paths(self, hash):
-        dhash = "%s.data" % hash
-        hpath = os.path.join(self.cacheDir, hash)
-        dhpath = os.path.join(self.cacheDir, dhash)
-        return hpath, dhpath
+    def _load(self):
+        """Rebuild the index from the entries of the store, least recently
+        used first
+        """
+        entries = OrderedDict(self._store.entries())
+        with self._lock:
+            self._entries = entries
+            self._size = sum(entries.values())
+
+    def _over_budget(self):
+        return ((self.max_bytes is not None and self._size > self.max_bytes)
+                or (self.max_entries is not None
+                    and len(self._entries) > self.max_entries))
+
+    def _run_trimmer(self, interval):
+        while not self._closed.wait(interval):
+            try:
+                self._load()
+                self.trim()
+            except Exception:
+                log.exception("unable to trim cache %s", self.cacheDir)
+
+    def _touch(self, h):
+        """Mark the entry *h* as most recently used, in memory and in the
+        store for the next process that loads the cache
+        """
+        with self._lock:
+            if h in self._entries:
+                self._entries.move_to_end(h)
+        self._store.touch(h)
+
+    def trim(self):
+        """Evict the least recently used entries until the cache is within
+        its budget
+
+        The most recently added entry is always kept.
+
+        :return: the number of evicted entries
+        :rtype: int
+        """
+        evicted = 0
+        with self._lock:
+            # one at a time, an entry sharing its body with others frees
+            # less than its size
+            while len(self._entries) > 1 and self._over_budget():
+                h, _ = self._entries.popitem(last=False)
+                self._size -= self._store.remove(h)
+                self.evictions += 1
+                evicted += 1
+
+        if evicted:
+            log.debug("evicted %d entries", evicted)
+        return evicted
+
+    def stats(self):
+        """Return a dictionary describing the size and usage of the cache"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size": self._size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "quarantined": self.quarantined,
+                }
+
+    def close(self):
+        """Stop the background trimming thread and close the store"""
+        self._closed.set()
+        if self._trimmer is not None:
+            self._trimmer.join()
+            self._trimmer = None
+        self._store.close()
 
     def cache(self, res, method, uri, query_params=None):
         """Access the cache for a request response
@@ -111,23 +781,122 @@ class Cache(object):
 
         key = self._gen_key(method, uri, query_params)
         h = self._gen_hash(key)
-        hpath, dhpath = self._gen_paths(h)
 
         log.debug("Caching response %s with key %s", key, h)
-        with open(hpath, "wb") as fh:
-            for chunk in res.iter_content(1024):
-                fh.write(chunk)
-        with open(dhpath, "wb") as fh:
-            json.dump({
-                "status_code": res.status_code,
-                "reason": res.reason,
-                "method": method,
-                "uri": uri,
-                "param": query_params,
-            }, fh)
-
-        res = self._get(hpath, dhpath)
-        return res
+        metadata = {
+            "status_code": res.status_code,
+            "reason": res.reason,
+            "method": method,
+            "uri": uri,
+            "param": query_params,
+            "etag": res.headers.get("ETag"),
+            "last_modified": res.headers.get("Last-Modified"),
+            "fetched": time.time(),
+        }
+        return self._put(h, metadata, res.iter_content(self.chunk_size))
+
+    def put(self, method, uri, body, query_params=None):
+        """Cache *body*, data derived from responses rather than a response
+
+        It is returned by :py:meth:`get` like a response with status 200.
+
+        :param str method: a name for the kind of data, not an HTTP method
+        :param bytes body: the data to cache
+        :return: the cached entry
+        """
+        if query_params is None:
+            query_params = {}
+
+        key = self._gen_key(method, uri, query_params)
+        h = self._gen_hash(key)
+        log.debug("Caching %s with key %s", key, h)
+        metadata = {
+            "status_code": 200,
+            "reason": "OK",
+            "method": method,
+            "uri": uri,
+            "param": query_params,
+            "fetched": time.time(),
+        }
+        return self._put(h, metadata, [body])
+
+    def _put(self, h, metadata, chunks):
+        size = self._store.put(h, metadata, self._digest(chunks, metadata))
+
+        with self._lock:
+            self._size += size
+            self._entries[h] = self._entries.pop(h, 0) + size
+        self.trim()
+
+        return self._get(h)
+
+    def _digest(self, chunks, metadata):
+        """Pass *chunks* through, adding their digests to *metadata* once they
+        are exhausted
+        """
+        digests = [(name, hashlib.new(name)) for name in CHECKSUM_ALGORITHMS]
+        for chunk in chunks:
+            for _, digest in digests:
+                digest.update(chunk)
+            yield chunk
+        for name, digest in digests:
+            metadata[name] = digest.hexdigest()
+
+    def quarantine(self, method, uri, query_params=None):
+        """Move a cached response that failed verification out of the cache
+
+        It is kept aside by the store for inspection and is not served again.
+        """
+        if query_params is None:
+            query_params = {}
+
+        h = self._gen_hash(self._gen_key(method, uri, query_params))
+        log.warning("quarantining %s %s", method, uri)
+        with self._lock:
+            self._entries.pop(h, None)
+            self._size -= self._store.quarantine(h)
+            self.quarantined += 1
+
+    def set_metadata(self, method, uri, query_params=None, **values):
+        """Update the metadata stored with a cached response
+
+        :return: the cached response or ``None`` if it is not cached
+        """
+        if query_params is None:
+            query_params = {}
+
+        h = self._gen_hash(self._gen_key(method, uri, query_params))
+        entry = self._store.get(h)
+        if entry is None:
+            return None
+        metadata = entry[0]
+        metadata.update(values)
+        self._store.update(h, metadata)
+        return self._get(h)
+
+    def invalidate(self, method, uri, query_params=None):
+        """Remove a cached response"""
+        if query_params is None:
+            query_params = {}
+
+        h = self._gen_hash(self._gen_key(method, uri, query_params))
+        with self._lock:
+            self._entries.pop(h, None)
+            self._size -= self._store.remove(h)
+
+    def refresh(self, res, method, uri, query_params=None):
+        """Mark a cached response as fresh after the server confirmed it
+        with *res*, a ``304 Not Modified`` response
+
+        :return: the cached response or ``None`` if it was evicted meanwhile
+        """
+        values = {"fetched": time.time()}
+        for key, header in (("etag", "ETag"),
+                            ("last_modified", "Last-Modified")):
+            if res.headers.get(header):
+                values[key] = res.headers[header]
+        log.debug("revalidated %s %s", method, uri)
+        return self.set_metadata(method, uri, query_params, **values)
 
     def get(self, method, uri, query_params=None):
         if query_params is None:
@@ -135,50 +904,278 @@ class Cache(object):
 
         key = self._gen_key(method, uri, query_params)
         h = self._gen_hash(key)
-        res = self._get(*self._gen_paths(h))
+        res = self._get(h)
         if res is not None:
             log.debug("hit %s with key %s", key, h)
+            with self._lock:
+                self.hits += 1
+            self._touch(h)
         else:
             log.debug("miss %s with key %s", key, h)
+            with self._lock:
+                self.misses += 1
+                # removed by another process
+                self._size -= self._entries.pop(h, 0)
         return res
 
-    def _get(self, hpath, dhpath):
-        if os.path.exists(hpath) and os.path.exists(dhpath):
-            data = json.load(open(dhpath))
-            data["content"] = hpath
+    def _get(self, h):
+        entry = self._store.get(h)
+        if entry is not None:
+            data, content = entry
+            data["content"] = content
             res = Struct()
-            for k, v in data.iteritems():
+            for k, v in six.iteritems(data):
                 setattr(res, k, v)
             return res
 
 
+class NegativeCache(object):
+    """Remember urls that do not exist
+
+    Misses are kept in memory, apart from the response :py:class:`Cache`,
+    and expire after *ttl* seconds so files published later are found. If
+    *path* is given, unexpired misses are loaded from it on creation and
+    written back by :py:meth:`save`.
+    """
+    def __init__(self, ttl=DEFAULT_NEGATIVE_TTL, path=None):
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self._expires = {}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path) as fh:
+                expires = json.load(fh)
+            now = time.time()
+            self._expires = dict((url, expiry)
+                                 for url, expiry in six.iteritems(expires)
+                                 if expiry > now)
+
+    def __contains__(self, url):
+        with self._lock:
+            expiry = self._expires.get(url)
+            if expiry is None:
+                return False
+            if expiry <= time.time():
+                del self._expires[url]
+                return False
+            self.hits += 1
+            return True
+
+    def __len__(self):
+        return len(self._expires)
+
+    def add(self, url):
+        """Remember that *url* does not exist"""
+        with self._lock:
+            self._expires[url] = time.time() + self.ttl
+
+    def discard(self, url):
+        with self._lock:
+            self._expires.pop(url, None)
+
+    def clear(self):
+        with self._lock:
+            self._expires.clear()
+
+    def save(self):
+        """Write the unexpired misses to :py:attr:`path`"""
+        if self.path is None:
+            return
+        now = time.time()
+        with self._lock:
+            expires = dict((url, expiry)
+                           for url, expiry in six.iteritems(self._expires)
+                           if expiry > now)
+        with open(self.path, "w") as fh:
+            json.dump(expires, fh)
+
+
+class PrefetchResult(object):
+    """The outcome of :py:meth:`MavenClient.prefetch`
+
+    Files are identified by their full coordinate, including the type.
+    """
+    __slots__ = ("total", "fetched", "missing", "failed")
+
+    def __init__(self, total):
+        #: number of files requested
+        self.total = total
+        #: coordinate -> url of the repository it was fetched from
+        self.fetched = OrderedDict()
+        #: coordinates that no repository has
+        self.missing = []
+        #: coordinate -> exception raised while fetching it, by a repository
+        #: that failed or could not be reached
+        self.failed = OrderedDict()
+
+    @property
+    def done(self):
+        """Number of files processed so far"""
+        return len(self.fetched) + len(self.missing) + len(self.failed)
+
+    def __bool__(self):
+        return not self.missing and not self.failed
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return "<%s.PrefetchResult(%d/%d fetched)>" % (
+            self.__module__, len(self.fetched), self.total)
+
+
 class MavenClient(object):
     """ Client for talking to a maven repository
+
+    Http repositories on the same host share a single keep-alive session. The
+    connection pool of those sessions can be tuned with the *pool_size*,
+    *max_retries* and *backoff_factor* keyword arguments.
+
+    Repositories are searched one at a time in the order they were given, by
+    requesting the file itself, a missing file is a miss. A file found in
+    the first repository costs a single request. Passing *workers* probes
+    all repositories at once with HEAD requests from a thread pool of that
+    size; lookups still prefer the first repository in order that has the
+    requested file. *timeout* limits how many seconds a single repository
+    may take to answer before it is treated as a miss.
+
+    Http repositories share one response :py:class:`Cache`. It is kept in
+    *cache_dir*, or a new temporary directory, and is limited by
+    *cache_max_bytes* and *cache_max_entries*; *cache_trim_interval* enables
+    background trimming and *cache_store* selects how responses are stored.
+    Artifacts are streamed into the cache *chunk_size* bytes at a time and
+    checked against their published checksums if *verify* is true.
+    Cached ``maven-metadata.xml`` files and snapshots are revalidated after
+    *metadata_ttl* seconds. Missing files are not requested again for
+    *negative_ttl* seconds; *negative_cache_path* keeps those misses between
+    clients.
+
+    Local repositories are indexed in memory with *local_index*, see
+    :py:class:`pymaven.index.LocalIndex`. *local_index_dir* keeps the indexes
+    in that directory, they are refreshed from directory modification times
+    when the next client starts and saved when it is closed.
+
+    Properties of poms are expanded with *system_properties* taking
+    precedence over those the poms define, and ``${env.NAME}`` is looked up in
+    *environment*, see :py:class:`pymaven.pom.PropertyInterpolator`.
     """
-    def __init__(self, *urls):
+    def __init__(self, *urls, **kwargs):
         if isinstance(urls, six.string_types):
             urls = [urls]
+        self._session_args = dict(
+            pool_size=kwargs.pop("pool_size", DEFAULT_POOL_SIZE),
+            max_retries=kwargs.pop("max_retries", DEFAULT_MAX_RETRIES),
+            backoff_factor=kwargs.pop("backoff_factor",
+                                      DEFAULT_BACKOFF_FACTOR),
+            )
+        workers = kwargs.pop("workers", None)
+        self._timeout = kwargs.pop("timeout", None)
+        self._metadata_ttl = kwargs.pop("metadata_ttl", DEFAULT_METADATA_TTL)
+        self._verify = kwargs.pop("verify", False)
+        self._negative_cache = NegativeCache(
+            ttl=kwargs.pop("negative_ttl", DEFAULT_NEGATIVE_TTL),
+            path=kwargs.pop("negative_cache_path", None),
+            )
+        local_index = kwargs.pop("local_index", False)
+        local_index_dir = kwargs.pop("local_index_dir", None)
+        self.system_properties = kwargs.pop("system_properties", None)
+        self.environment = kwargs.pop("environment", None)
+        self._cache_args = dict(
+            cacheDir=kwargs.pop("cache_dir", None),
+            max_bytes=kwargs.pop("cache_max_bytes", None),
+            max_entries=kwargs.pop("cache_max_entries", None),
+            trim_interval=kwargs.pop("cache_trim_interval", None),
+            store=kwargs.pop("cache_store", "file"),
+            chunk_size=kwargs.pop("chunk_size", DEFAULT_CHUNK_SIZE),
+            )
+        if kwargs:
+            raise TypeError("Unexpected keyword arguments: %s"
+                            % ", ".join(sorted(kwargs)))
+        self._executor = None
+        if workers:
+            self._executor = futures.ThreadPoolExecutor(max_workers=workers)
+        self._sessions = {}
+        self._cache = None
         self._repos = []
         for url in urls:
             url = urlparse(url)
             if not url.scheme or url.scheme == "file":
-                self._repos.append(LocalRepository(url.path))
+                index = None
+                if local_index_dir is not None:
+                    name = hashlib.sha1(os.path.abspath(url.path).encode(
+                        "utf-8")).hexdigest() + ".json.gz"
+                    index = LocalIndex(url.path,
+                                       os.path.join(local_index_dir, name))
+                elif local_index:
+                    index = LocalIndex(url.path)
+                self._repos.append(LocalRepository(url.path, index=index))
             elif url.scheme.startswith("http"):
-                self._repos.append(HttpRepository(url.geturl()))
+                if self._cache is None:
+                    self._cache = Cache(**self._cache_args)
+                self._repos.append(HttpRepository(
+                    url.geturl(), session=self._get_session(url),
+                    timeout=self._timeout, cache=self._cache,
+                    metadata_ttl=self._metadata_ttl,
+                    negative_cache=self._negative_cache,
+                    verify=self._verify))
             else:
                 msg = "Unknown scheme: %s"
                 log.error(msg, url)
                 raise ValueError(msg % url.geturl())
 
+    def _get_session(self, url):
+        """Return the session shared by all repositories on *url*'s host"""
+        key = (url.scheme, url.netloc)
+        if key not in self._sessions:
+            self._sessions[key] = new_session(**self._session_args)
+        return self._sessions[key]
+
     def find_artifacts(self, coordinate):
         """Find all artifacts matching the coordinate
 
+        With *workers*, a repository that takes more than *timeout* seconds
+        to answer is skipped and the versions of the others are returned.
+
         :param str coordinate: maven coordinate
         :retrun: list of Artifacts
         """
         artifacts = set([])
-        for repo in self._repos:
-            artifacts.update(set(repo.get_versions(coordinate)))
+        if self._executor is None:
+            for repo in self._repos:
+                artifacts.update(repo.get_versions(coordinate) or [])
+            return sorted(artifacts, reverse=True)
+
+        # *timeout* counts from the moment a repository is asked, not from
+        # the moment it was queued behind the others
+        started = {}
+
+        def get_versions(index):
+            started[index] = time.time()
+            return self._repos[index].get_versions(coordinate)
+
+        pending = dict((self._executor.submit(get_versions, index), index)
+                       for index in range(len(self._repos)))
+        while pending:
+            timeout = None
+            if self._timeout is not None:
+                deadlines = [started[index] + self._timeout
+                             for index in pending.values() if index in started]
+                timeout = self._timeout
+                if deadlines:
+                    timeout = max(0, min(deadlines) - time.time())
+            done, _ = futures.wait(pending, timeout,
+                                   return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                artifacts.update(future.result() or [])
+            if self._timeout is None:
+                continue
+            now = time.time()
+            for future, index in list(pending.items()):
+                if index in started and now - started[index] >= self._timeout:
+                    log.warning("timed out listing %s in %r, skipping it",
+                                coordinate, self._repos[index])
+                    future.cancel()
+                    del pending[future]
         return sorted(artifacts, reverse=True)
 
     def get_metadata(self, coordinate):
@@ -196,11 +1193,52 @@ class MavenClient(object):
         if query.type != "pom":
             query.type = "pom"
 
-        for repo in self._repos:
-            if repo.exists(query.path):
-                return Pom(coordinate, self)
-        else:
+        pom = Pom.fromcache(query.coordinate, self)
+        try:
+            # extracted from the response of the lookup, the document is
+            # only parsed as a whole if pom_data is read
+            pom.raw
+        except MissingArtifactError:
+            POM_CACHE.invalidate((self, query.coordinate))
             raise MissingArtifactError(coordinate)
+        return pom
+
+    def get_effective_model(self, coordinate):
+        """Return the resolved model of the pom of the coordinate
+
+        Models of released poms are kept in the http cache next to the poms,
+        a later client sharing the *cache_dir* loads them without fetching or
+        parsing the pom and its parents.
+
+        :param str coordinate: maven coordinate
+        :raises: :py:exc:`pymaven.errors.MissingArtifactError`
+        :rtype: :py:class:`pymaven.pom.EffectiveModel`
+        """
+        query = Artifact(coordinate)
+        assert query.version.version is not None, \
+            "Cannot get metadata for version range"
+        query.type = "pom"
+
+        # snapshots change, and models built with the properties of this
+        # client are not shared
+        cache = self._cache
+        if (cache_ttl(query.path, self._metadata_ttl) is not None
+                or self.system_properties or self.environment):
+            cache = None
+        if cache is not None:
+            res = cache.get("MODEL", query.coordinate)
+            if res is not None:
+                with res as fh:
+                    try:
+                        return EffectiveModel.loads(fh.read())
+                    except ValueError as e:
+                        log.warning("ignoring cached model of %s: %s",
+                                    query.coordinate, e)
+
+        model = EffectiveModel.frompom(self.get_metadata(query.coordinate))
+        if cache is not None:
+            cache.put("MODEL", query.coordinate, model.dumps())
+        return model
 
     def get_artifact(self, coordinate):
         """Return the actual artifact specified by the coordinate
@@ -214,12 +1252,166 @@ class MavenClient(object):
         assert query.version.version is not None, \
             "Cannot get artifact for version range"
 
-        for repo in self._repos:
-            if repo.exists(query.path):
-                query.contents = repo.open(query.path)
-                return query
+        if self._executor is None:
+            repo, contents = self._open_first(query.path)
         else:
+            repo = self._find_repository(query.path)
+            if repo is not None:
+                contents = repo.open(query.path)
+        if repo is None:
             raise MissingArtifactError(coordinate)
+        query.contents = contents
+        return query
+
+    def prefetch(self, coordinates, types=("pom", "jar"), workers=None,
+                 progress=None):
+        """Download the files of *coordinates* into the cache
+
+        Each coordinate is fetched once for each of *types*. Files are not
+        probed with a HEAD request first, every repository is asked for the
+        file in order until one returns it, so a file found in the first
+        repository costs a single request. Downloads run in a pool of
+        *workers* threads, in the pool of the client if *workers* is not
+        given, or one at a time if the client has none.
+
+        Files that no repository has are *missing*. Files whose lookup ran
+        into a repository that failed or could not be reached are *failed*,
+        they may still exist.
+
+        :param coordinates: iterable of ``group:artifact:version``
+                            coordinates
+        :param progress: callable invoked with the
+                         :py:class:`PrefetchResult` after every file
+        :return: the files fetched, missing and failed
+        :rtype: :py:class:`PrefetchResult`
+        """
+        queries = []
+        for coordinate in coordinates:
+            for type_ in types:
+                query = Artifact(coordinate)
+                assert query.version.version is not None, \
+                    "Cannot prefetch version range"
+                query.type = type_
+                queries.append(query)
+
+        result = PrefetchResult(len(queries))
+        lock = threading.Lock()
+
+        def fetch(query):
+            try:
+                repo, contents = self._open_first(query.path)
+                if contents is not None and hasattr(contents, "close"):
+                    contents.close()
+            except (RepositoryError, IOError) as e:
+                log.warning("unable to prefetch %s: %s", query.coordinate, e)
+                with lock:
+                    result.failed[query.coordinate] = e
+            else:
+                with lock:
+                    if repo is None:
+                        result.missing.append(query.coordinate)
+                    else:
+                        result.fetched[query.coordinate] = repo._url
+            if progress is not None:
+                progress(result)
+
+        executor = self._executor
+        if workers:
+            executor = futures.ThreadPoolExecutor(max_workers=workers)
+        try:
+            if executor is None:
+                for query in queries:
+                    fetch(query)
+            else:
+                for future in [executor.submit(fetch, query)
+                               for query in queries]:
+                    future.result()
+        finally:
+            if executor is not self._executor:
+                executor.shutdown()
+        log.info("prefetched %d of %d files, %d missing, %d failed",
+                 len(result.fetched), result.total, len(result.missing),
+                 len(result.failed))
+        return result
+
+    def _open_first(self, path):
+        """Open *path* from the first repository that has it
+
+        The file is requested directly instead of checking that it exists
+        first, a missing file costs one request per repository. Only missing
+        files move on to the next repository, a repository that can not be
+        reached or that fails raises.
+
+        :return: the repository and the opened file, or ``(None, None)`` if
+                 no repository has *path*
+        """
+        for repo in self._repos:
+            try:
+                return repo, repo.open(path)
+            except MissingPathError:
+                continue
+        return None, None
+
+    def _find_repository(self, path):
+        """Return the first repository that contains *path*
+
+        :param str path: path to look for
+        :return: the repository or ``None`` if no repository has *path*
+        """
+        if self._executor is None:
+            for repo in self._repos:
+                if repo.exists(path):
+                    return repo
+            return None
+
+        # *timeout* counts from the moment a repository is asked, not from
+        # the moment it was queued behind the others, see find_artifacts
+        started = {}
+
+        def exists(index):
+            started[index] = time.time()
+            return self._repos[index].exists(path)
+
+        fs = [self._executor.submit(exists, index)
+              for index in range(len(self._repos))]
+        try:
+            for index, future in enumerate(fs):
+                repo = self._repos[index]
+                while True:
+                    timeout = self._timeout
+                    if timeout is not None and index in started:
+                        timeout = max(
+                            0, started[index] + timeout - time.time())
+                    try:
+                        found = future.result(timeout)
+                    except futures.TimeoutError:
+                        if index not in started:
+                            # still queued, its time has not started
+                            continue
+                        log.warning("timed out looking for %s in %r",
+                                    path, repo)
+                        found = False
+                    break
+                if found:
+                    return repo
+        finally:
+            for future in fs:
+                future.cancel()
+        return None
+
+    def close(self):
+        """Release the thread pool and connections held by this client"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        for repo in self._repos:
+            repo.close()
+        for session in self._sessions.values():
+            session.close()
+        # the shared poms of this client would keep it alive
+        POM_CACHE.invalidate_if(lambda key: key[0] is self)
+        if self._cache is not None:
+            self._cache.close()
+        self._negative_cache.save()
 
 
 class AbstractRepository(object):
@@ -234,23 +1426,7 @@ class AbstractRepository(object):
         if self.exists(query.path):
             if query.version and query.version.version:
                 return [Artifact(coordinate)]
-
-            version_range = query.version
-            if version_range is None:
-                version_range = VersionRange("[,)")
-
-            # base coordinate for all return values is everything up to the
-            # version of the query
-            base_coordinate = "%s:%s" % (query.group_id, query.artifact_id)
-            if query.classifier:
-                base_coordinate += "%s:%s" % (query.type, query.classifier)
-            elif query.type != "jar":
-                base_coordinate += ":%s" % query.type
-
-            return sorted([
-                Artifact(':'.join([base_coordinate, version]))
-                for version in self.listdir(query.path)
-                if version in version_range], reverse=True)
+            return matching_artifacts(query, self.listdir(query.path))
 
     def exists(self, path):
         """Return ``True`` if *path* exists in the repository, ``False``
@@ -269,18 +1445,66 @@ class AbstractRepository(object):
             raise MissingPathError(path)
 
     def open(self, path):
+        """Open *path*
+
+        :raises: MissingPathError if *path* does not exist, errors reaching
+                 the repository are raised as they are
+        """
         try:
             return self._open(path)
-        except (IOError, requests.exceptions.HTTPError):
+        except IOError as e:
+            if not self._missing(e):
+                raise
             raise MissingPathError("No such file: %s" % path)
 
+    def _missing(self, error):
+        """Return ``True`` if *error*, raised by :py:meth:`_open`, means that
+        the file does not exist
+        """
+        return not isinstance(error, requests.exceptions.RequestException)
+
+    def close(self):
+        """Release the resources held by the repository"""
+
 
 class HttpRepository(AbstractRepository):
     """ Access a maven repository via http
+
+    Cached release artifacts and poms never change and are never requested
+    again. Cached ``maven-metadata.xml`` files and snapshots are revalidated
+    once they are older than *metadata_ttl* seconds, with a conditional
+    request that only transfers the body if it changed.
+
+    Only successful responses are cached. Missing files are remembered in
+    *negative_cache*, a :py:class:`NegativeCache`, and are not requested
+    again until the miss expires.
+
+    With *verify*, opened files are checked against the checksum file
+    published next to them, see :py:data:`CHECKSUM_ALGORITHMS`. The
+    checksum is fetched while the file downloads and compared with the
+    digest computed as it was written to the cache. Files that do not match
+    are quarantined and raise
+    :py:exc:`pymaven.errors.ChecksumMismatchError`; verified files are not
+    checked again.
     """
-    def __init__(self, url, username=None, password=None):
+    def __init__(self, url, username=None, password=None, session=None,
+                 timeout=None, cache=None,
+                 metadata_ttl=DEFAULT_METADATA_TTL, negative_cache=None,
+                 verify=False):
         super(HttpRepository, self).__init__(url)
-        self._cache = Cache()
+        if session is None:
+            session = new_session()
+        if cache is None:
+            cache = Cache()
+        if negative_cache is None:
+            negative_cache = NegativeCache()
+        self._auth = (username, password) if username is not None else None
+        self._cache = cache
+        self._session = session
+        self._timeout = timeout
+        self._metadata_ttl = metadata_ttl
+        self._negative_cache = negative_cache
+        self._verify = verify
 
     def _get(self, uri, **kwargs):
         res = self._request("GET", uri, **kwargs)
@@ -290,21 +1514,87 @@ class HttpRepository(AbstractRepository):
         res = self._request("HEAD", uri, **kwargs)
         return res
 
+    def _send(self, method, url, **kwargs):
+        log.debug("requesting %s %s", method, url)
+        if self._auth is not None:
+            kwargs.setdefault("auth", self._auth)
+        if self._timeout is not None:
+            kwargs.setdefault("timeout", self._timeout)
+        return self._session.request(method, url, **kwargs)
+
+    def _revalidate(self, res, method, url, **kwargs):
+        """Revalidate the stale cached response *res*
+
+        The entry is only dropped if the file is gone. If the repository
+        fails or can not be reached, the stale response is used.
+
+        :return: the cached response, refreshed or replaced, or the failed
+                 response if the file is gone
+        """
+        headers = dict(kwargs.pop("headers", None) or {})
+        if res.etag:
+            headers["If-None-Match"] = res.etag
+        if res.last_modified:
+            headers["If-Modified-Since"] = res.last_modified
+        try:
+            fresh = self._send(method, url, headers=headers, **kwargs)
+        except requests.exceptions.RequestException as e:
+            log.warning("unable to revalidate %s, using the cached copy: %s",
+                        url, e)
+            return res
+        params = kwargs.get("params")
+        if fresh.status_code == requests.codes.not_modified:
+            return self._cache.refresh(fresh, method, url, params)
+        if fresh.status_code == requests.codes.ok:
+            return self._cache.cache(fresh, method, url, params)
+        if fresh.status_code in MISSING_STATUS_CODES:
+            self._cache.invalidate(method, url, params)
+            return self._miss(fresh, url)
+        log.warning("unable to revalidate %s, using the cached copy: %s %s",
+                    url, fresh.status_code, fresh.reason)
+        return res
+
+    def _miss(self, res, url):
+        """Handle a failed request for *url*
+
+        :return: *res*, uncached
+        """
+        if res.status_code in MISSING_STATUS_CODES:
+            self._negative_cache.add(url)
+        return res
+
     def _request(self, method, uri, json=False, **kwargs):
         url = utils.urljoin(self._url, uri)
-        res = self._cache.get(method, uri, kwargs.get("params"))
-        if not res:
-            log.debug("requesting %s %s", method, url)
-            res = requests.request(method, url, **kwargs)
-            res = self._cache.cache(res, method, uri, kwargs.get("params"))
+        if url in self._negative_cache:
+            log.debug("known missing %s", url)
+            raise requests.HTTPError("Not Found")
+        res = self._cache.get(method, url, kwargs.get("params"))
+        if res is not None:
+            ttl = cache_ttl(uri, self._metadata_ttl)
+            if ttl is not None and time.time() - res.fetched > ttl:
+                res = self._revalidate(res, method, url, **kwargs)
+        if res is None:
+            res = self._send(method, url, **kwargs)
+            if res.status_code == requests.codes.ok:
+                res = self._cache.cache(res, method, url,
+                                        kwargs.get("params"))
+            else:
+                res = self._miss(res, url)
 
         if res.status_code != requests.codes.ok:
-            raise requests.HTTPError(res.reason)
+            raise requests.HTTPError(res.reason, response=res)
 
         if json:
             return res.json()
         return res
 
+    def _missing(self, error):
+        if not isinstance(error, requests.exceptions.HTTPError):
+            return False
+        # misses remembered by the negative cache have no response
+        return (error.response is None
+                or error.response.status_code in MISSING_STATUS_CODES)
+
     def _exists(self, path):
         try:
             self._head(path)
@@ -316,28 +1606,91 @@ class HttpRepository(AbstractRepository):
         uri = posixpath.join(path, "maven-metadata.xml")
         res = self._get(uri)
         with res as fh:
-            metadata = ElementTree.parse(fh)
+            return parse_metadata_versions(fh)
 
-        return [elem.text.strip()
-                for elem in metadata.findall("versioning/versions/version")
-                if elem is not None]
+    def _checksum(self, path):
+        """Return the algorithm and value of the checksum published for
+        *path*, or ``(None, None)`` if there is none
+        """
+        for algorithm in CHECKSUM_ALGORITHMS:
+            try:
+                res = self._get("%s.%s" % (path, algorithm))
+            except requests.exceptions.HTTPError:
+                continue
+            with res as fh:
+                # the checksum may be followed by the file name
+                value = fh.read().decode("ascii", "replace").split()
+            if value:
+                return algorithm, value[0].lower()
+        return None, None
 
     def _open(self, path):
+        if not self._verify:
+            return self._get(path, stream=True)
+
+        checksum = _get_checksum_executor().submit(self._checksum, path)
         res = self._get(path, stream=True)
-        return res
+        if res.verified:
+            checksum.cancel()
+            return res
+
+        algorithm, expected = checksum.result()
+        if algorithm is None:
+            log.warning("no checksum published for %s", path)
+            return res
+        actual = getattr(res, algorithm)
+        if actual is None:
+            # cached before digests were recorded
+            digest = hashlib.new(algorithm)
+            for chunk in res.iter_content():
+                digest.update(chunk)
+            actual = digest.hexdigest()
+
+        url = utils.urljoin(self._url, path)
+        if actual != expected:
+            self._cache.quarantine("GET", url)
+            raise ChecksumMismatchError(path, algorithm, expected, actual)
+        return self._cache.set_metadata("GET", url, verified=algorithm) or res
 
 
 class LocalRepository(AbstractRepository):
     """A local disk-based repository
+
+    Versions are the directories next to the ``maven-metadata*.xml`` files,
+    the files themselves are not listed. Those files are not read: they
+    copy the listing of the remote repository, and maven does not add the
+    versions it resolves to them, so they list versions that were never
+    downloaded and miss versions that were.
+
+    *index* is a :py:class:`pymaven.index.LocalIndex` of the repository, or
+    ``True`` to build one in memory. With an index, :py:meth:`exists` and
+    :py:meth:`listdir` are answered without touching the filesystem.
     """
+    def __init__(self, url, index=None):
+        super(LocalRepository, self).__init__(url)
+        if index is True:
+            index = LocalIndex(url)
+        self.index = index
+
     def _join(self, *args):
         return os.path.join(self._url, *args)
 
     def _exists(self, path):
+        if self.index is not None:
+            return self.index.exists(path)
         return os.path.exists(self._join(path))
 
     def _listdir(self, path):
-        return os.listdir(self._join(path))
+        if self.index is not None:
+            return [name for name in self.index.listdir(path)
+                    if self.index.isdir(posixpath.join(path, name))]
+        # the type of each entry comes with the listing, nothing is stat'ed
+        with os.scandir(self._join(path)) as entries:
+            return [entry.name for entry in entries if entry.is_dir()]
+
+    def close(self):
+        if self.index is not None:
+            self.index.save()
 
     def _open(self, path):
         """Open *path* as a file-like object
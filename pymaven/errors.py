@@ -46,6 +46,13 @@ class MissingPathError(RepositoryError):
     _template = "No such directory: {0}"
 
 
+class ChecksumMismatchError(RepositoryError):
+    """Raised when a downloaded file does not match the checksum published
+    next to it
+    """
+    _template = "Checksum mismatch for {0}: expected {1} {2}, got {3}"
+
+
 # Maven Client errors
 class ClientError(PymavenError):
     """Generic errors raised by maven clients"""
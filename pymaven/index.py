@@ -0,0 +1,220 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+In-memory index of a local maven repository
+"""
+
+import errno
+import gzip
+import json
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class LocalIndex(object):
+    """The directory tree of a local repository, held in memory
+
+    Every directory under *root* is read once with :py:func:`os.scandir`
+    and recorded with its modification time, its subdirectories and its
+    files, so ``groupId/artifactId`` leads to the versions and a version to
+    its files. :py:meth:`exists` and :py:meth:`listdir` are answered from
+    memory without touching the filesystem, files added after the index was
+    read are not seen until :py:meth:`refresh` is called.
+
+    If *path* is given the index is loaded from that file, refreshed, and
+    written back to it by :py:meth:`save` as gzip compressed json. A missing
+    or unreadable file is rebuilt from scratch.
+    """
+    FORMAT = 1
+    #: directories modified less than this many seconds before they are
+    #: read may change again without a new modification time, they are
+    #: read again by the next refresh
+    RACY_WINDOW = 2
+
+    def __init__(self, root, path=None):
+        self.root = root
+        self.path = path
+        self._dirs = {}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            try:
+                self._load()
+            except (OSError, IOError, ValueError, KeyError) as e:
+                log.warning("rebuilding index %s: %s", path, e)
+            else:
+                self.refresh()
+                return
+        self.build()
+
+    def __len__(self):
+        return len(self._dirs)
+
+    def _abspath(self, rel):
+        return os.path.join(self.root, *rel.split("/")) if rel else self.root
+
+    def _read(self, rel):
+        """Return the index entry of the directory *rel*
+
+        :raises: OSError if it cannot be read
+        """
+        path = self._abspath(rel)
+        # taken first, a change while reading is caught by the next refresh
+        mtime = os.stat(path).st_mtime_ns
+        if time.time() - mtime / 1e9 < self.RACY_WINDOW:
+            mtime = None
+        dirs = []
+        files = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    dirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+        return mtime, frozenset(dirs), frozenset(files)
+
+    def _scan(self, dirs, rel):
+        """Add the directory *rel* and everything below it to *dirs*"""
+        stack = [rel]
+        while stack:
+            rel = stack.pop()
+            try:
+                dirs[rel] = entry = self._read(rel)
+            except OSError:
+                continue
+            stack.extend(posixpath.join(rel, name) for name in entry[1])
+
+    def _drop(self, dirs, rel):
+        """Remove the directory *rel* and everything below it from *dirs*"""
+        prefix = rel + "/"
+        for key in [key for key in dirs
+                    if key == rel or key.startswith(prefix)]:
+            del dirs[key]
+
+    def build(self):
+        """Read the whole repository"""
+        dirs = {}
+        self._scan(dirs, "")
+        with self._lock:
+            self._dirs = dirs
+        log.debug("indexed %d directories of %s", len(dirs), self.root)
+
+    def refresh(self):
+        """Read again the directories modified since they were indexed
+
+        Only the modification time of every directory is checked, a changed
+        directory is read again and new subdirectories are added.
+
+        :return: the number of changed directories
+        :rtype: int
+        """
+        with self._lock:
+            dirs = dict(self._dirs)
+        changed = 0
+        for rel, (mtime, subdirs, _) in list(dirs.items()):
+            if rel not in dirs:
+                # below a directory removed earlier in this refresh
+                continue
+            try:
+                current = os.stat(self._abspath(rel)).st_mtime_ns
+            except OSError:
+                self._drop(dirs, rel)
+                changed += 1
+                continue
+            if current == mtime:
+                continue
+            changed += 1
+            try:
+                dirs[rel] = entry = self._read(rel)
+            except OSError:
+                self._drop(dirs, rel)
+                continue
+            for name in subdirs - entry[1]:
+                self._drop(dirs, posixpath.join(rel, name))
+            for name in entry[1] - subdirs:
+                self._scan(dirs, posixpath.join(rel, name))
+        with self._lock:
+            self._dirs = dirs
+        log.debug("refreshed %d directories of %s", changed, self.root)
+        return changed
+
+    def exists(self, path):
+        """Return ``True`` if *path*, relative to the root, was indexed"""
+        path = path.strip("/")
+        dirs = self._dirs
+        if path in dirs:
+            return True
+        parent, _, name = path.rpartition("/")
+        entry = dirs.get(parent)
+        return entry is not None and (name in entry[1] or name in entry[2])
+
+    def isdir(self, path):
+        """Return ``True`` if *path*, relative to the root, is an indexed
+        directory
+        """
+        return path.strip("/") in self._dirs
+
+    def listdir(self, path):
+        """Return the names in the directory *path*, relative to the root
+
+        :raises: OSError if *path* is not an indexed directory
+        """
+        entry = self._dirs.get(path.strip("/"))
+        if entry is None:
+            raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        return sorted(entry[1] | entry[2])
+
+    def _load(self):
+        with gzip.open(self.path, "rt") as fh:
+            data = json.load(fh)
+        if data["format"] != self.FORMAT or data["root"] != self.root:
+            raise ValueError("index of another repository or format")
+        self._dirs = dict(
+            (rel, (mtime, frozenset(dirs), frozenset(files)))
+            for rel, (mtime, dirs, files) in data["dirs"].items())
+
+    def save(self):
+        """Write the index to its file, if it has one"""
+        if self.path is None:
+            return
+        with self._lock:
+            dirs = self._dirs
+        data = {
+            "format": self.FORMAT,
+            "root": self.root,
+            "dirs": dict((rel, [mtime, sorted(subdirs), sorted(files)])
+                         for rel, (mtime, subdirs, files) in dirs.items()),
+            }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(directory):
+            os.makedirs(directory, mode=0o700)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb") as fh:
+                    fh.write(json.dumps(data, separators=(",", ":"))
+                             .encode("utf-8"))
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
@@ -15,16 +15,21 @@
 #
 
 
+from io import BytesIO
 import itertools
 import logging
+import pickle
 import re
 
 from lxml import etree
 import six
 
 from .artifact import Artifact
+from .utils import Immutable
+from .utils import LRUCache
 from .utils import memoize
 from .utils import parse_source
+from .versioning import VersionIndex
 from .versioning import VersionRange
 
 EMPTY_POM = """\
@@ -46,22 +51,52 @@ POM_PARSER = etree.XMLParser(
     remove_pis=True,
     )
 PROPERTY_RE = re.compile(r'\$\{(.*?)\}')
+# the parts of a text PropertyInterpolator cares about
+PROPERTY_TOKEN_RE = re.compile(r'\$\{|\}|[^$}]+|\$')
+# a text that is a single reference
+PROPERTY_REF_RE = re.compile(r'\s*\$\{([^${}]*)\}\s*$')
 STRIP_NAMESPACE_RE = re.compile(POM)
 
+# sections of a project or profile that RawPom never reads, RawPom.parse
+# frees them as soon as they are parsed
+UNUSED_SECTIONS = frozenset([
+    "organization", "licenses", "developers", "contributors", "mailingLists",
+    "modules", "scm", "issueManagement", "ciManagement", "build", "reporting",
+    "repositories", "pluginRepositories",
+    ])
+# elements RawPom.parse is told about, in any namespace. Plugins only appear
+# in unused sections, they are freed one by one so a large build section
+# does not pile up before it is freed
+STREAMED_TAGS = ("{*}dependency", "{*}plugin") + tuple(
+    "{*}" + section for section in sorted(UNUSED_SECTIONS))
+
+# child elements read from a dependency, see _childtext
+DEPENDENCY_TAGS = ("groupId", "artifactId", "version", "scope", "optional")
+COORDINATE_TAGS = ("groupId", "artifactId", "version")
+
+# parsed poms shared by every (client, coordinate) lookup, see Pom.fromcache
+POM_CACHE = LRUCache(1024)
+
 log = logging.getLogger(__name__)
 
 
 class Pom(Artifact):
     """Parse a pom file into a python object
+
+    Poms loaded through a client read their document in a single pass into
+    :py:attr:`raw`, see :py:meth:`RawPom.parse`, without building
+    :py:attr:`pom_data`. The whole document is only parsed if
+    :py:attr:`pom_data` is read.
     """
 
     RANGE_CHARS = ('[', '(', ']', ')')
 
-    __slots__ = ("_client", "_parent", "_dep_mgmt", "_dependencies", "_pom_data", "_properties")
+    __slots__ = ("_client", "_parent", "_dep_mgmt", "_dependencies", "_pom_data", "_properties",
+                 "_interpolator", "_raw")
 
     def __init__(self, coordinate, client=None, pom_data=None):
         if pom_data is not None:
-            pom_data = etree.fromstring(pom_data.encode("utf-8"), parser=POM_PARSER)
+            pom_data = parse_pom(BytesIO(pom_data.encode("utf-8")))
         self._pom_data = pom_data
         self._client = client
 
@@ -70,34 +105,21 @@ class Pom(Artifact):
         self._dep_mgmt = None
         self._dependencies = None
         self._properties = None
+        self._interpolator = None
+        self._raw = None
         super(Pom, self).__init__(coordinate)
 
-    def _find_deps(self, elem=None):
-        if elem is None:
-            elem = self.pom_data
+    def _find_deps(self):
         dependencies = {}
 
-        # find all non-optional, compile dependencies
-        deps = _find(elem, "dependencies")
-        if deps is None:
-            return dependencies
-        for elem in _findall(deps, "dependency"):
-            group = _findtext(elem, "groupId")
-            if group is None:
-                log.warning("dependency element without groupId: '%s'", etree.tostring(elem))
-                continue
+        for group, artifact, local_version, local_scope, local_optional in self.raw.dependencies:
             group = self._replace_properties(group)
-            artifact = _findtext(elem, "artifactId")
-            if artifact is None:
-                log.warning("dependency element without artifactId: '%s'", etree.tostring(elem))
-                continue
             artifact = self._replace_properties(artifact)
 
             if (group, artifact) in self.dependency_management:
                 version, scope, optional = self.dependency_management[(group, artifact)]
             else:
                 version = optional = scope = None
-            local_version = _findtext(elem, "version")
             if local_version is not None:
                 version = local_version
             elif version is None:
@@ -107,7 +129,6 @@ class Pom(Artifact):
                 version = "latest.release"
             version = self._replace_properties(version)
 
-            local_scope = _findtext(elem, "scope")
             if local_scope is not None:
                 scope = local_scope
             elif scope is None:
@@ -115,7 +136,6 @@ class Pom(Artifact):
                 scope = "compile"
             scope = scope.strip()
 
-            local_optional = _findtext(elem, "optional")
             if local_optional is not None:
                 optional = local_optional.strip()
             elif optional is None:
@@ -126,41 +146,16 @@ class Pom(Artifact):
             dependencies.setdefault(scope, set()).add(((group, artifact, version), not optional))
         return dependencies
 
-    def _find_dependency_management(self, elem=None):
-        if elem is None:
-            elem = self.pom_data
+    def _find_dependency_management(self, section):
         dep_mgmt = {}
         import_mgmt = {}
 
-        dependency_management = _find(elem, "dependencyManagement")
-        if dependency_management is None:
-            return import_mgmt
-        dependencies = _find(dependency_management, "dependencies")
-        if dependencies is None:
-            return import_mgmt
-        for elem in _findall(dependencies, "dependency"):
-            group = _findtext(elem, "groupId")
-            if group is None:
-                log.warning("dependencyManagement/dependencies/dependency element without groupId: '%s'",
-                            etree.tostring(elem))
-                continue
+        for group, artifact, version, scope, optional in section:
             group = self._replace_properties(group)
-            artifact = _findtext(elem, "artifactId")
-            if artifact is None:
-                log.warning("dependencyManagement/dependencies/dependency element without artifactId: '%s'",
-                            etree.tostring(elem))
-                continue
             artifact = self._replace_properties(artifact)
-            version = _findtext(elem, "version")
-            if version is None:
-                log.warning("dependencyManagement/dependencies/dependency element without version: '%s'",
-                            etree.tostring(elem))
-                continue
             version = self._replace_properties(version)
 
-            optional = _findtext(elem, "optional")
             optional = (optional is not None and optional == "true")
-            scope = _findtext(elem, "scope")
             if scope is not None:
                 scope = scope.strip()
             if scope == "import":
@@ -180,122 +175,37 @@ class Pom(Artifact):
                 dependencies.setdefault(scope, set()).add(((group, artifact, version), not optional))
         return dependencies
 
-    def _find_prerequisites(self, elem=None):
-        if elem is None:
-            elem = self.pom_data
-        properties = {}
-        # get prerequisites
-        prereqs = _find(elem, "prerequisites")
-        if prereqs is None:
-            return properties
-        for elem in prereqs:
-            tag = elem.tag[POM_NAMESPACE_LEN:]
-            properties['prerequisites.' + tag] = elem.text
-            properties['project.prerequisites.' + tag] = elem.text
-        return properties
-
-    def _find_profiles(self, elem=None):
-        if elem is None:
-            elem = self.pom_data
-        active_profiles = []
-        default_profiles = []
-        profiles = _find(elem, "profiles")
-        if profiles is None:
-            return default_profiles
-        for p in _findall(profiles, "profile"):
-            by_default = _findtext(p, "activation/activeByDefault")
-            by_default = by_default is not None and by_default == "true"
-            if by_default:
-                default_profiles.append(p)
-            else:
-                jdk = _findtext(p, "activation/jdk")
-                if jdk is not None:
-                    # attempt some clean up
-                    if (jdk.startswith('[') or jdk.startswith("![")) \
-                            and jdk.endswith(','):
-                        # assume they left off the )
-                        jdk += ')'
-
-                    # TODO: make the JDK version selectable
-                    if jdk.startswith('!'):
-                        vr = VersionRange.fromstring(jdk[1:])
-                        if (vr.version and "1.8" != vr.version) \
-                                or (not vr.version and "1.8" not in vr):
-                            active_profiles.append(p)
-                    else:
-                        vr = VersionRange.fromstring(jdk)
-                        if (vr.version and "1.8" == vr.version) \
-                                or (not vr.version and "1.8" in vr):
-                            active_profiles.append(p)
-        if active_profiles:
-            return active_profiles
-        return default_profiles
-
-    def _find_properties(self, elem=None):
-        if elem is None:
-            elem = self.pom_data
-        properties = {}
-        project_properties = _find(elem, "properties")
-        if project_properties is not None:
-            for prop in project_properties.iterchildren():
-                if prop.tag == POM + 'property':
-                    name = prop.get('name')
-                    value = prop.get('value')
-                else:
-                    name = prop.tag[POM_NAMESPACE_LEN:]
-                    value = prop.text
-                properties[name] = value
-        return properties
-
-    def _find_relocations(self, elem=None):
-        if elem is None:
-            elem = self.pom_data
+    def _find_relocations(self):
         dependencies = {}
         # process distributionManagement for relocation
-        distManagement = _find(elem, "distributionManagement")
-        if distManagement is None:
-            return dependencies
-        relocation = _find(distManagement, "relocation")
-        if relocation is None:
-            return dependencies
-        group = _findtext(relocation, "groupId")
-        if group is None:
-            group = self.group_id
-        else:
-            group = self._replace_properties(group)
+        for group, artifact, version in self.raw.relocations:
+            if group is None:
+                group = self.group_id
+            else:
+                group = self._replace_properties(group)
 
-        artifact = _findtext(relocation, "artifactId")
-        if artifact is None:
-            artifact = self.artifact_id
-        else:
-            artifact = self._replace_properties(artifact)
+            if artifact is None:
+                artifact = self.artifact_id
+            else:
+                artifact = self._replace_properties(artifact)
 
-        version = _findtext(relocation, "version")
-        if version is None:
-            version = self.version
-        else:
-            version = self._replace_properties(version)
-        dependencies.setdefault("relocation", set()).add(((group, artifact, version), True))
+            if version is None:
+                version = self.version
+            else:
+                version = self._replace_properties(version)
+            dependencies.setdefault("relocation", set()).add(((group, artifact, version), True))
         return dependencies
 
     def _pom_factory(self, group, artifact, version):
-        return Pom("%s:%s:pom:%s" % (group, artifact, version), self._client)
+        return Pom.fromcache("%s:%s:pom:%s" % (group, artifact, version),
+                             self._client)
 
     def _replace_properties(self, text, properties=None):
         if properties is None:
-            properties = self.properties
-
-        def subfunc(matchobj):
-            key = matchobj.group(1)
-            return properties.get(key)
-
-        result = PROPERTY_RE.sub(subfunc, text)
-        while result and PROPERTY_RE.match(result):
-            result = PROPERTY_RE.sub(subfunc, result)
-
-        if not result:
-            result = text
-        return result.strip()
+            interpolator = self.interpolator
+        else:
+            interpolator = PropertyInterpolator(properties)
+        return interpolator.interpolate(text)
 
     def pick_version(self, spec, artifacts):
         """Pick a version from *versions* according to the spec
@@ -304,22 +214,31 @@ class Pom(Artifact):
         *versions* that is within the range.
 
         :param str spec: a maven version range spec or gradle dynamic version
-        :param versions: list of available versions for this artifact
-        :type versions: [:py:class:`pymaven.Version`, ...]
+        :param artifacts: available versions of this artifact, newest first,
+                          or a :py:class:`pymaven.versioning.VersionIndex` of
+                          them
+        :type artifacts: [:py:class:`pymaven.Artifact`, ...]
         :return: the newest version that matches the spec
         :rtype: str or None
         """
+        if isinstance(artifacts, VersionIndex):
+            index = artifacts
+            artifacts = reversed(index)
+        else:
+            index = None
+
         if spec in ("latest.release", "release"):
             for a in artifacts:
                 if 'snapshot' not in str(a.version.version).lower():
                     return str(a.version)
         elif spec in ("latest.integration", "latest"):
-            return str(artifacts[0].version)
+            return str(next(iter(artifacts)).version)
 
-        range = VersionRange.fromstring(spec)
-        for artifact in artifacts:
-            if artifact.version in range:
-                return str(artifact.version)
+        if index is None:
+            index = VersionIndex(artifacts)
+        artifact = index.highest(VersionRange.fromstring(spec))
+        if artifact is not None:
+            return str(artifact.version)
 
     @property
     @memoize("_dependencies")
@@ -336,11 +255,6 @@ class Pom(Artifact):
                 six.iteritems(self._find_deps()),
                 six.iteritems(self._find_relocations())):
             dependencies.setdefault(key, set()).update(value)
-        for profile in self._find_profiles():
-            for key, value in itertools.chain(
-                    six.iteritems(self._find_deps(profile)),
-                    six.iteritems(self._find_relocations(profile))):
-                dependencies.setdefault(key, set()).update(value)
         return dependencies
 
     @property
@@ -350,20 +264,15 @@ class Pom(Artifact):
         # add parent's block first so we can override it
         if self.parent is not None:
             dep_mgmt.update(self.parent.dependency_management)
-        dep_mgmt.update(self._find_dependency_management())
-        for profile in self._find_profiles():
-            dep_mgmt.update(self._find_dependency_management(profile))
+        for section in self.raw.dependency_management:
+            dep_mgmt.update(self._find_dependency_management(section))
         return dep_mgmt
 
     @property
     @memoize("_parent")
     def parent(self):
-        parent = _find(self.pom_data, "parent")
-        if parent is not None:
-            group = _findtext(parent, "groupId").strip()
-            artifact = _findtext(parent, "artifactId").strip()
-            version = _findtext(parent, "version").strip()
-            return self._pom_factory(group, artifact, version)
+        if self.raw.parent is not None:
+            return self._pom_factory(*self.raw.parent)
 
     @property
     @memoize("_pom_data")
@@ -371,7 +280,27 @@ class Pom(Artifact):
         if self._client is None:
             return etree.fromstring(EMPTY_POM.format(self), parser=POM_PARSER)
         with self._client.get_artifact(self.coordinate).contents as fh:
-            return etree.parse(fh, parser=POM_PARSER)
+            return parse_pom(fh)
+
+    @property
+    @memoize("_raw")
+    def raw(self):
+        """The :py:class:`RawPom` of the document"""
+        if self._pom_data is None and self._client is not None:
+            with self._client.get_artifact(self.coordinate).contents as fh:
+                return RawPom.parse(self.coordinate, fh)
+        return RawPom.fromelement(self.coordinate, self.pom_data)
+
+    @property
+    @memoize("_interpolator")
+    def interpolator(self):
+        """The :py:class:`PropertyInterpolator` of :py:attr:`properties`, with
+        the ``system_properties`` and ``environment`` of the client
+        """
+        return PropertyInterpolator(
+            self.properties,
+            getattr(self._client, "system_properties", None),
+            getattr(self._client, "environment", None))
 
     @property
     @memoize("_properties")
@@ -395,10 +324,7 @@ class Pom(Artifact):
         properties['pom.artifactId'] = self.artifact_id
         properties['pom.groupId'] = self.group_id
         properties['pom.version'] = str(self.version)
-        properties.update(self._find_properties())
-        properties.update(self._find_prerequisites())
-        for profile in self._find_profiles():
-            properties.update(self._find_properties(profile))
+        properties.update(self.raw.properties)
         return properties
 
     def get_dependencies(self):
@@ -417,6 +343,26 @@ class Pom(Artifact):
             (d for d, r in self.dependencies.get("relocation", set()) if r),
             )
 
+    @classmethod
+    def fromcache(cls, coordinate, client=None):
+        """Return the :ref:`Pom` object for *coordinate* shared through
+        :py:data:`POM_CACHE`.
+
+        Poms are cached per client, so the parent, properties and dependency
+        management of a popular parent are only fetched and parsed once no
+        matter how many children refer to it. Snapshots change, they are not
+        cached here but read through the client each time, whose cache
+        revalidates them once they are older than its ``metadata_ttl``.
+
+        :param str coordinate: the maven coordinates of the POM
+        :param client: a :class:`MavenClient`
+        :returns: a :ref:`Pom` object
+        """
+        if "-SNAPSHOT" in coordinate:
+            return cls(coordinate, client)
+        return POM_CACHE.get_or_create(
+            (client, coordinate), lambda: cls(coordinate, client))
+
     @classmethod
     def parse(cls, coordinate, source, client=None):
         """Return a :ref:`Pom` object loaded with source. ``source`` can be any
@@ -445,17 +391,592 @@ class Pom(Artifact):
         """
         return cls(coordinate, pom_data=text, client=client)
 
+    @classmethod
+    def fromraw(cls, raw, client=None):
+        """Return a :ref:`Pom` object for a :py:class:`RawPom`, without
+        parsing its document again
+
+        :param raw: a :py:class:`RawPom`
+        :param client: a :class:`MavenClient`, for the parent and imported
+                       poms
+        :returns: a :ref:`Pom` object
+        """
+        pom = cls(raw.coordinate, client)
+        pom._raw = raw
+        return pom
+
+
+class RawPom(Immutable):
+    """The parts of a pom document that :py:class:`Pom` reads, before any
+    property is expanded or any parent is looked at
+
+    Extracting them is the part of loading a pom that needs the document.
+    Raw poms are immutable and can be pickled, so a process pool can parse
+    documents and send the results back, see
+    :py:class:`pymaven.batch.PomBatch`. Active profiles are merged in.
+    """
+    __slots__ = ("coordinate", "parent", "properties",
+                 "dependency_management", "dependencies", "relocations")
+
+    def __init__(self, coordinate, parent, properties, dependency_management,
+                 dependencies, relocations):
+        """
+        :param str coordinate: maven coordinate of the pom
+        :param parent: ``(group, artifact, version)`` of the parent pom, or
+                       ``None``
+        :param properties: ``(name, value)`` pairs, later pairs win
+        :param dependency_management: one tuple per section, the project and
+                                      its active profiles, of ``(group,
+                                      artifact, version, scope, optional)``
+        :param dependencies: ``(group, artifact, version, scope, optional)``
+        :param relocations: ``(group, artifact, version)``
+        """
+        self._set("coordinate", coordinate)
+        self._set("parent", parent)
+        self._set("properties", properties)
+        self._set("dependency_management", dependency_management)
+        self._set("dependencies", dependencies)
+        self._set("relocations", relocations)
+
+    def __repr__(self):
+        return "<pymaven.RawPom(%r)>" % self.coordinate
+
+    @classmethod
+    def fromelement(cls, coordinate, root):
+        """Extract the raw pom of the document *root*, as returned by
+        :py:func:`parse_pom`
+        """
+        return cls._extract(coordinate, root, lambda section: (
+            _find_dependency_management(section), _find_deps(section)))
+
+    @classmethod
+    def parse(cls, coordinate, source):
+        """Extract the raw pom of the document *source* in a single pass
+
+        Dependencies are extracted as soon as they are parsed and their
+        elements are freed, and so are the sections listed in
+        :py:data:`UNUSED_SECTIONS`. Only the small sections read at the end,
+        such as the parent, the properties and the profile activations, are
+        kept until the document is read, so a large bom never is in memory
+        as a whole.
+
+        :param source: a file name or a file-like object opened in binary mode
+        :raises: ValueError if *source* is not a pom document
+        """
+        # (managed, declared) dependencies of the project and of each profile
+        found = {}
+        context = etree.iterparse(
+            source, events=("end",), tag=STREAMED_TAGS, recover=True,
+            remove_comments=True, remove_pis=True)
+        for _, elem in context:
+            parent = elem.getparent()
+            tag = _localname(elem.tag)
+            if tag == "plugin":
+                _free(elem)
+                continue
+            if tag != "dependency":
+                if _is_section(parent):
+                    elem.clear()
+                continue
+            owner = parent.getparent()
+            if owner is None or _localname(parent.tag) != "dependencies":
+                continue
+            managed = _localname(owner.tag) == "dependencyManagement"
+            section = owner.getparent() if managed else owner
+            if not _is_section(section):
+                # such as the dependencies of a plugin
+                continue
+            managed_dependencies, dependencies = found.setdefault(
+                section, ([], []))
+            if managed:
+                dependency = _managed_dependency(elem)
+                if dependency is not None:
+                    managed_dependencies.append(dependency)
+            else:
+                dependency = _dependency(elem)
+                if dependency is not None:
+                    dependencies.append(dependency)
+            _free(elem)
+
+        root = context.root
+        if root is None or not isinstance(root.tag, six.string_types) \
+                or _localname(root.tag) != "project":
+            raise ValueError("not a pom document")
+        return cls._extract(coordinate, root,
+                            lambda section: found.get(section, ((), ())))
+
+    @classmethod
+    def fromstring(cls, coordinate, data):
+        """Parse the pom document *data*, bytes or text, and extract its raw
+        pom, see :py:meth:`parse`
+
+        :raises: ValueError if *data* is not a pom document
+        """
+        if isinstance(data, six.text_type):
+            data = data.encode("utf-8")
+        return cls.parse(coordinate, BytesIO(data))
+
+    @classmethod
+    def _extract(cls, coordinate, root, find_dependencies):
+        """Return the raw pom of the document *root*
+
+        :param find_dependencies: returns the managed and the declared
+                                  dependencies of the project or of one of
+                                  its profiles
+        """
+        parent = _find(root, "parent")
+        if parent is not None:
+            parent = tuple(text.strip() for text
+                           in _childtext(parent, COORDINATE_TAGS))
+        profiles = _find_profiles(root)
+        properties = _find_properties(root)
+        properties.extend(_find_prerequisites(root))
+        managed_dependencies, dependencies = find_dependencies(root)
+        dependency_management = [tuple(managed_dependencies)]
+        dependencies = list(dependencies)
+        relocations = _find_relocations(root)
+        for profile in profiles:
+            properties.extend(_find_properties(profile))
+            managed_dependencies, profile_dependencies = \
+                find_dependencies(profile)
+            dependency_management.append(tuple(managed_dependencies))
+            dependencies.extend(profile_dependencies)
+            relocations.extend(_find_relocations(profile))
+        return cls(coordinate, parent, tuple(properties),
+                   tuple(dependency_management), tuple(dependencies),
+                   tuple(relocations))
+
+
+class PropertyInterpolator(object):
+    """Expand ``${name}`` references to properties
+
+    The values of *properties* are expanded once, in dependency order,
+    when the interpolator is created, so expanding a text is a single scan
+    with one dictionary lookup per reference. References may be nested, as
+    in ``${a.${b}}``. Properties that refer to themselves, directly or
+    through others, are reported and left unexpanded.
+
+    *system_properties* override *properties* and are not expanded, and
+    ``${env.NAME}`` is looked up in *environment*, pass ``os.environ`` to
+    use the environment of the process. References that can not be
+    resolved are kept as they are.
+    """
+    __slots__ = ("_raw", "_table", "_system", "_environment")
+
+    def __init__(self, properties, system_properties=None, environment=None):
+        self._raw = properties
+        self._system = system_properties or {}
+        self._environment = environment or {}
+        self._table = table = {}
+        pending = []
+        for name, value in properties.items():
+            if value is None or "${" in value:
+                pending.append(name)
+            else:
+                table[name] = value.strip()
+        for name in pending:
+            self._resolve(name, [])
+
+    def _resolve(self, name, stack):
+        """Return the expanded value of the property *name*, or ``None`` if
+        it can not be fully expanded
+        """
+        if name in self._table:
+            return self._table[name]
+        if name in stack:
+            log.warning("property %s refers to itself: %s", name,
+                        " -> ".join(stack[stack.index(name):] + [name]))
+            return None
+        value = self._raw.get(name)
+        if value is not None:
+            stack.append(name)
+            value, complete = self._expand(
+                value.strip(), lambda key: self._lookup(key, stack))
+            stack.pop()
+            if not complete:
+                value = None
+        self._table[name] = value
+        return value
+
+    def _lookup(self, key, stack=None):
+        if key in self._system:
+            return self._system[key]
+        if key.startswith("env."):
+            return self._environment.get(key[4:])
+        if key in self._table:
+            return self._table[key]
+        if stack is not None:
+            return self._resolve(key, stack)
+        return None
+
+    def _expand(self, text, lookup):
+        """Expand the references in *text* with *lookup*
+
+        :return: the expanded text and whether every reference was resolved
+        """
+        if "${" not in text:
+            return text, True
+        complete = True
+        # one buffer for the text and one per open reference
+        buffers = [[]]
+        for token in PROPERTY_TOKEN_RE.findall(text):
+            if token == "${":
+                buffers.append([])
+            elif token == "}" and len(buffers) > 1:
+                key = "".join(buffers.pop())
+                value = lookup(key)
+                if value is None:
+                    complete = False
+                    value = "${%s}" % key
+                buffers[-1].append(value)
+            else:
+                buffers[-1].append(token)
+        while len(buffers) > 1:
+            # not closed
+            complete = False
+            text = "${" + "".join(buffers.pop())
+            buffers[-1].append(text)
+        return "".join(buffers[0]), complete
+
+    def get(self, name, default=None):
+        """Return the expanded value of the property *name*"""
+        value = self._lookup(name)
+        return default if value is None else value
+
+    def interpolate(self, text):
+        """Return *text*, stripped, with its references expanded"""
+        if "${" not in text:
+            return text.strip()
+        match = PROPERTY_REF_RE.match(text)
+        if match is not None:
+            value = self._lookup(match.group(1))
+            if value:
+                return value
+        result = self._expand(text, self._lookup)[0].strip()
+        if not result:
+            return text.strip()
+        return result
+
+
+class EffectiveModel(Immutable):
+    """The resolved content of a :py:class:`Pom`, without its xml
+
+    Holds the parent, interpolated properties, dependency management and
+    dependencies of a pom once its parents and imports have been applied,
+    as tuples of strings. Models are immutable and small, and are serialized with
+    :py:meth:`dumps` so a later process can load one instead of fetching,
+    parsing and resolving the pom and its parents again.
+    """
+    __slots__ = ("coordinate", "parent", "properties",
+                 "dependency_management", "dependencies")
+
+    #: version of the serialized form, models of other versions are not loaded
+    FORMAT = 1
+
+    def __init__(self, coordinate, parent, properties, dependency_management,
+                 dependencies):
+        """Create a model, see :py:meth:`frompom`
+
+        :param str coordinate: the coordinate of the pom
+        :param parent: the coordinate of the parent pom, or ``None``
+        :param properties: sorted ``(name, value)`` pairs
+        :param dependency_management: sorted ``((group, artifact),
+                                      (version, scope, optional))`` pairs
+        :param dependencies: sorted ``(scope, dependencies)`` pairs, the
+                             dependencies are sorted
+                             ``((group, artifact, version), required)`` pairs
+        """
+        self._set("coordinate", coordinate)
+        self._set("parent", parent)
+        self._set("properties", properties)
+        self._set("dependency_management", dependency_management)
+        self._set("dependencies", dependencies)
+
+    def __repr__(self):
+        return "<pymaven.EffectiveModel(%r)>" % self.coordinate
+
+    def get_dependencies(self, scope):
+        """Return the ``((group, artifact, version), required)`` pairs of
+        *scope*
+        """
+        for name, dependencies in self.dependencies:
+            if name == scope:
+                return dependencies
+        return ()
+
+    @classmethod
+    def frompom(cls, pom):
+        """Resolve *pom* and return its model"""
+        parent = pom.parent
+        if parent is not None:
+            parent = parent.coordinate
+        properties = tuple(sorted(
+            (name, pom._replace_properties(value))
+            for name, value in six.iteritems(pom.properties)
+            if value is not None))
+        dependency_management = tuple(sorted(
+            ((group, artifact), (str(version), scope, optional))
+            for (group, artifact), (version, scope, optional)
+            in six.iteritems(pom.dependency_management)))
+        dependencies = tuple(sorted(
+            (scope, tuple(sorted(
+                (tuple(str(part) for part in dependency), required)
+                for dependency, required in values)))
+            for scope, values in six.iteritems(pom.dependencies)))
+        return cls(pom.coordinate, parent, properties, dependency_management,
+                   dependencies)
+
+    def dumps(self):
+        """Serialize the model to bytes"""
+        return pickle.dumps((self.FORMAT,) + self._state(),
+                            pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def loads(cls, data):
+        """Load a model serialized by :py:meth:`dumps`
+
+        Only tuples, strings, booleans and ``None`` are accepted, the data
+        can not make python import or call anything.
+
+        :raises: ValueError if *data* is not a model of this version
+        """
+        try:
+            state = _ModelUnpickler(BytesIO(data)).load()
+        except Exception as e:
+            raise ValueError("invalid effective model: %s" % e)
+        if not isinstance(state, tuple) or state[:1] != (cls.FORMAT,) \
+                or len(state) != 6:
+            raise ValueError("invalid effective model")
+        return cls(*state[1:])
+
+
+class _ModelUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError("%s.%s is not allowed" % (module, name))
+
+
+def _localname(tag):
+    return tag.rpartition("}")[2]
+
+
+def _free(elem):
+    """Free *elem*, once parsed, and the siblings parsed before it"""
+    elem.clear()
+    parent = elem.getparent()
+    while elem.getprevious() is not None:
+        del parent[0]
+
+
+def _is_section(elem):
+    """Return ``True`` if *elem* is the project or one of its profiles"""
+    if elem is None:
+        return False
+    parent = elem.getparent()
+    if parent is None:
+        return True
+    return (_localname(elem.tag) == "profile"
+            and _localname(parent.tag) == "profiles"
+            and parent.getparent() is not None
+            and parent.getparent().getparent() is None)
+
+
+def parse_pom(source):
+    """Parse a pom document
+
+    :param source: a file name or a file-like object opened in binary mode
+    :return: the root element of the document
+    """
+    return etree.parse(source, parser=POM_PARSER).getroot()
+
+
+def _find_deps(elem):
+    dependencies = []
+    deps = _find(elem, "dependencies")
+    if deps is None:
+        return dependencies
+    for elem in _findall(deps, "dependency"):
+        dependency = _dependency(elem)
+        if dependency is not None:
+            dependencies.append(dependency)
+    return dependencies
+
+
+def _dependency(elem):
+    """Return the ``(group, artifact, version, scope, optional)`` of the
+    dependency *elem*, or ``None`` if it is incomplete
+    """
+    dependency = _childtext(elem, DEPENDENCY_TAGS)
+    if dependency[0] is None:
+        log.warning("dependency element without groupId: '%s'", etree.tostring(elem))
+        return None
+    if dependency[1] is None:
+        log.warning("dependency element without artifactId: '%s'", etree.tostring(elem))
+        return None
+    return dependency
+
+
+def _find_dependency_management(elem):
+    dep_mgmt = []
+    dependency_management = _find(elem, "dependencyManagement")
+    if dependency_management is None:
+        return dep_mgmt
+    dependencies = _find(dependency_management, "dependencies")
+    if dependencies is None:
+        return dep_mgmt
+    for elem in _findall(dependencies, "dependency"):
+        dependency = _managed_dependency(elem)
+        if dependency is not None:
+            dep_mgmt.append(dependency)
+    return dep_mgmt
+
+
+def _managed_dependency(elem):
+    """Return the ``(group, artifact, version, scope, optional)`` of the
+    managed dependency *elem*, or ``None`` if it is incomplete
+    """
+    group, artifact, version, scope, optional = _childtext(
+        elem, DEPENDENCY_TAGS)
+    if group is None:
+        log.warning("dependencyManagement/dependencies/dependency element without groupId: '%s'",
+                    etree.tostring(elem))
+        return None
+    if artifact is None:
+        log.warning("dependencyManagement/dependencies/dependency element without artifactId: '%s'",
+                    etree.tostring(elem))
+        return None
+    if version is None:
+        log.warning("dependencyManagement/dependencies/dependency element without version: '%s'",
+                    etree.tostring(elem))
+        return None
+    return (group, artifact, version, scope, optional)
+
+
+def _find_prerequisites(elem):
+    properties = []
+    # get prerequisites
+    prereqs = _find(elem, "prerequisites")
+    if prereqs is None:
+        return properties
+    for elem in prereqs:
+        tag = _localname(elem.tag)
+        properties.append(('prerequisites.' + tag, elem.text))
+        properties.append(('project.prerequisites.' + tag, elem.text))
+    return properties
+
+
+def _find_profiles(elem):
+    active_profiles = []
+    default_profiles = []
+    profiles = _find(elem, "profiles")
+    if profiles is None:
+        return default_profiles
+    for p in _findall(profiles, "profile"):
+        by_default = _findtext(p, "activation/activeByDefault")
+        by_default = by_default is not None and by_default == "true"
+        if by_default:
+            default_profiles.append(p)
+        else:
+            jdk = _findtext(p, "activation/jdk")
+            if jdk is not None:
+                # attempt some clean up
+                if (jdk.startswith('[') or jdk.startswith("![")) \
+                        and jdk.endswith(','):
+                    # assume they left off the )
+                    jdk += ')'
+
+                # TODO: make the JDK version selectable
+                if jdk.startswith('!'):
+                    vr = VersionRange.fromstring(jdk[1:])
+                    if (vr.version and "1.8" != vr.version) \
+                            or (not vr.version and "1.8" not in vr):
+                        active_profiles.append(p)
+                else:
+                    vr = VersionRange.fromstring(jdk)
+                    if (vr.version and "1.8" == vr.version) \
+                            or (not vr.version and "1.8" in vr):
+                        active_profiles.append(p)
+    if active_profiles:
+        return active_profiles
+    return default_profiles
+
+
+def _find_properties(elem):
+    properties = []
+    project_properties = _find(elem, "properties")
+    if project_properties is not None:
+        for prop in project_properties.iterchildren():
+            name = _localname(prop.tag)
+            if name == 'property':
+                name = prop.get('name')
+                value = prop.get('value')
+            else:
+                value = prop.text
+            properties.append((name, value))
+    return properties
+
+
+def _find_relocations(elem):
+    relocations = []
+    # process distributionManagement for relocation
+    distManagement = _find(elem, "distributionManagement")
+    if distManagement is None:
+        return relocations
+    relocation = _find(distManagement, "relocation")
+    if relocation is None:
+        return relocations
+    relocations.append(_childtext(relocation, COORDINATE_TAGS))
+    return relocations
+
+
+# (namespace, path or tags) -> qualified path or tags, see _qualify
+_QUALIFIED = {}
+
+
+def _qualify(elem, path):
+    """Return *path*, a ``/`` separated path or a tuple of tags, with every
+    step in the namespace of *elem*
+
+    Old poms do not declare the pom namespace, their paths are left bare.
+    The results are memoized, and lxml keeps the compiled form of the paths
+    it has seen, so a lookup does not build or compile anything.
+    """
+    tag = elem.tag
+    if tag.startswith(POM):
+        namespace = POM
+    elif tag.startswith("{"):
+        namespace = tag[:tag.index("}") + 1]
+    else:
+        namespace = ""
+    try:
+        return _QUALIFIED[(namespace, path)]
+    except KeyError:
+        pass
+    if isinstance(path, tuple):
+        qualified = tuple(namespace + step for step in path)
+    else:
+        qualified = namespace + path.replace("/", "/" + namespace)
+    _QUALIFIED[(namespace, path)] = qualified
+    return qualified
+
+
+def _childtext(elem, tags):
+    """Return the text of the first child of *elem* with each of *tags*,
+    as :py:meth:`findtext` would, in a single pass over the children
+    """
+    texts = {}
+    for child in elem:
+        if child.tag not in texts:
+            texts[child.tag] = child.text or ""
+    return tuple(texts.get(tag) for tag in _qualify(elem, tags))
+
 
 def _find(elem, tag):
-    tag = tag.replace("/", "/" + POM)
-    return elem.find(POM + tag)
+    return elem.find(_qualify(elem, tag))
 
 
 def _findall(elem, tag):
-    tag = tag.replace("/", "/" + POM)
-    return elem.findall(POM + tag)
+    return elem.findall(_qualify(elem, tag))
 
 
 def _findtext(elem, tag):
-    tag = tag.replace("/", "/" + POM)
-    return elem.findtext(POM + tag)
+    return elem.findtext(_qualify(elem, tag))
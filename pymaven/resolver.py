@@ -0,0 +1,278 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Transitive dependency resolution
+"""
+
+from collections import OrderedDict
+from concurrent import futures
+import logging
+
+from .artifact import Artifact
+from .errors import MissingArtifactError
+from .versioning import VersionIndex
+from .versioning import VersionRange
+
+# dependency scopes that are followed by default
+DEFAULT_SCOPES = ("compile", "runtime", "relocation")
+
+# gradle style dynamic versions understood by Pom.pick_version
+DYNAMIC_VERSIONS = ("latest", "latest.integration", "latest.release",
+                    "release")
+
+log = logging.getLogger(__name__)
+
+
+class DependencyGraph(object):
+    """The flattened result of a dependency resolution
+
+    Every ``(groupId, artifactId)`` appears at most once in the graph, with the
+    version selected by maven's nearest-wins mediation.
+    """
+    __slots__ = ("nodes", "depths", "edges", "missing", "conflicts")
+
+    def __init__(self):
+        #: (groupId, artifactId) -> selected version, in breadth-first order
+        self.nodes = OrderedDict()
+        #: (groupId, artifactId) -> distance from the nearest root
+        self.depths = {}
+        #: (groupId, artifactId) -> list of direct (groupId, artifactId)
+        self.edges = {}
+        #: (groupId, artifactId, version spec) that could not be found
+        self.missing = set()
+        #: (groupId, artifactId) -> version specs whose ranges do not overlap
+        self.conflicts = {}
+
+    def __contains__(self, key):
+        return key in self.nodes
+
+    def __iter__(self):
+        for (group, artifact), version in self.nodes.items():
+            yield "%s:%s:%s" % (group, artifact, version)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return "<%s.DependencyGraph(%d nodes)>" % (self.__module__,
+                                                   len(self.nodes))
+
+
+class DependencyResolver(object):
+    """Compute the transitive closure of a set of maven artifacts
+
+    The graph is walked breadth-first. All POMs of one level are fetched and
+    parsed concurrently by a pool of *workers* threads, so the time to resolve
+    a graph grows with its depth rather than with its number of nodes. The
+    published versions of an artifact are listed at most once per resolution.
+
+    When several POMs of the same depth declare a dependency, their version
+    ranges are intersected before any version listing is fetched.
+
+    :param client: a :py:class:`pymaven.client.MavenClient`
+    :param int workers: number of POMs to fetch at the same time
+    :param scopes: dependency scopes to follow
+    """
+    def __init__(self, client, workers=8, scopes=DEFAULT_SCOPES):
+        self._client = client
+        self._workers = workers
+        self._scopes = scopes
+        self._indexes = {}
+
+    def _children(self, pom):
+        """Return the dependencies of *pom* that should be followed, in the
+        order they are declared
+
+        Dependencies that are not declared by the document itself, such as
+        imports and relocations, come after, sorted.
+        """
+        parent = pom.parent
+        if parent is not None:
+            parent = (parent.group_id, parent.artifact_id, str(parent.version))
+        # pom.dependencies holds sets, the order comes from the raw pom
+        declared = OrderedDict()
+        for group, artifact, _, _, _ in pom.raw.dependencies:
+            declared.setdefault((pom._replace_properties(group),
+                                 pom._replace_properties(artifact)),
+                                len(declared))
+        children = set()
+        for scope in self._scopes:
+            for dependency, required in pom.dependencies.get(scope, ()):
+                dependency = tuple(str(d) for d in dependency)
+                if required and dependency != parent:
+                    children.add(dependency)
+        return sorted(children, key=lambda dependency: (
+            declared.get(dependency[:2], len(declared)), dependency))
+
+    def _mediate(self, declarations):
+        """Combine the version specs declared for one artifact at the same
+        depth into a single version range
+
+        The ranges are intersected, keeping the recommended version of the
+        first declaration if it is still allowed. Only the intervals are
+        looked at, the published versions are not listed.
+
+        :param declarations: ``(version spec, declaring POM)`` pairs in the
+                             order they were found
+        :return: the first spec, the combined range (``None`` for a dynamic
+                 version) and the first declaring POM
+        """
+        spec, declared_by = declarations[0]
+        if spec in DYNAMIC_VERSIONS:
+            return spec, None, declared_by
+        version_range = VersionRange.fromstring(spec)
+        for other, _ in declarations[1:]:
+            if other in DYNAMIC_VERSIONS:
+                continue
+            combined = version_range.restrict(VersionRange.fromstring(other))
+            if combined.is_empty:
+                # keep the nearest, first declaration
+                break
+            version_range = combined
+        return spec, version_range, declared_by
+
+    def _conflicts(self, specs):
+        """Return True if no version satisfies all hard ranges in *specs*"""
+        version_range = VersionRange.fromstring("[,)")
+        for spec in specs:
+            if spec not in DYNAMIC_VERSIONS:
+                version_range = version_range.restrict(
+                    VersionRange.fromstring(spec))
+                if version_range.is_empty:
+                    return True
+        return False
+
+    def _select_version(self, group, artifact, spec, version_range,
+                        declared_by):
+        """Turn the version *spec* of a dependency, mediated into
+        *version_range*, into a concrete version
+
+        :return: the version or ``None`` if no published version matches
+        """
+        if version_range is not None and version_range.version is not None:
+            return str(version_range.version)
+        index = self._indexes[(group, artifact)]
+        if not index:
+            return None
+        if version_range is None:
+            return declared_by.pick_version(spec, index)
+        match = index.highest(version_range)
+        if match is not None:
+            return str(match.version)
+
+    def _list_versions(self, key):
+        """Return the :py:class:`pymaven.versioning.VersionIndex` of the
+        published versions of *key*
+
+        Runs in a worker thread.
+        """
+        return VersionIndex(self._client.find_artifacts("%s:%s" % key))
+
+    def _visit(self, node):
+        """Fetch the POM of *node*
+
+        Runs in a worker thread.
+
+        :return: the selected version and the parsed POM, or ``(None, None)``
+                 if the artifact cannot be found
+        """
+        group, artifact, spec, version_range, declared_by = node
+        if declared_by is None:
+            version = spec
+        else:
+            version = self._select_version(group, artifact, spec,
+                                           version_range, declared_by)
+        if version is None:
+            return None, None
+        try:
+            pom = self._client.get_metadata(
+                "%s:%s:pom:%s" % (group, artifact, version))
+            # evaluate the dependencies here so their parents and imports
+            # are fetched by the worker
+            pom.dependencies
+        except MissingArtifactError:
+            return None, None
+        return version, pom
+
+    def resolve(self, *coordinates):
+        """Resolve the transitive dependencies of *coordinates*
+
+        :param coordinates: maven coordinates with concrete versions
+        :return: the resolved graph, including the roots
+        :rtype: :py:class:`DependencyGraph`
+        """
+        self._indexes.clear()
+        graph = DependencyGraph()
+        level = []
+        for coordinate in coordinates:
+            root = Artifact(coordinate)
+            key = (root.group_id, root.artifact_id)
+            if key not in graph.depths:
+                graph.depths[key] = 0
+                level.append((root.group_id, root.artifact_id,
+                              str(root.version), None, None))
+
+        declared = {}
+        depth = 0
+        with futures.ThreadPoolExecutor(max_workers=self._workers) as pool:
+            while level:
+                depth += 1
+                # the versions are listed before the level is visited, so
+                # the workers only read the indexes
+                listed = [node[:2] for node in level
+                          if node[4] is not None
+                          and (node[3] is None or node[3].version is None)
+                          and node[:2] not in self._indexes]
+                for key, index in zip(listed,
+                                      pool.map(self._list_versions, listed)):
+                    self._indexes[key] = index
+                next_level = OrderedDict()
+                for node, (version, pom) in zip(level,
+                                                pool.map(self._visit, level)):
+                    group, artifact, spec = node[:3]
+                    key = (group, artifact)
+                    if pom is None:
+                        log.warning("unable to resolve %s:%s:%s", group,
+                                    artifact, spec)
+                        graph.missing.add((group, artifact, spec))
+                        del graph.depths[key]
+                        continue
+                    graph.nodes[key] = version
+                    edges = graph.edges[key] = []
+                    for child_group, child_artifact, child_spec in \
+                            self._children(pom):
+                        child_key = (child_group, child_artifact)
+                        edges.append(child_key)
+                        declared.setdefault(child_key, []).append(child_spec)
+                        # nearest wins: the declarations seen at the
+                        # shallowest depth decide the version
+                        if child_key not in graph.depths:
+                            graph.depths[child_key] = depth
+                            next_level[child_key] = []
+                        if child_key in next_level:
+                            next_level[child_key].append((child_spec, pom))
+                level = [key + self._mediate(declarations)
+                         for key, declarations in next_level.items()]
+        for edges in graph.edges.values():
+            edges[:] = [key for key in edges if key in graph.nodes]
+        for key, specs in declared.items():
+            if len(specs) > 1 and self._conflicts(specs):
+                log.warning("conflicting version ranges for %s:%s: %s",
+                            key[0], key[1], ", ".join(specs))
+                graph.conflicts[key] = specs
+        return graph
@@ -15,10 +15,12 @@
 #
 
 
+from collections import OrderedDict
 from functools import wraps
 from io import IOBase
 from io import open
 import posixpath
+import threading
 
 from six.moves.urllib.parse import urlsplit
 from six.moves.urllib.parse import urlunsplit
@@ -42,6 +44,144 @@ def cmp(x, y):
     return (x > y) - (x < y)
 
 
+class Immutable(object):
+    """Base for value objects whose attributes are set once by the
+    constructor with :py:meth:`_set` and can not be changed afterwards
+
+    Objects compare, hash and pickle by :py:meth:`_state`, the values of
+    their ``__slots__`` in order, so subclasses whose constructor takes its
+    slots in that order need no more than ``__slots__`` and ``__init__``.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s objects are immutable"
+                             % self.__class__.__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("%s objects are immutable"
+                             % self.__class__.__name__)
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return NotImplemented
+        return self._state() == other._state()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._state())
+
+    def __reduce__(self):
+        return (self.__class__, self._state())
+
+    def _set(self, name, value):
+        object.__setattr__(self, name, value)
+
+    def _state(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+class LRUCache(object):
+    """A bounded, thread-safe mapping that discards the least recently used
+    entry once it holds *maxsize* entries
+
+    >>> cache = LRUCache(2)
+    >>> cache.get_or_create("a", lambda: 1)
+    1
+    >>> cache.get_or_create("a", lambda: 2)
+    1
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def hit_ratio(self):
+        """Fraction of lookups that were answered from the cache"""
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_or_create(self, key, factory):
+        """Return the value stored for *key*, storing the result of calling
+        *factory* first if there is none
+
+        *factory* is called without holding the cache's lock, so it may use
+        the cache itself. If two threads race to create the same key, both
+        get the value that was stored first.
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+        value = factory()
+        with self._lock:
+            value = self._data.setdefault(key, value)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        """Drop *key* from the cache if it is present"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_if(self, predicate):
+        """Drop every entry whose key *predicate* returns true for
+
+        :return: the number of entries dropped
+        """
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return a dictionary describing the usage of the cache"""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+        }
+
+
 def memoize(name):
     def wrap(func):
         @wraps(func)
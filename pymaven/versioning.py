@@ -19,6 +19,7 @@
 Versioning of artifacts
 """
 
+import bisect
 import functools
 import sys
 
@@ -27,6 +28,8 @@ import six
 
 from .errors import RestrictionParseError
 from .errors import VersionRangeParseError
+from .utils import Immutable
+from .utils import LRUCache
 
 if sys.version_info > (2,):
     from .utils import cmp
@@ -47,14 +50,122 @@ ALIASES = {
 }
 
 
+# Leading element of the sort key of each kind of version item
+_STRING_ITEM = 0
+_LIST_ITEM = 1
+_INT_ITEM = 2
+# Sort key value of the release qualifier, and of the padding versions are
+# extended with when they are compared, see Version._sort_key
+_RELEASE_VALUE = str(QUALIFIERS.index("") + 1)
+_END_KEY = (_LIST_ITEM, ((_STRING_ITEM, _RELEASE_VALUE),), 1)
+_LOW_ZERO_KEY = (_LIST_ITEM, ((_STRING_ITEM, _RELEASE_VALUE),), 0)
+_ZERO_KEY = (_INT_ITEM, 0)
+
+
+# Parsed versions, ranges and restrictions shared by their fromstring methods
+INTERN_CACHE = LRUCache(16384)
+
+
 def list2tuple(li):
     return tuple(list2tuple(x) if isinstance(x, list) else x for x in li)
 
 
+def _lower_key(restriction):
+    """Sort key of the lower bound of *restriction*
+
+    An unbounded lower end sorts first, and an exclusive bound sorts after an
+    inclusive one on the same version.
+    """
+    if restriction.lower_bound is None:
+        return (0,)
+    return (1, restriction.lower_bound._key,
+            0 if restriction.lower_bound_inclusive else 1)
+
+
+def _upper_key(restriction):
+    """Sort key of the upper bound of *restriction*
+
+    An unbounded upper end sorts last, and an exclusive bound sorts before an
+    inclusive one on the same version.
+    """
+    if restriction.upper_bound is None:
+        return (2,)
+    return (1, restriction.upper_bound._key,
+            1 if restriction.upper_bound_inclusive else 0)
+
+
+def _join(lower, upper):
+    """Return the restriction from the lower bound of *lower* to the upper
+    bound of *upper*, or ``None`` if no version lies between them
+    """
+    if lower.lower_bound is not None and upper.upper_bound is not None:
+        lower_key = lower.lower_bound._key
+        upper_key = upper.upper_bound._key
+        if lower_key > upper_key or (lower_key == upper_key and not (
+                lower.lower_bound_inclusive and upper.upper_bound_inclusive)):
+            return None
+    if lower is upper:
+        return lower
+    return Restriction._from_parts(lower.lower_bound,
+                                   lower.lower_bound_inclusive,
+                                   upper.upper_bound,
+                                   upper.upper_bound_inclusive)
+
+
+def _touches(left, right):
+    """Return True if *right*, which does not start before *left*, overlaps
+    or is adjacent to *left*
+    """
+    if left.upper_bound is None or right.lower_bound is None:
+        return True
+    upper_key = left.upper_bound._key
+    lower_key = right.lower_bound._key
+    return lower_key < upper_key or (lower_key == upper_key and (
+        left.upper_bound_inclusive or right.lower_bound_inclusive))
+
+
+def _normalize(restrictions):
+    """Merge the overlapping and adjacent restrictions of a list that is
+    sorted by lower bound
+
+    :param restrictions: restrictions sorted by :py:func:`_lower_key`
+    :return: disjoint, non-adjacent restrictions
+    :rtype: [Restriction, ...]
+    """
+    result = []
+    for restriction in restrictions:
+        if result and _touches(result[-1], restriction):
+            last = result[-1]
+            if _upper_key(restriction) > _upper_key(last):
+                result[-1] = _join(last, restriction)
+        else:
+            result.append(restriction)
+    return result
+
+
+class _Immutable(Immutable):
+    """Base for value objects that are shared through :py:data:`INTERN_CACHE`
+
+    They are rebuilt from their string form when unpickled.
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return (self.__class__.fromstring, (str(self),))
+
+    @classmethod
+    def fromstring(cls, spec):
+        """Return the shared object for *spec*, parsing it if needed"""
+        return INTERN_CACHE.get_or_create((cls, spec), lambda: cls(spec))
+
+
 @functools.total_ordering
-class Restriction(object):
+class Restriction(_Immutable):
     """Describes a restriction in versioning
     """
+    __slots__ = ("lower_bound", "lower_bound_inclusive", "upper_bound",
+                 "upper_bound_inclusive")
+
     def __init__(self, spec=None):
         """Create a restriction
 
@@ -73,39 +184,54 @@ class Restriction(object):
 
         :param str spec: Restriction specification
         """
-        self.lower_bound = None
-        self.upper_bound = None
-        self.lower_bound_inclusive = False
-        self.upper_bound_inclusive = False
-
-        if not spec:
-            return
-
-        self.lower_bound_inclusive = (spec.strip()[0] == INCLUSIVE_OPEN)
-        self.upper_bound_inclusive = (spec.strip()[-1] == INCLUSIVE_CLOSE)
-
-        _spec = spec[1:-1].strip()
-        if ',' in _spec:
-            lower_bound, upper_bound = _spec.split(',')
-            if lower_bound and lower_bound == upper_bound:
-                raise RestrictionParseError(
-                    "Range cannot have identical boundaries: %s" % spec)
-
-            self.lower_bound = Version(lower_bound) if lower_bound else None
-            self.upper_bound = Version(upper_bound) if upper_bound else None
-
-            if self.lower_bound and self.upper_bound \
-                    and self.upper_bound < self.lower_bound:
-                raise RestrictionParseError(
-                    "Range defies version ordering: %s" % spec)
-        else:
-            # single version restriction
-            if not self.lower_bound_inclusive or not self.upper_bound_inclusive:
-                raise RestrictionParseError(
-                    "Single version must be surrounded by []: %s" % spec)
-            version = Version(_spec)
-            self.lower_bound = version
-            self.upper_bound = version
+        lower_bound = None
+        upper_bound = None
+        lower_bound_inclusive = False
+        upper_bound_inclusive = False
+
+        if spec:
+            lower_bound_inclusive = (spec.strip()[0] == INCLUSIVE_OPEN)
+            upper_bound_inclusive = (spec.strip()[-1] == INCLUSIVE_CLOSE)
+
+            _spec = spec[1:-1].strip()
+            if ',' in _spec:
+                lower_bound, upper_bound = _spec.split(',')
+                if lower_bound and lower_bound == upper_bound:
+                    raise RestrictionParseError(
+                        "Range cannot have identical boundaries: %s" % spec)
+
+                lower_bound = (Version.fromstring(lower_bound)
+                               if lower_bound else None)
+                upper_bound = (Version.fromstring(upper_bound)
+                               if upper_bound else None)
+
+                if lower_bound and upper_bound and upper_bound < lower_bound:
+                    raise RestrictionParseError(
+                        "Range defies version ordering: %s" % spec)
+            else:
+                # single version restriction
+                if not lower_bound_inclusive or not upper_bound_inclusive:
+                    raise RestrictionParseError(
+                        "Single version must be surrounded by []: %s" % spec)
+                lower_bound = upper_bound = Version.fromstring(_spec)
+
+        self._set("lower_bound", lower_bound)
+        self._set("upper_bound", upper_bound)
+        self._set("lower_bound_inclusive", lower_bound_inclusive)
+        self._set("upper_bound_inclusive", upper_bound_inclusive)
+
+    @classmethod
+    def _from_parts(cls, lower_bound, lower_bound_inclusive, upper_bound,
+                    upper_bound_inclusive):
+        """Create a restriction from already parsed bounds"""
+        restriction = cls.__new__(cls)
+        restriction._set("lower_bound", lower_bound)
+        restriction._set("upper_bound", upper_bound)
+        restriction._set("lower_bound_inclusive",
+                         lower_bound is not None and lower_bound_inclusive)
+        restriction._set("upper_bound_inclusive",
+                         upper_bound is not None and upper_bound_inclusive)
+        return restriction
 
     def __contains__(self, version):
         """Return true if version is contained within the restriction
@@ -136,7 +262,7 @@ class Restriction(object):
 
         if not isinstance(other, self.__class__):
             if isinstance(other, six.string_types):
-                return cmp(self, self.__class__(other))
+                return cmp(self, self.__class__.fromstring(other))
             return 1
 
         result = cmp(self.lower_bound, other.lower_bound)
@@ -168,7 +294,8 @@ class Restriction(object):
             open=(INCLUSIVE_OPEN if self.lower_bound_inclusive
                   else EXCLUSIVE_OPEN),
             lower=self.lower_bound if self.lower_bound is not None else "",
-            comma="," if self.lower_bound != self.upper_bound else "",
+            comma=("," if self.lower_bound is None
+                   or self.lower_bound != self.upper_bound else ""),
             upper=(self.upper_bound if self.upper_bound is not None
                    and self.upper_bound != self.lower_bound else ""),
             close=(INCLUSIVE_CLOSE if self.upper_bound_inclusive
@@ -186,17 +313,15 @@ class Restriction(object):
             self.upper_bound_inclusive,
             )
 
-    @classmethod
-    def fromstring(cls, spec):
-        return cls(spec)
-
 
 @functools.total_ordering
-class VersionRange(object):
+class VersionRange(_Immutable):
     """Version range specification
 
     Valid ranges are comma separated range specifications
     """
+    __slots__ = ("version", "restrictions")
+
     def __init__(self, spec):
         """Create a VersionRange from a string specification
 
@@ -225,7 +350,7 @@ class VersionRange(object):
             if close < 0:
                 raise VersionRangeParseError("Unbounded range: %s" % spec)
 
-            restriction = Restriction(_spec[0:close+1])
+            restriction = Restriction.fromstring(_spec[0:close+1])
 
             if lower_bound is None:
                 lower_bound = restriction.lower_bound
@@ -248,12 +373,22 @@ class VersionRange(object):
                     "Only fully-qualified sets allowed in multiple set"
                     " scenario: %s" % spec)
             else:
-                version = Version(_spec)
+                version = Version.fromstring(_spec)
                 # add the "everything" restriction
-                restrictions.append(Restriction())
+                restrictions.append(Restriction.fromstring(None))
 
-        self.version = version
-        self.restrictions = tuple(restrictions)
+        self._set("version", version)
+        self._set("restrictions", tuple(restrictions))
+
+    @classmethod
+    def _from_parts(cls, version, restrictions):
+        """Create a version range from a recommended version and a sorted
+        list of restrictions
+        """
+        version_range = cls.__new__(cls)
+        version_range._set("version", version)
+        version_range._set("restrictions", tuple(restrictions))
+        return version_range
 
     def __cmp__(self, other):
         if self is other:
@@ -261,7 +396,7 @@ class VersionRange(object):
 
         if not isinstance(other, self.__class__):
             if isinstance(other, six.string_types):
-                return cmp(self, self.__class__(other))
+                return cmp(self, self.__class__.fromstring(other))
             elif isinstance(other, Version):
                 return cmp(other, self)
             return 1
@@ -297,9 +432,20 @@ class VersionRange(object):
         return "<%s.%s(%r, %r)>" % (self.__module__, "VersionRange",
                                     self.version, self.restrictions)
 
+    def __reduce__(self):
+        if self.version is not None \
+                and self.restrictions != (Restriction.fromstring(None),):
+            # a recommended version narrowed by restrict has no string form
+            return (self.__class__._from_parts,
+                    (self.version, self.restrictions))
+        return super(VersionRange, self).__reduce__()
+
     def _intersection(self, l1, l2):
         """Return the intersection of l1 and l2
 
+        Both lists are walked once, side by side, so this takes O(n+m)
+        comparisons.
+
         :param l1 list of restrictions
         :type l1 [Restriction, ...]
         :param l2 list of restrictions
@@ -307,15 +453,57 @@ class VersionRange(object):
         :return Intersection of l1 and l2
         :rtype [Restriction, ...]
         """
-        raise NotImplementedError
+        result = []
+        i = j = 0
+        while i < len(l1) and j < len(l2):
+            r1 = l1[i]
+            r2 = l2[j]
+            upper1 = _upper_key(r1)
+            upper2 = _upper_key(r2)
+            restriction = _join(
+                r1 if _lower_key(r1) >= _lower_key(r2) else r2,
+                r1 if upper1 <= upper2 else r2)
+            if restriction is not None:
+                result.append(restriction)
+            # whichever ends first can not overlap anything further on
+            if upper1 <= upper2:
+                i += 1
+            else:
+                j += 1
+        return _normalize(result)
 
-    @classmethod
-    def fromstring(cls, spec):
-        return cls(spec)
+    def _union(self, l1, l2):
+        """Return the union of l1 and l2
+
+        :param l1 list of restrictions
+        :type l1 [Restriction, ...]
+        :param l2 list of restrictions
+        :type l2 [Restriction, ...]
+        :return Union of l1 and l2 with overlapping and adjacent restrictions
+                merged
+        :rtype [Restriction, ...]
+        """
+        merged = []
+        i = j = 0
+        while i < len(l1) and j < len(l2):
+            if _lower_key(l1[i]) <= _lower_key(l2[j]):
+                merged.append(l1[i])
+                i += 1
+            else:
+                merged.append(l2[j])
+                j += 1
+        merged.extend(l1[i:])
+        merged.extend(l2[j:])
+        return _normalize(merged)
 
     @classmethod
     def from_version(cls, version):
-        return cls(str(version))
+        return cls.fromstring(str(version))
+
+    @property
+    def is_empty(self):
+        """True if no version can satisfy this range"""
+        return not self.restrictions
 
     def restrict(self, version_range):
         """Returns a new VersionRange that is a restriction of this
@@ -328,21 +516,143 @@ class VersionRange(object):
         :return intersection of this version range and the specified one
         :rypte VersionRange
         """
-        raise NotImplementedError
+        if isinstance(version_range, six.string_types):
+            version_range = self.fromstring(version_range)
+        restrictions = self._intersection(self.restrictions,
+                                          version_range.restrictions)
+
+        version = None
+        if restrictions:
+            for restriction in restrictions:
+                if self.version is not None and self.version in restriction:
+                    # the original recommendation is preferred
+                    version = self.version
+                    break
+                elif version is None and version_range.version is not None \
+                        and version_range.version in restriction:
+                    version = version_range.version
+        elif self.version is not None:
+            version = self.version
+        else:
+            version = version_range.version
+        return self._from_parts(version, restrictions)
+
+    def union(self, version_range):
+        """Returns a new VersionRange that allows every version of this and
+        the specified version range
+
+        Keeps this recommended version, or the specified one if there is none
+
+        :param version_range the version range to add to this range
+        :type version_range VersionRange
+        :return union of this version range and the specified one
+        :rtype VersionRange
+        """
+        if isinstance(version_range, six.string_types):
+            version_range = self.fromstring(version_range)
+        restrictions = self._union(self.restrictions,
+                                   version_range.restrictions)
+        version = (self.version if self.version is not None
+                   else version_range.version)
+        return self._from_parts(version, restrictions)
 
     def match_version(self, versions):
-        matched = None
-        for version in sorted(versions, reverse=True):
-            if version in self:
-                matched = version
-                break
+        """Return the highest of *versions* that is within this range
+
+        :param versions: versions to pick from, preferably a
+                         :py:class:`VersionIndex` that is reused between calls
+        :return: the matching item of *versions* or ``None``
+        """
+        if not isinstance(versions, VersionIndex):
+            versions = VersionIndex(versions)
+        return versions.highest(self)
+
+
+class VersionIndex(object):
+    """An ascending list of versions that answers range queries by bisection
+
+    Build the index once per artifact listing, then each query costs
+    O(k log n) comparisons for a range of k restrictions over n versions.
+
+    Items may be :py:class:`Version` objects, version strings, soft
+    :py:class:`VersionRange` objects or anything with such a ``version``
+    attribute, like an :py:class:`pymaven.Artifact`. Queries return the items
+    the index was built from.
+    """
+    __slots__ = ("_items", "_keys")
+
+    def __init__(self, items):
+        pairs = sorted(((_version_key(item), item) for item in items),
+                       key=lambda pair: pair[0])
+        self._keys = [key for key, _ in pairs]
+        self._items = [item for _, item in pairs]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __reversed__(self):
+        return reversed(self._items)
+
+    def __repr__(self):
+        return "<%s.VersionIndex(%d versions)>" % (self.__module__,
+                                                   len(self._items))
+
+    def _slice(self, restriction):
+        """Return the slice of the index within *restriction*"""
+        start = 0
+        if restriction.lower_bound is not None:
+            if restriction.lower_bound_inclusive:
+                start = bisect.bisect_left(self._keys,
+                                           restriction.lower_bound._key)
+            else:
+                start = bisect.bisect_right(self._keys,
+                                            restriction.lower_bound._key)
+        end = len(self._keys)
+        if restriction.upper_bound is not None:
+            if restriction.upper_bound_inclusive:
+                end = bisect.bisect_right(self._keys,
+                                          restriction.upper_bound._key, start)
+            else:
+                end = bisect.bisect_left(self._keys,
+                                         restriction.upper_bound._key, start)
+        return start, max(start, end)
+
+    def highest(self, version_range):
+        """Return the highest item within *version_range* or ``None``"""
+        for restriction in reversed(version_range.restrictions):
+            start, end = self._slice(restriction)
+            if end > start:
+                return self._items[end - 1]
+        return None
+
+    def matching(self, version_range):
+        """Return all items within *version_range*, lowest first"""
+        matched = []
+        for restriction in version_range.restrictions:
+            start, end = self._slice(restriction)
+            matched.extend(self._items[start:end])
         return matched
 
 
+def _version_key(item):
+    """Return the sort key of the version described by *item*"""
+    while not isinstance(item, Version):
+        if isinstance(item, six.string_types):
+            item = Version.fromstring(item)
+        else:
+            item = item.version
+    return item._key
+
+
 @functools.total_ordering
-class Version(object):
+class Version(_Immutable):
     """Maven version objecjt
     """
+    __slots__ = ("_unparsed", "_parsed", "_key")
+
     def __init__(self, version):
         """Create a maven version
 
@@ -370,7 +680,7 @@ class Version(object):
               the digit
         * finally, append the buffer to the list
         """
-        self._unparsed = version
+        self._set("_unparsed", version)
         parsed = current_list = []
         buf = str(version.strip()).lower()
         start = 0
@@ -407,32 +717,32 @@ class Version(object):
                 current_list.append(self._parse_buffer(buf[start:]))
         current_list = self._normalize(current_list)
 
-        self._parsed = list2tuple(self._normalize(parsed))
+        self._set("_parsed", list2tuple(self._normalize(parsed)))
+        self._set("_key", self._sort_key(self._parsed))
 
     def __cmp__(self, other):
         if self is other:
             return 0
 
-        if not isinstance(other, self.__class__):
-            if isinstance(other, six.string_types):
-                return self._compare(self._parsed, self.__class__(other)._parsed)
-            elif isinstance(other, VersionRange) and other.version:
-                return self._compare(self._parsed, other.version._parsed)
+        key = self._other_key(other)
+        if key is None:
             return 1
-
-        return self._compare(self._parsed, other._parsed)
+        return cmp(self._key, key)
 
     def __eq__(self, other):
-        return self.__cmp__(other) == 0
+        if self is other:
+            return True
+        return self._key == self._other_key(other)
 
     def __hash__(self):
-        return hash(self._unparsed)
+        return hash(self._key)
 
     def __lt__(self, other):
-        return self.__cmp__(other) < 0
+        key = self._other_key(other)
+        return key is not None and self._key < key
 
     def __ne__(self, other):
-        return self.__cmp__(other) != 0
+        return not self.__eq__(other)
 
     def __repr__(self):
         return "<%s.%s(%r)>" % (self.__module__, "Version", self._unparsed)
@@ -440,7 +750,84 @@ class Version(object):
     def __str__(self):
         return self._unparsed
 
+    def _other_key(self, other):
+        """Return the sort key of *other*, or ``None`` if it is not something
+        a version can be compared to
+        """
+        if isinstance(other, Version):
+            return other._key
+        elif isinstance(other, six.string_types):
+            return self.__class__.fromstring(other)._key
+        elif isinstance(other, VersionRange) and other.version:
+            return other.version._key
+        return None
+
+    def _sort_key(self, items):
+        """Convert parsed version *items* into a key that python orders the
+        same way maven orders versions.
+
+        Every item becomes a ``(kind, value)`` tuple and each list is closed
+        by a marker that stands in for the padding maven compares shorter
+        lists with. The marker sorts like the release qualifier, so
+        ``1-alpha < 1 < 1-1`` and ``1.0 == 1``. Zeros sort just below the
+        marker when the first item after them is a pre-release qualifier, so
+        ``1.0.rc < 1``. The key is built once per version and is compared
+        natively, without calling back into python.
+
+        Maven's item comparison is not transitive when a qualifier after a '.'
+        meets a list started by a '-' (``1.0.RC1 > 1-1 > 1 > 1.0.RC1``). The
+        key keeps the transitive order for those (``1.0.RC1 < 1 < 1-1``).
+
+        For the same reason the key disagrees with :py:meth:`_compare` when a
+        pre-release qualifier after trailing zeros meets a release qualifier
+        after fewer zeros, as in Spring style versions: ``1.0.0.RC1`` and
+        ``1.0.RELEASE``, ``5.0.0.RC1`` and ``5.0.RELEASE``, ``1.0.RC1`` and
+        ``1.RELEASE``. ``_compare`` puts the release candidate above the
+        release, the key puts it below, as maven resolves them. Sorting and
+        ``<`` follow the key.
+
+        :param tuple items: the parsed version
+        :return: the sort key
+        :rtype: tuple
+        """
+        key = []
+        zeros = 0
+        for item in items:
+            if isinstance(item, int):
+                if item == 0:
+                    zeros += 1
+                    continue
+                value = (_INT_ITEM, item)
+            elif isinstance(item, six.string_types):
+                value = self._string_value(item)
+                if value < _RELEASE_VALUE:
+                    value = (_STRING_ITEM, value)
+                else:
+                    value = (_LIST_ITEM, ((_STRING_ITEM, value),))
+            else:
+                value = self._sort_key(item)
+                if len(value) == 1:
+                    value = _END_KEY
+                else:
+                    value = (_LIST_ITEM, value)
+            if zeros:
+                zero = _ZERO_KEY
+                if value < _END_KEY:
+                    zero = _LOW_ZERO_KEY
+                key.extend([zero] * zeros)
+                zeros = 0
+            key.append(value)
+        while key and key[-1] == _END_KEY:
+            key.pop()
+        key.append(_END_KEY)
+        return tuple(key)
+
     def _compare(self, this, other):
+        """Compare parsed version items the way maven does
+
+        This is the reference for :py:meth:`_sort_key`; comparing versions
+        uses their keys.
+        """
         if isinstance(this, int):
             return self._int_compare(this, other)
         elif isinstance(this, six.string_types):
@@ -565,7 +952,3 @@ class Version(object):
             return str(QUALIFIERS.index(s) + 1)
 
         return "%d-%s" % (len(QUALIFIERS), s)
-
-    @classmethod
-    def fromstring(cls, spec):
-        return cls(spec)
@@ -0,0 +1,265 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import asyncio
+import os
+import threading
+import unittest
+
+from pymaven import Artifact
+from pymaven.errors import MissingArtifactError
+from pymaven.errors import MissingPathError
+from pymaven.pom import POM_CACHE
+
+from .test_client import SIMPLE_METADATA
+from .test_client import MavenServer
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+try:
+    import aiohttp
+
+    from pymaven.aio import AsyncMavenClient
+except ImportError:
+    AsyncMavenClient = None
+
+
+POM = """\
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+    <modelVersion>4.0.0</modelVersion>
+    {parent}
+    <groupId>foo</groupId>
+    <artifactId>{artifact}</artifactId>
+    <version>1.0</version>
+    <dependencies>{dependencies}</dependencies>
+</project>
+"""
+
+PARENT = """<parent>
+    <groupId>foo</groupId>
+    <artifactId>{0}</artifactId>
+    <version>1.0</version>
+</parent>"""
+
+DEPENDENCY = """<dependency>
+    <groupId>foo</groupId>
+    <artifactId>{0}</artifactId>
+    <version>2.0</version>
+</dependency>"""
+
+
+def _pom(artifact, parent=None, dependency=None):
+    return POM.format(
+        artifact=artifact,
+        parent=PARENT.format(parent) if parent else "",
+        dependencies=DEPENDENCY.format(dependency) if dependency else "",
+        ).encode()
+
+
+@unittest.skipIf(AsyncMavenClient is None, "aiohttp is not installed")
+class TestAsyncMavenClient(unittest.TestCase):
+    def _run(self, client, coroutine):
+        async def run():
+            async with client:
+                return await coroutine(client)
+        return asyncio.run(run())
+
+    def test_exists_concurrent(self):
+        files = dict(("/repo/foo/bar/%d/bar-%d.jar" % (i, i), b"jar")
+                     for i in range(0, 2000, 2))
+        with MavenServer(files) as server:
+            client = AsyncMavenClient(server.url + "/repo", limit_per_host=8)
+            repo = client._repos[0]
+            found = self._run(client, lambda client: asyncio.gather(
+                *[repo.exists("foo/bar/%d/bar-%d.jar" % (i, i))
+                  for i in range(2000)]))
+        assert [i % 2 == 0 for i in range(2000)] == found
+        assert 2000 == len(server.requests)
+        assert 8 >= server.connections
+
+    def test_find_artifacts(self):
+        files = {
+            "/repo1/foo/bar": b"",
+            "/repo1/foo/bar/maven-metadata.xml": SIMPLE_METADATA.encode(),
+            "/repo2/foo/bar": b"",
+            "/repo2/foo/bar/maven-metadata.xml": SIMPLE_METADATA.replace(
+                "<version>1.1</version>",
+                "<version>4.0</version>").encode(),
+            }
+        with MavenServer(files) as server:
+            client = AsyncMavenClient(server.url + "/repo1",
+                                      server.url + "/repo2",
+                                      server.url + "/repo3")
+            artifacts = self._run(client, lambda client:
+                                  client.find_artifacts("foo:bar:[1.0,)"))
+        assert [Artifact("foo:bar:%s" % v)
+                for v in ("4.0", "3.0-SNAPSHOT", "2.0.0", "1.1", "1.0")] \
+            == artifacts
+
+    def test_blocking_calls(self):
+        files = {"/repo/foo/bar/1.0/bar-1.0.jar": b"jar"}
+        threads = []
+
+        def record(func):
+            def wrapper(*args):
+                threads.append(threading.current_thread())
+                return func(*args)
+            return wrapper
+
+        with MavenServer(files) as server:
+            client = AsyncMavenClient(os.getcwd(), server.url + "/repo",
+                                      limit=4)
+            client._cache.get = record(client._cache.get)
+            local = client._repos[0]._repo
+            local.exists = record(local.exists)
+            artifact = self._run(client, lambda client: client.get_artifact(
+                "foo:bar:1.0"))
+        with artifact.contents as fh:
+            assert b"jar" == fh.read()
+        # cache and disk accesses are made away from the event loop, by the
+        # threads of the client
+        assert 3 == len(threads)
+        assert threading.main_thread() not in threads
+        assert 4 == client._executor._max_workers
+
+    @mock.patch("pymaven.client.time")
+    @mock.patch("pymaven.aio.time")
+    def test_revalidate_error(self, _time, _client_time):
+        _client_time.time = _time.time
+        _time.time.return_value = 1000.0
+        path = "/repo/foo/bar/maven-metadata.xml"
+        versions = ["1.0-SNAPSHOT", "1.0", "3.0-SNAPSHOT", "2.0.0", "1.1"]
+        with MavenServer({path: SIMPLE_METADATA.encode()}) as server:
+            client = AsyncMavenClient(server.url + "/repo", metadata_ttl=60)
+            repo = client._repos[0]
+
+            async def listdir(client):
+                assert versions == await repo.listdir("foo/bar")
+
+                # the stale copy is used while the repository fails
+                _time.time.return_value = 1100.0
+                server.errors[path] = 503
+                assert versions == await repo.listdir("foo/bar")
+                with mock.patch.object(
+                        repo, "_send",
+                        side_effect=aiohttp.ClientConnectionError):
+                    assert versions == await repo.listdir("foo/bar")
+
+                # and dropped once the file is gone
+                server.errors[path] = 404
+                with self.assertRaises(MissingPathError):
+                    await repo.listdir("foo/bar")
+                del server.errors[path]
+                with self.assertRaises(MissingPathError):
+                    await repo.listdir("foo/bar")
+
+            self._run(client, listdir)
+
+    def test_get_artifact(self):
+        files = {
+            "/repo2/foo/bar/1.0/bar-1.0.jar": b"second",
+            "/repo3/foo/bar/1.0/bar-1.0.jar": b"third",
+            }
+        with MavenServer(files) as server:
+            client = AsyncMavenClient(server.url + "/repo1",
+                                      server.url + "/repo2",
+                                      server.url + "/repo3")
+
+            async def get(client):
+                artifact = await client.get_artifact("foo:bar:1.0")
+                with self.assertRaises(MissingArtifactError):
+                    await client.get_artifact("foo:bar:2.0")
+                return artifact
+
+            artifact = self._run(client, get)
+        with artifact.contents as fh:
+            assert b"second" == fh.read()
+
+    def test_streaming(self):
+        body = os.urandom(1 << 20)
+        with MavenServer({"/repo/foo/bar/1.0/bar-1.0.jar": body}) as server:
+            client = AsyncMavenClient(server.url + "/repo", chunk_size=4096)
+            put = client._cache._put
+            writes = []
+
+            def _put(h, metadata, chunks):
+                def record():
+                    for chunk in chunks:
+                        writes.append((threading.current_thread(),
+                                       len(chunk)))
+                        yield chunk
+                return put(h, metadata, record())
+
+            client._cache._put = _put
+            artifact = self._run(client, lambda client: client.get_artifact(
+                "foo:bar:1.0"))
+        with artifact.contents as fh:
+            assert body == fh.read()
+        # written in chunks, away from the event loop
+        assert threading.main_thread() not in [t for t, _ in writes]
+        assert len(body) == sum(size for _, size in writes)
+        assert 4096 >= max(size for _, size in writes)
+
+    @mock.patch("pymaven.client.time")
+    @mock.patch("pymaven.aio.time")
+    def test_get_metadata_snapshot(self, _time, _client_time):
+        _client_time.time = _time.time
+        _time.time.return_value = 1000.0
+        path = "/repo/foo/bar/1.0-SNAPSHOT/bar-1.0-SNAPSHOT.pom"
+        files = {path: _pom("bar", dependency="old")}
+        with MavenServer(files) as server:
+            client = AsyncMavenClient(server.url + "/repo", metadata_ttl=60)
+
+            async def get(client):
+                for now, dependency in ((1000.0, "old"), (1059.0, "old"),
+                                        (1061.0, "new")):
+                    _time.time.return_value = now
+                    pom = await client.get_metadata("foo:bar:1.0-SNAPSHOT")
+                    assert (("foo", dependency, "2.0"), True) in \
+                        pom.dependencies["compile"]
+                    files[path] = _pom("bar", dependency="new")
+
+            self._run(client, get)
+
+    def test_get_metadata(self):
+        files = {
+            "/repo/foo/child/1.0/child-1.0.pom": _pom("child", "parent"),
+            "/repo/foo/parent/1.0/parent-1.0.pom": _pom("parent", "root",
+                                                        "dep"),
+            "/repo/foo/root/1.0/root-1.0.pom": _pom("root"),
+            }
+        with MavenServer(files) as server:
+            client = AsyncMavenClient(server.url + "/repo")
+
+            async def get(client):
+                pom = await client.get_metadata("foo:child:1.0")
+                with self.assertRaises(MissingArtifactError):
+                    await client.get_metadata("foo:missing:1.0")
+                return pom
+
+            pom = self._run(client, get)
+        # closing the client dropped its shared poms
+        assert 0 == POM_CACHE.invalidate_if(
+            lambda key: key[0] is client._poms)
+        # the whole parent chain was fetched
+        assert "parent" == pom.parent.artifact_id
+        assert "root" == pom.parent.parent.artifact_id
+        assert (("foo", "dep", "2.0"), True) in \
+            pom.parent.dependencies["compile"]
@@ -0,0 +1,80 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import pickle
+import unittest
+
+from pymaven.batch import PomBatch
+from pymaven.batch import parse_poms
+from pymaven.pom import EffectiveModel
+from pymaven.pom import Pom
+from pymaven.pom import RawPom
+
+from . import test_pom
+from .test_pom import COM_TEST_BOM
+from .test_pom import COM_TEST_BOM2
+from .test_pom import COM_TEST_USE
+from .test_pom import FOO_BAR_1_POM
+from .test_pom import FOO_PARENT_1_POM
+
+
+class TestPomBatch(unittest.TestCase):
+    _mock_client = test_pom.TestPom._mock_client
+
+    def test_parse_poms(self):
+        items = [("foo:bar:1", FOO_BAR_1_POM),
+                 ("foo:bad:1", b"<not a pom"),
+                 ("foo:parent:1", FOO_PARENT_1_POM.encode("utf-8"))]
+        results = list(parse_poms(items, workers=0, chunk_size=2))
+        assert ["foo:bar:1", "foo:bad:1", "foo:parent:1"] == \
+            [coordinate for coordinate, _, _ in results]
+        raw = results[0][1]
+        assert ("foo", "parent", "1") == raw.parent
+        assert raw == pickle.loads(pickle.dumps(raw))
+        assert results[1][1] is None and results[1][2]
+        assert RawPom.fromstring("foo:parent:1", FOO_PARENT_1_POM) == \
+            results[2][1]
+
+    def test_resolve(self):
+        client = self._mock_client(COM_TEST_USE, COM_TEST_BOM, COM_TEST_BOM2)
+        expected = EffectiveModel.frompom(Pom("com.test:use:1.0.0", client))
+
+        # parsed in a worker process, imports resolved from the batch
+        batch = PomBatch(workers=1)
+        assert 3 == batch.add([("com.test:bom:1.0.0", COM_TEST_BOM),
+                               ("com.test:bom2:2.0.0", COM_TEST_BOM2),
+                               ("com.test:use:1.0.0", COM_TEST_USE)])
+        assert 3 == len(batch)
+        assert "com.test:bom:pom:1.0.0" in batch
+        assert expected == batch.get_effective_model("com.test:use:1.0.0")
+        assert batch.get_pom("com.test:bom:1.0.0") is \
+            batch.get_pom("com.test:bom:pom:1.0.0")
+        assert 3 == len(list(batch.models()))
+
+        # only the raw poms are kept
+        pom = batch.get_pom("com.test:use:1.0.0")
+        assert pom.raw.coordinate == "com.test:use:1.0.0"
+        self.assertRaises(ValueError, getattr, pom, "pom_data")
+
+    def test_missing_parent(self):
+        client = self._mock_client(FOO_PARENT_1_POM)
+        batch = PomBatch(client, workers=0)
+        batch.add([("foo:bar:1", FOO_BAR_1_POM), ("foo:baz:1", "")])
+        assert ["foo:baz:1"] == list(batch.failed)
+        model = batch.get_effective_model("foo:bar:1")
+        assert "baz version string" == dict(model.properties)["bazChild"]
+        client.get_artifact.assert_called_once_with("foo:parent:pom:1")
@@ -15,18 +15,27 @@
 #
 
 
+import hashlib
 import os
+import shutil
 import tempfile
+import threading
+import time
 import unittest
 
 from six import StringIO
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
 import requests
 
 from pymaven import Artifact
+from pymaven.client import Cache
 from pymaven.client import HttpRepository
 from pymaven.client import LocalRepository
 from pymaven.client import MavenClient
+from pymaven.client import NegativeCache
 from pymaven.client import Struct
+from pymaven.errors import ChecksumMismatchError
 from pymaven.errors import MissingArtifactError
 from pymaven.errors import MissingPathError
 
@@ -73,7 +82,6 @@ class TestMavenClient(unittest.TestCase):
     def test_get_artifact(self, _LocalRepository):
         _repo = mock.Mock(spec=LocalRepository)
 
-        _repo.exists.side_effect = [True]
         _repo.open.return_value = StringIO("some data")
 
         _LocalRepository.return_value = _repo
@@ -81,23 +89,21 @@ class TestMavenClient(unittest.TestCase):
         client = MavenClient("/maven")
         actual = client.get_artifact("foo:bar:2.0.0")
         assert "some data" == actual.contents.read()
-        _repo.exists.assert_called_with("foo/bar/2.0.0/bar-2.0.0.jar")
+        _repo.exists.assert_not_called()
         _repo.open.assert_called_with("foo/bar/2.0.0/bar-2.0.0.jar")
 
     @mock.patch("pymaven.client.LocalRepository")
     def test_get_artifact_missing(self, _LocalRepository):
         _repo = mock.Mock(spec=LocalRepository)
 
-        _repo.exists.side_effect = [False]
-        _repo.open.return_value = StringIO("some data")
+        _repo.open.side_effect = MissingPathError("foo/bar/3.0/bar-3.0.jar")
 
         _LocalRepository.return_value = _repo
 
         client = MavenClient("/maven")
         self.assertRaises(MissingArtifactError, client.get_artifact,
                           "foo:bar:3.0")
-        _repo.exists.assert_called_with("foo/bar/3.0/bar-3.0.jar")
-        _repo.open.assert_not_called()
+        _repo.open.assert_called_with("foo/bar/3.0/bar-3.0.jar")
 
     @mock.patch("pymaven.client.LocalRepository")
     def test_get_artifact_version_range(self, _LocalRepository):
@@ -113,6 +119,128 @@ class TestMavenClient(unittest.TestCase):
                           "foo:bar:[1.0,2.0]")
         _repo.open.assert_not_called()
 
+    @mock.patch("pymaven.client.LocalRepository")
+    def test_get_artifact_concurrent(self, _LocalRepository):
+        _repo1 = mock.Mock(spec=LocalRepository)
+        _repo2 = mock.Mock(spec=LocalRepository)
+        _repo3 = mock.Mock(spec=LocalRepository)
+        _LocalRepository.side_effect = [_repo1, _repo2, _repo3]
+
+        def slow_exists(path):
+            time.sleep(0.1)
+            return True
+
+        _repo1.exists.return_value = False
+        _repo2.exists.side_effect = slow_exists
+        _repo3.exists.return_value = True
+        _repo2.open.return_value = StringIO("repo2")
+
+        client = MavenClient("/repo1", "/repo2", "/repo3", workers=3)
+        try:
+            actual = client.get_artifact("foo:bar:2.0.0")
+            assert "repo2" == actual.contents.read()
+            _repo3.exists.assert_called_with("foo/bar/2.0.0/bar-2.0.0.jar")
+            _repo3.open.assert_not_called()
+
+            _repo2.exists.side_effect = None
+            _repo2.exists.return_value = False
+            _repo3.exists.return_value = False
+            self.assertRaises(MissingArtifactError, client.get_artifact,
+                              "foo:bar:3.0")
+        finally:
+            client.close()
+
+    @mock.patch("pymaven.client.LocalRepository")
+    def test_get_artifact_timeout(self, _LocalRepository):
+        _repo1 = mock.Mock(spec=LocalRepository)
+        _repo2 = mock.Mock(spec=LocalRepository)
+        _LocalRepository.side_effect = [_repo1, _repo2]
+
+        def slow_exists(path):
+            time.sleep(0.5)
+            return True
+
+        _repo1.exists.side_effect = slow_exists
+        _repo2.exists.return_value = True
+        _repo2.open.return_value = StringIO("repo2")
+
+        client = MavenClient("/repo1", "/repo2", workers=2, timeout=0.1)
+        try:
+            actual = client.get_artifact("foo:bar:2.0.0")
+            assert "repo2" == actual.contents.read()
+            _repo1.open.assert_not_called()
+        finally:
+            client.close()
+
+    @mock.patch("pymaven.client.LocalRepository")
+    def test_get_artifact_queued(self, _LocalRepository):
+        _repo1 = mock.Mock(spec=LocalRepository)
+        _repo2 = mock.Mock(spec=LocalRepository)
+        _LocalRepository.side_effect = [_repo1, _repo2]
+
+        def slow_exists(path):
+            time.sleep(0.3)
+            return False
+
+        _repo1.exists.side_effect = slow_exists
+        _repo2.exists.return_value = True
+        _repo2.open.return_value = StringIO("repo2")
+
+        # one worker: the second repository only starts once the first is
+        # done, and still gets its own timeout
+        client = MavenClient("/repo1", "/repo2", workers=1, timeout=0.2)
+        try:
+            actual = client.get_artifact("foo:bar:2.0.0")
+            assert "repo2" == actual.contents.read()
+        finally:
+            client.close()
+
+    @mock.patch("pymaven.client.LocalRepository")
+    def test_find_artifacts_concurrent(self, _LocalRepository):
+        _repo1 = mock.Mock(spec=LocalRepository)
+        _repo2 = mock.Mock(spec=LocalRepository)
+        _repo3 = mock.Mock(spec=LocalRepository)
+        _LocalRepository.side_effect = [_repo1, _repo2, _repo3]
+
+        _repo1.get_versions.return_value = [Artifact("foo:bar:2.0"),
+                                            Artifact("foo:bar:1.0"),
+                                            ]
+        _repo2.get_versions.return_value = None
+        _repo3.get_versions.return_value = [Artifact("foo:bar:3.0"),
+                                            Artifact("foo:bar:1.0"),
+                                            ]
+        client = MavenClient("/repo1", "/repo2", "/repo3", workers=2)
+        try:
+            expected = [Artifact("foo:bar:3.0"),
+                        Artifact("foo:bar:2.0"),
+                        Artifact("foo:bar:1.0"),
+                        ]
+            assert expected == client.find_artifacts("foo:bar")
+        finally:
+            client.close()
+
+    @mock.patch("pymaven.client.LocalRepository")
+    def test_find_artifacts_timeout(self, _LocalRepository):
+        _repo1 = mock.Mock(spec=LocalRepository)
+        _repo2 = mock.Mock(spec=LocalRepository)
+        _LocalRepository.side_effect = [_repo1, _repo2]
+
+        def slow_versions(coordinate):
+            time.sleep(0.5)
+            return [Artifact("foo:bar:9.0")]
+
+        _repo1.get_versions.side_effect = slow_versions
+        _repo2.get_versions.return_value = [Artifact("foo:bar:1.0")]
+
+        # one worker: the second repository only starts once the first is
+        # done, and still gets its own timeout
+        client = MavenClient("/repo1", "/repo2", workers=1, timeout=0.2)
+        try:
+            assert [Artifact("foo:bar:1.0")] == \
+                client.find_artifacts("foo:bar")
+        finally:
+            client.close()
+
 
 @mock.patch("pymaven.client.HttpRepository._request")
 class TestHttpRespository(unittest.TestCase):
@@ -169,15 +297,633 @@ class TestHttpRespository(unittest.TestCase):
         self.assertRaises(MissingPathError, repo.open, "some/path")
 
 
+class MavenRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serve the files of a :py:class:`MavenServer` over keep-alive http"""
+    protocol_version = "HTTP/1.1"
+    # headers and small bodies are sent separately, without this the body
+    # waits for the client's delayed ack
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def _respond(self, send_body):
+        self.server.requests.append((self.command, self.path))
+        status = self.server.errors.get(self.path)
+        if status is not None:
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = self.server.files.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def log_message(self, *args):
+        pass
+
+
+class MavenServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """A local stand-in for a remote maven repository
+
+    *files* maps request paths to the bytes served for them, *errors* maps
+    request paths to the status code to fail them with.
+    """
+    daemon_threads = True
+
+    def __init__(self, files):
+        BaseHTTPServer.HTTPServer.__init__(self, ("127.0.0.1", 0),
+                                           MavenRequestHandler)
+        self.files = files
+        self.errors = {}
+        self.connections = 0
+        self.not_modified = 0
+        self.requests = []
+
+    @property
+    def url(self):
+        return "http://%s:%d" % self.server_address
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+class TestHttpSession(unittest.TestCase):
+    FILES = dict(
+        ("/repo/foo/bar/%d.0/bar-%d.0.jar" % (i, i), b"jar %d" % i)
+        for i in range(10))
+
+    def test_keep_alive(self):
+        with MavenServer(self.FILES) as server:
+            repo = HttpRepository(server.url + "/repo")
+            for i in range(10):
+                assert repo.exists("foo/bar/%d.0/bar-%d.0.jar" % (i, i))
+            assert not repo.exists("foo/bar/10.0/bar-10.0.jar")
+            with repo.open("foo/bar/1.0/bar-1.0.jar") as fh:
+                assert b"jar 1" == fh.read()
+        assert 12 == len(server.requests)
+        assert 1 == server.connections
+
+    def test_shared_session(self):
+        with MavenServer(self.FILES) as server:
+            client = MavenClient(server.url + "/repo", server.url + "/other",
+                                 pool_size=2, max_retries=0)
+            repo1, repo2 = client._repos
+            assert repo1._session is repo2._session
+            assert not repo2.exists("foo/bar/1.0/bar-1.0.jar")
+            assert repo1.exists("foo/bar/1.0/bar-1.0.jar")
+        assert 1 == server.connections
+
+    def test_invalid_option(self):
+        self.assertRaises(TypeError, MavenClient, "/maven", pool=1)
+
+    def test_get_first(self):
+        files = {
+            "/repo/foo/bar/1.0/bar-1.0.pom": FOO_BAR_3_0_POM.encode(),
+            "/repo/foo/bar/1.0/bar-1.0.jar": b"jar",
+            }
+        with MavenServer(files) as server:
+            client = MavenClient(server.url + "/mirror", server.url + "/repo")
+            pom = client.get_metadata("foo:bar:1.0")
+            assert "bar" == pom.pom_data.findtext(
+                "{http://maven.apache.org/POM/4.0.0}artifactId")
+            with client.get_artifact("foo:bar:1.0").contents as fh:
+                assert b"jar" == fh.read()
+            self.assertRaises(MissingArtifactError, client.get_metadata,
+                              "foo:bar:2.0")
+
+        # one miss in the mirror and one GET per file, without HEAD probes
+        assert [("GET", "/mirror/foo/bar/1.0/bar-1.0.pom"),
+                ("GET", "/repo/foo/bar/1.0/bar-1.0.pom"),
+                ("GET", "/mirror/foo/bar/1.0/bar-1.0.jar"),
+                ("GET", "/repo/foo/bar/1.0/bar-1.0.jar"),
+                ("GET", "/mirror/foo/bar/2.0/bar-2.0.pom"),
+                ("GET", "/repo/foo/bar/2.0/bar-2.0.pom"),
+                ] == server.requests
+
+    def test_get_first_unreachable(self):
+        files = {"/repo/foo/bar/1.0/bar-1.0.jar": b"jar"}
+        with MavenServer(files) as server:
+            server.errors["/mirror/foo/bar/1.0/bar-1.0.jar"] = 503
+            client = MavenClient(server.url + "/mirror", server.url + "/repo",
+                                 max_retries=0)
+            # a failing repository is not a missing file
+            self.assertRaises(requests.exceptions.HTTPError,
+                              client.get_artifact, "foo:bar:1.0")
+            assert not [r for r in server.requests
+                        if r[1].startswith("/repo/")]
+
+        # nothing listens on the port of the stopped server
+        client = MavenClient(server.url + "/repo", max_retries=0)
+        self.assertRaises(requests.exceptions.ConnectionError,
+                          client.get_artifact, "foo:bar:1.0")
+        self.assertRaises(requests.exceptions.ConnectionError,
+                          client.get_metadata, "foo:bar:1.0")
+
+    @mock.patch("pymaven.client.time")
+    def test_get_metadata_snapshot(self, _time):
+        _time.time.return_value = 1000.0
+        path = "/repo/foo/bar/1.0-SNAPSHOT/bar-1.0-SNAPSHOT.pom"
+        def pom(revision):
+            return FOO_BAR_3_0_POM.replace(
+                "</project>",
+                "<properties><rev>%s</rev></properties></project>" % revision
+                ).encode()
+
+        files = {path: pom(1)}
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with MavenServer(files) as server:
+                client = MavenClient(server.url + "/repo", cache_dir=cache_dir,
+                                     metadata_ttl=60)
+                assert "1" == client.get_metadata(
+                    "foo:bar:1.0-SNAPSHOT").properties["rev"]
+                files[path] = pom(2)
+
+                # still fresh
+                _time.time.return_value = 1059.0
+                assert "1" == client.get_metadata(
+                    "foo:bar:1.0-SNAPSHOT").properties["rev"]
+                assert 1 == len(server.requests)
+
+                # revalidated once stale
+                _time.time.return_value = 1061.0
+                assert "2" == client.get_metadata(
+                    "foo:bar:1.0-SNAPSHOT").properties["rev"]
+                assert 2 == len(server.requests)
+                client.close()
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_effective_model(self):
+        files = {
+            "/repo/foo/bar/1.0/bar-1.0.pom": FOO_BAR_3_0_POM.encode(),
+            "/repo/foo/bar/1.0-SNAPSHOT/bar-1.0-SNAPSHOT.pom":
+                FOO_BAR_3_0_POM.encode(),
+            }
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with MavenServer(files) as server:
+                client = MavenClient(server.url + "/repo", cache_dir=cache_dir)
+                model = client.get_effective_model("foo:bar:1.0")
+                assert "foo:bar:pom:1.0" == model.coordinate
+                client.get_effective_model("foo:bar:1.0-SNAPSHOT")
+                client.close()
+                assert 2 == len(server.requests)
+
+                # loaded from the cache, without the pom
+                client = MavenClient(server.url + "/repo", cache_dir=cache_dir)
+                with mock.patch("pymaven.client.Pom") as _Pom:
+                    assert model == client.get_effective_model("foo:bar:1.0")
+                    assert not _Pom.mock_calls
+                client.close()
+                assert 2 == len(server.requests)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_prefetch(self):
+        files = {
+            "/mirror/foo/bar/1.0/bar-1.0.pom": b"pom 1",
+            "/mirror/foo/bar/1.0/bar-1.0.jar": b"jar 1",
+            "/repo/foo/bar/2.0/bar-2.0.pom": b"pom 2",
+            "/repo/foo/bar/2.0/bar-2.0.jar": b"jar 2",
+            "/repo/foo/bar/3.0/bar-3.0.pom": b"pom 3",
+            }
+        progress = []
+        with MavenServer(files) as server:
+            client = MavenClient(server.url + "/mirror", server.url + "/repo")
+            result = client.prefetch(
+                ["foo:bar:1.0", "foo:bar:2.0", "foo:bar:3.0"], workers=4,
+                progress=lambda result: progress.append(result.done))
+            assert not [r for r in server.requests if r[0] != "GET"]
+            # found in the first repository with a single request
+            assert 1 == server.requests.count(
+                ("GET", "/mirror/foo/bar/1.0/bar-1.0.jar"))
+            assert not [r for r in server.requests
+                        if r[1].startswith("/repo/foo/bar/1.0")]
+
+            # everything found is served from the cache
+            requests = len(server.requests)
+            with client.get_artifact("foo:bar:2.0").contents as fh:
+                assert b"jar 2" == fh.read()
+            assert requests == len(server.requests)
+
+        assert not result
+        assert 6 == result.total
+        assert server.url + "/mirror" == result.fetched["foo:bar:1.0"]
+        assert server.url + "/repo" == result.fetched["foo:bar:pom:2.0"]
+        assert 5 == len(result.fetched)
+        assert ["foo:bar:3.0"] == result.missing
+        assert not result.failed
+        assert [1, 2, 3, 4, 5, 6] == sorted(progress)
+
+    def test_prefetch_failed(self):
+        files = {
+            "/repo/foo/bar/1.0/bar-1.0.pom": b"pom 1",
+            "/repo/foo/bar/1.0/bar-1.0.jar": b"jar 1",
+            }
+        with MavenServer(files) as server:
+            server.errors["/repo/foo/bar/1.0/bar-1.0.jar"] = 503
+            client = MavenClient(server.url + "/repo", max_retries=0)
+            result = client.prefetch(["foo:bar:1.0", "foo:bar:2.0"])
+        assert ["foo:bar:pom:1.0"] == list(result.fetched)
+        assert ["foo:bar:2.0", "foo:bar:pom:2.0"] == sorted(result.missing)
+        assert ["foo:bar:1.0"] == list(result.failed)
+        assert isinstance(result.failed["foo:bar:1.0"],
+                          requests.exceptions.HTTPError)
+
+        # nothing listens on the port of the stopped server, the files may
+        # exist
+        client = MavenClient(server.url + "/repo", max_retries=0)
+        result = client.prefetch(["foo:bar:1.0"])
+        assert not result.missing
+        assert ["foo:bar:1.0", "foo:bar:pom:1.0"] == sorted(result.failed)
+        assert isinstance(result.failed["foo:bar:1.0"],
+                          requests.exceptions.ConnectionError)
+
+    @mock.patch("pymaven.client.time")
+    def test_revalidate(self, _time):
+        _time.time.return_value = 1000.0
+        versions = ["1.0-SNAPSHOT", "1.0", "3.0-SNAPSHOT", "2.0.0", "1.1"]
+        files = {
+            "/repo/foo/bar/maven-metadata.xml": SIMPLE_METADATA.encode(),
+            "/repo/foo/bar/1.0/bar-1.0.pom": b"pom",
+            }
+        with MavenServer(files) as server:
+            repo = HttpRepository(server.url + "/repo", metadata_ttl=60)
+            assert versions == repo.listdir("foo/bar")
+            assert repo.exists("foo/bar/1.0/bar-1.0.pom")
+            assert 2 == len(server.requests)
+
+            # still fresh
+            _time.time.return_value = 1059.0
+            repo.listdir("foo/bar")
+            assert 2 == len(server.requests)
+
+            # stale but unchanged, releases are never revalidated
+            _time.time.return_value = 1061.0
+            assert versions == repo.listdir("foo/bar")
+            assert repo.exists("foo/bar/1.0/bar-1.0.pom")
+            assert 3 == len(server.requests)
+            assert 1 == server.not_modified
+
+            # fresh again after the 304
+            repo.listdir("foo/bar")
+            assert 3 == len(server.requests)
+
+            # changed
+            files["/repo/foo/bar/maven-metadata.xml"] = \
+                SIMPLE_METADATA.replace(
+                    "<version>1.1</version>",
+                    "<version>1.1</version><version>4.0</version>").encode()
+            _time.time.return_value = 1200.0
+            assert versions + ["4.0"] == repo.listdir("foo/bar")
+            assert 4 == len(server.requests)
+            assert 1 == server.not_modified
+
+    @mock.patch("pymaven.client.time")
+    def test_revalidate_error(self, _time):
+        _time.time.return_value = 1000.0
+        path = "/repo/foo/bar/maven-metadata.xml"
+        versions = ["1.0-SNAPSHOT", "1.0", "3.0-SNAPSHOT", "2.0.0", "1.1"]
+        files = {path: SIMPLE_METADATA.encode()}
+        with MavenServer(files) as server:
+            repo = HttpRepository(server.url + "/repo", metadata_ttl=60)
+            assert versions == repo.listdir("foo/bar")
+
+            # the stale copy is used while the repository fails
+            _time.time.return_value = 1100.0
+            server.errors[path] = 503
+            assert versions == repo.listdir("foo/bar")
+            with mock.patch.object(
+                    repo, "_send",
+                    side_effect=requests.exceptions.ConnectionError):
+                assert versions == repo.listdir("foo/bar")
+
+            # and dropped once the file is gone
+            server.errors[path] = 404
+            self.assertRaises(MissingPathError, repo.listdir, "foo/bar")
+            requests_made = len(server.requests)
+            del server.errors[path]
+            self.assertRaises(MissingPathError, repo.listdir, "foo/bar")
+            assert requests_made == len(server.requests)
+
+
+class TestChecksum(unittest.TestCase):
+    JAR = "/repo/foo/bar/1.0/bar-1.0.jar"
+
+    def _files(self, body, checksum):
+        return {
+            self.JAR: body,
+            self.JAR + ".sha1": checksum.encode() + b"  bar-1.0.jar\n",
+            }
+
+    def test_verify(self):
+        files = self._files(b"jar", hashlib.sha1(b"jar").hexdigest())
+        with MavenServer(files) as server:
+            client = MavenClient(server.url + "/repo", verify=True)
+            artifact = client.get_artifact("foo:bar:1.0")
+            with artifact.contents as fh:
+                assert b"jar" == fh.read()
+            assert "sha1" == artifact.contents.verified
+            requests = len(server.requests)
+
+            # verified once, the checksum is not looked at again
+            artifact = client.get_artifact("foo:bar:1.0")
+            assert requests == len(server.requests)
+            assert "sha1" == artifact.contents.verified
+
+    def test_mismatch(self):
+        files = self._files(b"corrupt", hashlib.sha1(b"jar").hexdigest())
+        with MavenServer(files) as server:
+            repo = HttpRepository(server.url + "/repo", verify=True)
+            self.assertRaises(ChecksumMismatchError, repo.open,
+                              "foo/bar/1.0/bar-1.0.jar")
+            assert 1 == repo._cache.stats()["quarantined"]
+            assert "quarantine" in os.listdir(repo._cache.cacheDir)
+
+            # the quarantined file is fetched again
+            files[self.JAR] = b"jar"
+            with repo.open("foo/bar/1.0/bar-1.0.jar") as fh:
+                assert b"jar" == fh.read()
+
+    def test_no_checksum(self):
+        with MavenServer({self.JAR: b"jar"}) as server:
+            repo = HttpRepository(server.url + "/repo", verify=True)
+            res = repo.open("foo/bar/1.0/bar-1.0.jar")
+            assert res.verified is None
+            assert set([("GET", self.JAR + ".sha1"),
+                        ("GET", self.JAR + ".sha256"),
+                        ("GET", self.JAR + ".md5")]) < set(server.requests)
+
+
+class TestCache(unittest.TestCase):
+    STORE = "file"
+
+    def setUp(self):
+        self.cacheDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDir)
+
+    def _response(self, body):
+        res = mock.Mock(status_code=200, reason="OK", headers={})
+        res.iter_content.return_value = [body]
+        return res
+
+    def test_max_entries(self):
+        cache = Cache(self.cacheDir, store=self.STORE, max_entries=2)
+        for name in ("a", "b"):
+            cache.cache(self._response(b"x"), "GET", name)
+        assert cache.get("GET", "a") is not None
+        cache.cache(self._response(b"x"), "GET", "c")
+
+        # b was used least recently
+        assert cache.get("GET", "b") is None
+        assert cache.get("GET", "a") is not None
+        with cache.get("GET", "c") as fh:
+            assert b"x" == fh.read()
+
+        stats = cache.stats()
+        assert 2 == stats["entries"]
+        assert 3 == stats["hits"]
+        assert 1 == stats["misses"]
+        assert 1 == stats["evictions"]
+
+    def test_max_bytes(self):
+        cache = Cache(self.cacheDir, store=self.STORE)
+        cache.cache(self._response(b"x" * 100), "GET", "a")
+        entry_size = cache.stats()["size"]
+        # room for two entries, whose sidecars differ by a few bytes
+        cache = Cache(self.cacheDir, store=self.STORE,
+                      max_bytes=2 * entry_size + 10)
+        for name in ("b", "c"):
+            cache.cache(self._response(b"x" * 100), "GET", name)
+        assert cache.get("GET", "a") is None
+        assert 2 == cache.stats()["entries"]
+        assert 2 * entry_size + 10 >= cache.stats()["size"]
+
+        # the newest entry is kept even if it is over budget on its own
+        cache.cache(self._response(b"x" * 1000), "GET", "d")
+        assert cache.get("GET", "d") is not None
+        assert 1 == cache.stats()["entries"]
+
+    def test_persistent(self):
+        cache = Cache(self.cacheDir, store=self.STORE)
+        for name in ("a", "b", "c"):
+            cache.cache(self._response(name.encode()), "GET", name)
+        for name in ("b", "c", "a"):
+            cache.get("GET", name)
+            time.sleep(0.01)
+        cache.close()
+
+        cache = Cache(self.cacheDir, store=self.STORE, max_entries=2)
+        assert 1 == cache.stats()["evictions"]
+        assert cache.get("GET", "b") is None
+        with cache.get("GET", "a") as fh:
+            assert b"a" == fh.read()
+
+    def test_trim_interval(self):
+        cache = Cache(self.cacheDir, store=self.STORE, max_entries=1, trim_interval=0.01)
+        try:
+            other = Cache(self.cacheDir, store=self.STORE)
+            other.cache(self._response(b"x"), "GET", "a")
+            other.cache(self._response(b"x"), "GET", "b")
+            for _ in range(100):
+                if len(other._store.entries()) == 1:
+                    break
+                time.sleep(0.01)
+            assert 1 == len(other._store.entries())
+        finally:
+            cache.close()
+
+    def test_streaming(self):
+        body = os.urandom(3500)
+        res = self._response(None)
+        res.iter_content.return_value = iter(
+            [body[i:i + 1024] for i in range(0, len(body), 1024)])
+        cache = Cache(self.cacheDir, store=self.STORE, chunk_size=1024)
+        cached = cache.cache(res, "GET", "a")
+        res.iter_content.assert_called_once_with(1024)
+
+        assert hashlib.sha1(body).hexdigest() == cached.sha1
+        assert hashlib.sha256(body).hexdigest() == cached.sha256
+        chunks = list(cached.iter_content(1000))
+        assert [1000, 1000, 1000, 500] == [len(c) for c in chunks]
+        assert body == b"".join(chunks)
+        assert not [f for f in os.listdir(self.cacheDir)
+                    if f.startswith(".tmp-")]
+
+    def test_interrupted(self):
+        def chunks(size):
+            yield b"x" * size
+            raise IOError("connection reset")
+
+        res = self._response(None)
+        res.iter_content.side_effect = chunks
+        cache = Cache(self.cacheDir, store=self.STORE)
+        self.assertRaises(IOError, cache.cache, res, "GET", "a")
+        assert cache.get("GET", "a") is None
+        assert 0 == cache.stats()["entries"]
+        assert not [f for f in os.listdir(self.cacheDir)
+                    if not f.startswith(("cache.sqlite", "blobs"))]
+
+    def test_invalid_store(self):
+        self.assertRaises(ValueError, Cache, self.cacheDir, store="pack")
+
+
+class TestSQLiteCache(TestCache):
+    STORE = "sqlite"
+
+    def test_single_file(self):
+        cache = Cache(self.cacheDir, store=self.STORE)
+        for name in ("a", "b", "c"):
+            cache.cache(self._response(b"x"), "GET", name)
+        cache.close()
+        assert "cache.sqlite" in os.listdir(self.cacheDir)
+        assert not [f for f in os.listdir(self.cacheDir)
+                    if f.endswith(".data")]
+
+    def test_shared(self):
+        cache1 = Cache(self.cacheDir, store=self.STORE)
+        cache2 = Cache(self.cacheDir, store=self.STORE)
+        cache2._store._db.execute("PRAGMA busy_timeout = 100")
+        try:
+            cache1.cache(self._response(b"a"), "GET", "a")
+            with cache1.get("GET", "a") as fh:
+                assert b"a" == fh.read()
+            # the hit above must not keep the database locked
+            cache2.cache(self._response(b"b"), "GET", "b")
+            with cache1.get("GET", "b") as fh:
+                assert b"b" == fh.read()
+
+            # hits are written in batches, and when the store is closed
+            cache1._store.TOUCH_INTERVAL = 0
+            with cache1.get("GET", "a"):
+                pass
+            atimes = dict(cache2._store._db.execute(
+                "SELECT hash, atime FROM entries").fetchall())
+            h = cache1._gen_hash(cache1._gen_key("GET", "a", None))
+            assert atimes[h] > atimes[cache1._gen_hash(
+                cache1._gen_key("GET", "b", None))]
+        finally:
+            cache1.close()
+            cache2.close()
+
+
+class TestContentCache(TestCache):
+    STORE = "content"
+
+    def test_dedup(self):
+        body = os.urandom(10000)
+        blobs = os.path.join(self.cacheDir, "blobs")
+        cache = Cache(self.cacheDir, store=self.STORE, max_entries=2)
+        cache.cache(self._response(body), "GET", "http://central/a.jar")
+        size = cache.stats()["size"]
+        cache.cache(self._response(body), "GET", "http://mirror/a.jar")
+        assert [hashlib.sha256(body).hexdigest()] == os.listdir(blobs)
+        assert cache.stats()["size"] < 2 * size
+
+        # evicting one url keeps the body of the other
+        cache.cache(self._response(b"pom"), "GET", "http://central/a.pom")
+        assert cache.get("GET", "http://central/a.jar") is None
+        with cache.get("GET", "http://mirror/a.jar") as fh:
+            assert body == fh.read()
+        assert 2 == len(os.listdir(blobs))
+
+        cache.invalidate("GET", "http://mirror/a.jar")
+        assert [hashlib.sha256(b"pom").hexdigest()] == os.listdir(blobs)
+        cache.close()
+
+        # the running total matches what is on disk
+        assert Cache(self.cacheDir, store=self.STORE).stats()["size"] == \
+            cache.stats()["size"]
+
+
+class TestNegativeCache(unittest.TestCase):
+    @mock.patch("pymaven.client.time")
+    def test_missing(self, _time):
+        _time.time.return_value = 1000.0
+        files = {}
+        path = "foo/bar/1.0/bar-1.0.pom"
+        with MavenServer(files) as server:
+            repo = HttpRepository(server.url + "/repo",
+                                  negative_cache=NegativeCache(ttl=30))
+            assert not repo.exists(path)
+            assert not repo.exists(path)
+            self.assertRaises(MissingPathError, repo.open, path)
+            assert 1 == len(server.requests)
+            assert 0 == repo._cache.stats()["entries"]
+
+            # published after the miss expired
+            files["/repo/" + path] = b"pom"
+            _time.time.return_value = 1031.0
+            assert repo.exists(path)
+            assert 2 == len(server.requests)
+            assert 1 == repo._cache.stats()["entries"]
+
+    @mock.patch("pymaven.client.time")
+    def test_persistent(self, _time):
+        _time.time.return_value = 1000.0
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "misses.json")
+            misses = NegativeCache(ttl=30, path=path)
+            misses.add("http://example.com/a")
+            _time.time.return_value = 1020.0
+            misses.add("http://example.com/b")
+            misses.save()
+
+            _time.time.return_value = 1040.0
+            misses = NegativeCache(ttl=30, path=path)
+            assert 1 == len(misses)
+            assert "http://example.com/a" not in misses
+            assert "http://example.com/b" in misses
+        finally:
+            shutil.rmtree(tmpdir)
+
+
 class TestLocalRepository(unittest.TestCase):
     @mock.patch("pymaven.client.os")
     def test_get_versions(self, _os):
-        _os.listdir.return_value = ["1.0-SNAPSHOT",
-                                    "2.0.0",
-                                    "3.0-SNAPSHOT",
-                                    "1.1",
-                                    "1.0",
-                                    ]
+        entries = []
+        for name in ("1.0-SNAPSHOT", "2.0.0", "3.0-SNAPSHOT", "1.1", "1.0"):
+            entry = mock.Mock()
+            entry.name = name
+            entry.is_dir.return_value = True
+            entries.append(entry)
+        _os.scandir.return_value.__enter__.return_value = entries
         repo = LocalRepository("/maven")
 
         for input, expected in (
@@ -200,6 +946,31 @@ class TestLocalRepository(unittest.TestCase):
             assert expected == actual, \
                 "LocalRepository.get_versions(%s)" % input
 
+    def test_listdir(self):
+        root = tempfile.mkdtemp()
+        try:
+            path = os.path.join(root, "foo", "bar")
+            for version in ("1.0", "2.0"):
+                os.makedirs(os.path.join(path, version))
+            # maven does not list the versions it resolves in its copy of
+            # the remote metadata
+            with open(os.path.join(path, "maven-metadata-central.xml"),
+                      "w") as fh:
+                fh.write(SIMPLE_METADATA)
+            with open(os.path.join(path, "_remote.repositories"), "w"):
+                pass
+
+            expected = [Artifact("foo:bar:2.0"), Artifact("foo:bar:1.0")]
+            repo = LocalRepository(root)
+            assert expected == repo.get_versions("foo:bar")
+
+            repo = LocalRepository(root, index=True)
+            with mock.patch("pymaven.client.os") as _os:
+                assert expected == repo.get_versions("foo:bar")
+            assert not _os.mock_calls
+        finally:
+            shutil.rmtree(root)
+
     def test_open(self):
         with tempfile.NamedTemporaryFile(delete=False) as tmp:
             tmp.write(b"the file\n")
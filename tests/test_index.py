@@ -0,0 +1,123 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from pymaven import Artifact
+from pymaven.client import LocalRepository
+from pymaven.client import MavenClient
+from pymaven.index import LocalIndex
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class TestLocalIndex(unittest.TestCase):
+    FILES = (
+        "foo/bar/1.0/bar-1.0.jar",
+        "foo/bar/1.0/bar-1.0.pom",
+        "foo/bar/2.0/bar-2.0.pom",
+        "foo/baz/1.0/baz-1.0.pom",
+        )
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for path in self.FILES:
+            self._add(path)
+        self._age()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _add(self, path):
+        path = os.path.join(self.root, path)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as fh:
+            fh.write("data")
+
+    def _age(self):
+        # an existing repository, untouched for a while
+        old = time.time() - 3600
+        for path, _, _ in os.walk(self.root):
+            os.utime(path, (old, old))
+
+    def test_lookup(self):
+        index = LocalIndex(self.root)
+        assert 7 == len(index)
+        assert index.exists("foo/bar")
+        assert index.exists("foo/bar/1.0/bar-1.0.jar")
+        assert not index.exists("foo/bar/2.0/bar-2.0.jar")
+        assert not index.exists("foo/qux")
+        assert ["bar", "baz"] == index.listdir("foo")
+        assert ["bar-1.0.jar", "bar-1.0.pom"] == index.listdir("foo/bar/1.0")
+        self.assertRaises(OSError, index.listdir, "foo/qux")
+
+    @mock.patch("pymaven.client.os")
+    def test_repository(self, _os):
+        repo = LocalRepository(self.root, index=LocalIndex(self.root))
+        assert [Artifact("foo:bar:2.0"), Artifact("foo:bar:1.0")] == \
+            repo.get_versions("foo:bar")
+        assert repo.exists("foo/baz/1.0/baz-1.0.pom")
+        assert not _os.path.exists.called
+        assert not _os.listdir.called
+
+    def test_refresh(self):
+        index = LocalIndex(self.root)
+        assert 0 == index.refresh()
+
+        self._add("foo/bar/3.0/bar-3.0.pom")
+        shutil.rmtree(os.path.join(self.root, "foo/baz"))
+        assert 0 < index.refresh()
+        assert ["1.0", "2.0", "3.0"] == index.listdir("foo/bar")
+        assert index.exists("foo/bar/3.0/bar-3.0.pom")
+        assert not index.exists("foo/baz/1.0")
+        assert ["bar"] == index.listdir("foo")
+
+        # unchanged directories are not read again
+        self._age()
+        index.refresh()
+        with mock.patch("os.scandir") as scandir:
+            assert 0 == index.refresh()
+            assert not scandir.called
+
+    def test_persistent(self):
+        index_dir = os.path.join(self.root, "index")
+        client = MavenClient(self.root, local_index_dir=index_dir)
+        assert ["1.0", "2.0"] == client._repos[0].listdir("foo/bar")
+        client.close()
+        assert 1 == len(os.listdir(index_dir))
+        path = os.path.join(index_dir, os.listdir(index_dir)[0])
+
+        self._add("foo/bar/3.0/bar-3.0.pom")
+        with mock.patch.object(LocalIndex, "build") as build:
+            index = LocalIndex(self.root, path)
+            assert not build.called
+        assert ["1.0", "2.0", "3.0"] == index.listdir("foo/bar")
+
+    def test_corrupt(self):
+        path = os.path.join(self.root, "index.json.gz")
+        with open(path, "w") as fh:
+            fh.write("not an index")
+        index = LocalIndex(self.root, path)
+        assert index.exists("foo/bar/2.0/bar-2.0.pom")
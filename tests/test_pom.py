@@ -15,6 +15,8 @@
 #
 
 
+import os
+import pickle
 import unittest
 
 from six import BytesIO
@@ -24,7 +26,14 @@ from pymaven import Artifact
 from pymaven import VersionRange as VR
 from pymaven.client import MavenClient
 from pymaven.client import Struct
+from pymaven.pom import POM
+from pymaven.pom import POM_CACHE
+from pymaven.pom import EffectiveModel
 from pymaven.pom import Pom
+from pymaven.pom import PropertyInterpolator
+from pymaven.pom import RawPom
+from pymaven.pom import parse_pom
+from pymaven.utils import LRUCache
 
 try:
     from unittest import mock
@@ -88,6 +97,47 @@ class TestPom(unittest.TestCase):
         assert "resolve" == pom._replace_properties("${resolveProp}")
         assert "resolve" == pom._replace_properties("${parentProp}")
 
+    def test_interpolator(self):
+        """Test PropertyInterpolator"""
+        interpolator = PropertyInterpolator({
+            "a": "${b}-${c}",
+            "b": " ${c}.b ",
+            "c": "c",
+            "name.c": "nested",
+            "self": "${self}",
+            "loop1": "${loop2}",
+            "loop2": "x${loop1}",
+            "broken": "${missing}",
+            "empty": None,
+            })
+        assert "c.b-c" == interpolator.get("a")
+        assert "nested" == interpolator.interpolate("${name.${c}}")
+        assert "<c> ${missing}" == interpolator.interpolate("<${c}> ${missing}")
+        assert "${self}" == interpolator.interpolate("${self}")
+        assert "${loop2}" == interpolator.interpolate("${loop2}")
+        assert "${broken}" == interpolator.interpolate("${broken}")
+        assert "${empty}" == interpolator.interpolate("${empty}")
+        assert "${c" == interpolator.interpolate("${c")
+        assert "c}" == interpolator.interpolate("${c}}")
+        assert interpolator.get("self") is None
+
+        interpolator = PropertyInterpolator(
+            {"c": "c", "home": "${env.HOME}/${c}"},
+            system_properties={"c": "system"},
+            environment={"HOME": "/home/user"})
+        assert "/home/user/system" == interpolator.get("home")
+        assert "system" == interpolator.interpolate("${c}")
+        assert "${env.PATH}" == interpolator.interpolate("${env.PATH}")
+
+    def test_system_properties(self):
+        """Test Pom properties with client system properties"""
+        client = self._mock_client(FOO_PARENT_1_POM)
+        client.system_properties = {"bazVersion": "system"}
+        client.environment = None
+        pom = Pom.fromstring("foo:bar:1", FOO_BAR_1_POM, client)
+        assert "system" == pom._replace_properties("${bazChild}")
+        assert "baz version string" == pom.properties["bazVersion"].strip()
+
     def test_find_relocations(self):
         """Test Pom._find_relocations()"""
         for args, coordinate in (
@@ -103,7 +153,7 @@ class TestPom(unittest.TestCase):
             assert relocations[0] == (("foo", "bar", VR("1")), True)
 
     def test_find_prereqs(self):
-        """Test Pom._find_prerequisites()"""
+        """Test prerequisites properties"""
         client = self._mock_client(PREREQUISITES_1)
         pom = Pom("foo:bar:1", client)
 
@@ -245,6 +295,167 @@ class TestPom(unittest.TestCase):
             assert expected == actual, \
                 "%s: Wanted %s, got %s" % (input, expected, actual)
 
+    def test_no_namespace(self):
+        """Test poms that do not declare the pom namespace"""
+        client = self._mock_client(FOO_PARENT_1_POM)
+        pom = Pom.fromstring("foo:old:1", FOO_OLD_1_POM, client)
+        assert "foo:parent:pom:1" == pom.parent.coordinate
+        assert "baz version string" == pom._replace_properties("${oldProp}")
+        assert "3.0" == pom.properties["prerequisites.maven"]
+        assert (("foo", "managed", "2.0"), True) in \
+            pom.dependencies["compile"]
+        assert (("foo", "profile", "1.0"), False) in \
+            pom.dependencies["test"]
+        assert (("foo", "new", VR("1")), True) in \
+            pom.dependencies["relocation"]
+        assert pom.raw == RawPom.fromstring(
+            "foo:old:1", FOO_OLD_1_POM.replace(
+                "<project>",
+                '<project xmlns="http://maven.apache.org/POM/4.0.0">'))
+
+    def test_raw(self):
+        """Test that streamed raw poms match the ones of parsed documents"""
+        for data in (COM_TEST_BUILD, COM_TEST_PROFILE_1, COM_TEST_PROFILE_2,
+                     COM_TEST_DEP, COM_TEST_BOM, COM_TEST_USE, IMPORT_DEPS_1,
+                     PREREQUISITES_1, RELOCATION_1, FOO_OLD_1_POM,
+                     FOO_PARENT_1_POM):
+            data = data.encode("utf-8")
+            assert RawPom.fromelement("a:b:1", parse_pom(BytesIO(data))) == \
+                RawPom.parse("a:b:1", BytesIO(data))
+
+        # plugin dependencies are not dependencies of the project
+        raw = RawPom.fromstring("com.test:build:1", COM_TEST_BUILD)
+        assert [("com.test", "dep", "1"), ("com.test", "profiled", "1")] == \
+            [dependency[:3] for dependency in raw.dependencies]
+
+        for data in ("<not a pom", "<parent/>"):
+            with self.assertRaises(ValueError):
+                RawPom.fromstring("a:b:1", data)
+
+    def test_raw_from_client(self):
+        """Test that poms of a client are read without keeping the document"""
+        client = self._mock_client(COM_TEST_BUILD, COM_TEST_BUILD)
+        pom = Pom("com.test:build:1", client)
+        assert set([(("com.test", "dep", "1"), True),
+                    (("com.test", "profiled", "1"), True)]) == \
+            pom.dependencies["compile"]
+        assert pom._pom_data is None
+        assert 1 == client.get_artifact.call_count
+
+        # the whole document is still there to read
+        assert pom.pom_data.find(POM + "build") is not None
+        assert 2 == client.get_artifact.call_count
+
+
+class TestEffectiveModel(unittest.TestCase):
+    _mock_client = TestPom._mock_client
+
+    def test_frompom(self):
+        client = self._mock_client(COM_TEST_USE, COM_TEST_BOM, COM_TEST_BOM2)
+        pom = Pom("com.test:use:1", client)
+        model = EffectiveModel.frompom(pom)
+        assert "com.test:use:1" == model.coordinate
+        assert model.parent is None
+        assert ("1.0.0", "import", False) == \
+            dict(model.dependency_management)[("com.test", "bom")]
+        assert set((tuple(str(p) for p in d), r)
+                   for d, r in pom.dependencies["compile"]) == \
+            set(model.get_dependencies("compile"))
+        assert () == model.get_dependencies("test")
+        self.assertRaises(AttributeError, setattr, model, "parent", "x")
+
+    def test_serialize(self):
+        client = self._mock_client(FOO_PARENT_1_POM)
+        pom = Pom.fromstring("foo:bar:1", FOO_BAR_1_POM, client)
+        model = EffectiveModel.frompom(pom)
+        assert "foo:parent:pom:1" == model.parent
+        assert "baz version string" == dict(model.properties)["bazChild"]
+
+        loaded = EffectiveModel.loads(model.dumps())
+        assert model == loaded
+        assert model.properties == loaded.properties
+        assert model == pickle.loads(pickle.dumps(model))
+
+        self.assertRaises(ValueError, EffectiveModel.loads, b"garbage")
+        self.assertRaises(ValueError, EffectiveModel.loads,
+                          pickle.dumps((EffectiveModel.FORMAT, os.getcwd)))
+
+
+class TestPomCache(unittest.TestCase):
+    def setUp(self):
+        POM_CACHE.clear()
+
+    def tearDown(self):
+        POM_CACHE.clear()
+
+    def test_shared_parent(self):
+        client = mock.MagicMock(spec=MavenClient)
+        a = mock.MagicMock(spec=Artifact)
+        a.contents = mock.MagicMock(spec=Struct)
+        a.contents.__enter__.side_effect = \
+            lambda: BytesIO(FOO_PARENT_1_POM.encode("utf-8"))
+        client.get_artifact.return_value = a
+
+        poms = [Pom.fromstring("foo:bar:1", FOO_BAR_1_POM, client)
+                for _ in range(3)]
+        for pom in poms:
+            assert "parent" == pom.parent.artifact_id
+            assert "1" == pom.properties["parent.version"]
+        assert poms[0].parent is poms[1].parent is poms[2].parent
+        client.get_artifact.assert_called_once_with("foo:parent:pom:1")
+        assert 1 == POM_CACHE.misses
+        assert 2 == POM_CACHE.hits
+
+        POM_CACHE.invalidate((client, "foo:parent:pom:1"))
+        pom = Pom.fromstring("foo:bar:1", FOO_BAR_1_POM, client)
+        assert pom.parent is not poms[0].parent
+
+    def test_per_client(self):
+        client1 = mock.MagicMock(spec=MavenClient)
+        client2 = mock.MagicMock(spec=MavenClient)
+        pom1 = Pom.fromcache("foo:bar:pom:1", client1)
+        assert pom1 is Pom.fromcache("foo:bar:pom:1", client1)
+        assert pom1 is not Pom.fromcache("foo:bar:pom:1", client2)
+        # snapshots change
+        assert Pom.fromcache("foo:bar:pom:1-SNAPSHOT", client1) is not \
+            Pom.fromcache("foo:bar:pom:1-SNAPSHOT", client1)
+        assert (client1, "foo:bar:pom:1-SNAPSHOT") not in POM_CACHE
+
+    def test_close(self):
+        client1 = MavenClient(os.getcwd())
+        client2 = MavenClient(os.getcwd())
+        Pom.fromcache("foo:bar:pom:1", client1)
+        Pom.fromcache("foo:baz:pom:1", client1)
+        Pom.fromcache("foo:bar:pom:1", client2)
+        client1.close()
+        assert (client1, "foo:bar:pom:1") not in POM_CACHE
+        assert (client1, "foo:baz:pom:1") not in POM_CACHE
+        assert (client2, "foo:bar:pom:1") in POM_CACHE
+        client2.close()
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache.get_or_create("a", lambda: 1)
+        cache.get_or_create("b", lambda: 2)
+        assert 1 == cache.get("a")
+        cache.get_or_create("c", lambda: 3)
+        assert "b" not in cache
+        assert 2 == len(cache)
+        assert 1 == cache.get("a")
+        assert cache.get("b") is None
+        assert {"size": 2, "maxsize": 2, "hits": 2, "misses": 4,
+                "hit_ratio": 2.0 / 6} == cache.stats()
+
+    def test_invalidate_if(self):
+        cache = LRUCache(4)
+        for key in (("x", 1), ("y", 2), ("x", 3)):
+            cache.get_or_create(key, lambda: key)
+        assert 2 == cache.invalidate_if(lambda key: key[0] == "x")
+        assert ("y", 2) in cache
+        assert 1 == len(cache)
+
 COM_TEST_PROFILE_1 = """\
 <project xmlns="http://maven.apache.org/POM/4.0.0" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
     xsi:schemaLocation="http://maven.apache.org/POM/4.0.0 http://maven.apache.org/xsd/maven-4.0.0.xsd">
@@ -280,6 +491,57 @@ COM_TEST_PROFILE_1 = """\
 </project>
 """
 
+COM_TEST_BUILD = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <modelVersion>4.0.0</modelVersion>
+  <groupId>com.test</groupId>
+  <artifactId>build</artifactId>
+  <version>1</version>
+  <description>dropped</description>
+  <dependencies>
+    <dependency>
+      <groupId>com.test</groupId>
+      <artifactId>dep</artifactId>
+      <version>1</version>
+    </dependency>
+  </dependencies>
+  <build>
+    <plugins>
+      <plugin>
+        <artifactId>maven-compiler-plugin</artifactId>
+        <configuration><profile>kept by nobody</profile></configuration>
+        <dependencies>
+          <dependency>
+            <groupId>com.test</groupId>
+            <artifactId>plugin-dep</artifactId>
+            <version>1</version>
+          </dependency>
+        </dependencies>
+      </plugin>
+    </plugins>
+  </build>
+  <profiles>
+    <profile>
+      <id>default</id>
+      <activation><activeByDefault>true</activeByDefault></activation>
+      <build><finalName>dropped</finalName></build>
+      <dependencies>
+        <dependency>
+          <groupId>com.test</groupId>
+          <artifactId>profiled</artifactId>
+          <version>1</version>
+        </dependency>
+      </dependencies>
+    </profile>
+  </profiles>
+  <distributionManagement>
+    <repository><id>releases</id></repository>
+    <relocation><groupId>com.test</groupId></relocation>
+  </distributionManagement>
+</project>
+"""
+
 COM_TEST_DEP = """\
 <project xmlns="http://maven.apache.org/POM/4.0.0" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
     xsi:schemaLocation="http://maven.apache.org/POM/4.0.0 http://maven.apache.org/xsd/maven-4.0.0.xsd">
@@ -625,6 +887,60 @@ FOO_BAR_1_POM = """\
 </project>
 """
 
+FOO_OLD_1_POM = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<project>
+    <parent>
+        <groupId>foo</groupId>
+        <artifactId>parent</artifactId>
+        <version>1</version>
+    </parent>
+    <artifactId>old</artifactId>
+    <prerequisites>
+        <maven>3.0</maven>
+    </prerequisites>
+    <properties>
+        <oldProp>${bazVersion}</oldProp>
+    </properties>
+    <dependencyManagement>
+        <dependencies>
+            <dependency>
+                <groupId>foo</groupId>
+                <artifactId>managed</artifactId>
+                <version>2.0</version>
+            </dependency>
+        </dependencies>
+    </dependencyManagement>
+    <dependencies>
+        <dependency>
+            <groupId>foo</groupId>
+            <artifactId>managed</artifactId>
+        </dependency>
+    </dependencies>
+    <distributionManagement>
+        <relocation>
+            <artifactId>new</artifactId>
+        </relocation>
+    </distributionManagement>
+    <profiles>
+        <profile>
+            <activation>
+                <activeByDefault>true</activeByDefault>
+            </activation>
+            <dependencies>
+                <dependency>
+                    <groupId>foo</groupId>
+                    <artifactId>profile</artifactId>
+                    <version>1.0</version>
+                    <scope>test</scope>
+                    <optional>true</optional>
+                </dependency>
+            </dependencies>
+        </profile>
+    </profiles>
+</project>
+"""
+
 FOO_PARENT_1_POM = """\
 <?xml version="1.0" encoding="UTF-8"?>
 <project xmlns="http://maven.apache.org/POM/4.0.0" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://maven.apache.org/POM/4.0.0 http://maven.apache.org/xsd/maven-4.0.0.xsd">
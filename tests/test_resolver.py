@@ -0,0 +1,154 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import unittest
+
+from pymaven import Artifact
+from pymaven.client import MavenClient
+from pymaven.errors import MissingArtifactError
+from pymaven.pom import Pom
+from pymaven.resolver import DependencyResolver
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def _pom(artifact, version, *dependencies):
+    deps = "".join(
+        "<dependency><groupId>com.test</groupId>"
+        "<artifactId>%s</artifactId><version>%s</version>%s</dependency>"
+        % (d[0], d[1], "<scope>%s</scope>" % d[2] if len(d) > 2 else "")
+        for d in dependencies)
+    return POM_TEMPLATE.format(artifact, version, deps)
+
+
+class TestDependencyResolver(unittest.TestCase):
+    def _mock_client(self, poms, versions=None):
+        client = mock.MagicMock(spec=MavenClient)
+
+        def get_metadata(coordinate):
+            if coordinate not in poms:
+                raise MissingArtifactError(coordinate)
+            return Pom.fromstring(coordinate, poms[coordinate], client)
+
+        def find_artifacts(coordinate):
+            return [Artifact("%s:%s" % (coordinate, v))
+                    for v in (versions or {}).get(coordinate, [])]
+
+        client.get_metadata.side_effect = get_metadata
+        client.find_artifacts.side_effect = find_artifacts
+        return client
+
+    def test_nearest_wins(self):
+        client = self._mock_client({
+            "com.test:a:pom:1": _pom("a", "1", ("b", "1"), ("c", "1")),
+            "com.test:b:pom:1": _pom("b", "1"),
+            "com.test:b:pom:2": _pom("b", "2", ("e", "1")),
+            "com.test:c:pom:1": _pom("c", "1", ("b", "2"), ("d", "1"),
+                                     ("t", "1", "test")),
+            "com.test:d:pom:1": _pom("d", "1", ("e", "2")),
+            "com.test:e:pom:2": _pom("e", "2", ("c", "2")),
+            })
+        graph = DependencyResolver(client, workers=4).resolve(
+            "com.test:a:1")
+
+        assert ["com.test:a:1", "com.test:b:1", "com.test:c:1",
+                "com.test:d:1", "com.test:e:2"] == list(graph)
+        assert 2 == graph.depths[("com.test", "d")]
+        assert [("com.test", "b"), ("com.test", "d")] == \
+            graph.edges[("com.test", "c")]
+        assert [("com.test", "c")] == graph.edges[("com.test", "e")]
+        assert not graph.missing
+
+    def test_declaration_order(self):
+        client = self._mock_client({
+            "com.test:a:pom:1": _pom("a", "1", ("z", "1"), ("m", "[1,)"),
+                                     ("b", "1")),
+            "com.test:z:pom:1": _pom("z", "1", ("m", "[1,)")),
+            "com.test:m:pom:2": _pom("m", "2"),
+            "com.test:b:pom:1": _pom("b", "1"),
+            }, {
+            "com.test:m": ["2", "1"],
+            })
+        graph = DependencyResolver(client, workers=4).resolve(
+            "com.test:a:1")
+        assert ["com.test:a:1", "com.test:z:1", "com.test:m:2",
+                "com.test:b:1"] == list(graph)
+        assert [("com.test", "z"), ("com.test", "m"), ("com.test", "b")] \
+            == graph.edges[("com.test", "a")]
+        # listed once, before the level was visited
+        client.find_artifacts.assert_called_once_with("com.test:m")
+
+    def test_version_range(self):
+        client = self._mock_client({
+            "com.test:a:pom:1": _pom("a", "1", ("b", "[1.0,2.0)"),
+                                     ("c", "latest.release")),
+            "com.test:b:pom:1.5": _pom("b", "1.5"),
+            "com.test:c:pom:1.0": _pom("c", "1.0"),
+            }, {
+            "com.test:b": ["2.0", "1.5", "1.0"],
+            "com.test:c": ["2.0-SNAPSHOT", "1.0"],
+            })
+        graph = DependencyResolver(client).resolve("com.test:a:1")
+        assert ["com.test:a:1", "com.test:b:1.5", "com.test:c:1.0"] == \
+            list(graph)
+
+    def test_range_mediation(self):
+        client = self._mock_client({
+            "com.test:a:pom:1": _pom("a", "1", ("b", "1"), ("c", "1")),
+            "com.test:b:pom:1": _pom("b", "1", ("d", "[1.0,2.0)")),
+            "com.test:c:pom:1": _pom("c", "1", ("d", "[1.2,)"),
+                                     ("e", "1")),
+            "com.test:d:pom:1.9": _pom("d", "1.9"),
+            "com.test:e:pom:1": _pom("e", "1", ("d", "[3.0,)")),
+            }, {
+            "com.test:d": ["3.0", "1.9", "1.5", "1.1"],
+            })
+        graph = DependencyResolver(client).resolve("com.test:a:1")
+        # d is declared by b and c at the same depth, the intersection of
+        # their ranges decides, and e is too far away to matter
+        assert ["com.test:a:1", "com.test:b:1", "com.test:c:1",
+                "com.test:d:1.9", "com.test:e:1"] == list(graph)
+        assert {("com.test", "d"): ["[1.0,2.0)", "[1.2,)", "[3.0,)"]} == \
+            graph.conflicts
+
+    def test_missing(self):
+        client = self._mock_client({
+            "com.test:a:pom:1": _pom("a", "1", ("b", "1"), ("c", "[3.0,)")),
+            }, {
+            "com.test:c": ["2.0", "1.0"],
+            })
+        graph = DependencyResolver(client).resolve("com.test:a:1",
+                                                   "com.test:z:1")
+        assert ["com.test:a:1"] == list(graph)
+        assert set([("com.test", "b", "1"), ("com.test", "c", "[3.0,)"),
+                    ("com.test", "z", "1")]) == graph.missing
+        assert [] == graph.edges[("com.test", "a")]
+
+
+POM_TEMPLATE = """\
+<project xmlns="http://maven.apache.org/POM/4.0.0" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    xsi:schemaLocation="http://maven.apache.org/POM/4.0.0 http://maven.apache.org/xsd/maven-4.0.0.xsd">
+    <modelVersion>4.0.0</modelVersion>
+    <groupId>com.test</groupId>
+    <artifactId>{0}</artifactId>
+    <version>{1}</version>
+    <dependencies>{2}</dependencies>
+</project>
+"""
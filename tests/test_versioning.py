@@ -18,13 +18,16 @@
 """
 Test version handling
 """
+import pickle
 import unittest
 
 from pymaven import Version
 from pymaven import VersionRange
 from pymaven.errors import RestrictionParseError
 from pymaven.errors import VersionRangeParseError
+from pymaven.versioning import INTERN_CACHE
 from pymaven.versioning import Restriction
+from pymaven.versioning import VersionIndex
 
 
 class TestRestriction(unittest.TestCase):
@@ -130,7 +133,7 @@ class TestRestriction(unittest.TestCase):
 
     def test_string_repr(self):
         for input in ("[1.0]", "[1.0,)", "[1.0,2.0]", "[1.0,2.0)", "(1.0,2.0)",
-                      "[,2.0]", "[,2.0)", "(,2.0)"):
+                      "[,2.0]", "[,2.0)", "(,2.0)", "[,)", "(,)"):
             actual = str(Restriction(input))
             assert input == actual, \
                 "Restriction(%s) == %s, wanted %s" % (input, actual, input)
@@ -159,6 +162,10 @@ class TestVersion(unittest.TestCase):
         assert V2 == v1, \
             "%s != %s" % (V2, v1)
 
+        # equal versions hash the same
+        assert hash(V1) == hash(V2), \
+            "hash(%s) != hash(%s)" % (V1, V2)
+
     def _assert_version_order(self, v1, v2):
         V1 = Version(v1)
         V2 = Version(v2)
@@ -334,6 +341,38 @@ class TestVersion(unittest.TestCase):
         self._assert_version_equal(u"1", u"1.0-0")
         self._assert_version_equal(u"1.0", u"1.0-0")
 
+    def test_sort_key(self):
+        """Version._key orders versions like Version._compare"""
+        versions = [Version(v) for v in (
+            "1.0.0-SNAPSHOT", "1.0.0-alpha-1", "1.0.0-beta1", "1.0.0.M2",
+            "1.0.0.RC1", "1.0.0.CR2", "1.0.0", "1.0.0.Final", "1.0.0.GA",
+            "1.0.0.RELEASE", "1.0.0.sp1",
+            "1.0.1", "1.0.1.0.RC", "1.0.1.0.1", "1.1-20150521.051651-3",
+            "1.1", "1.1.RC", "1.1-1", "2", "2.0.0.0", "2.0-incubating",
+            "10.0", "2.3.0.0.RC", "2.3.0", "3.11.10.0.RC", "3.11.10",
+            )]
+        for v1 in versions:
+            for v2 in versions:
+                expected = v1._compare(v1._parsed, v2._parsed)
+                expected = (expected > 0) - (expected < 0)
+                actual = (v1._key > v2._key) - (v1._key < v2._key)
+                assert expected == actual, \
+                    "%s <=> %s: wanted %d, got %d" % (v1, v2, expected, actual)
+
+        # maven's comparison is not transitive here, the key is
+        assert Version("1.0.0.RC1") < Version("1") < Version("1-1")
+        assert Version("1.0.0.RC1") < Version("1-1")
+
+        # nor for spring style release candidates and releases, the key
+        # orders them like maven resolves them, _compare does not
+        for candidate, release in (("1.0.0.RC1", "1.0.RELEASE"),
+                                   ("5.0.0.RC1", "5.0.RELEASE"),
+                                   ("1.0.RC1", "1.RELEASE")):
+            candidate, release = Version(candidate), Version(release)
+            assert candidate < release
+            assert candidate._key < release._key
+            assert 0 < candidate._compare(candidate._parsed, release._parsed)
+
     def test_version_compare(self):
         self._assert_version_order("1", "2")
         self._assert_version_order("1.5", "2")
@@ -556,3 +595,131 @@ class TestVersionRange(unittest.TestCase):
         vr = VersionRange("(1.0,2.0]")
         assert vr.match_version(versions) == "2.0"
         assert vr.match_version(versions[:3]) == "1.1"
+
+    def test_restrict(self):
+        for spec, other, expected, version in (
+                ("1.0", "[1.0,2.0)", "1.0", "1.0"),
+                ("1.0", "[2.0,3.0)", "[2.0,3.0)", None),
+                ("1.0", "2.0", "1.0", "1.0"),
+                ("[1.0,2.0)", "1.5", "[1.0,2.0)", "1.5"),
+                ("[1.0,2.0)", "[1.5,3.0]", "[1.5,2.0)", None),
+                ("[1.0,2.0),[3.0,4.0)", "[1.5,3.5]", "[1.5,2.0),[3.0,3.5]",
+                 None),
+                ("(,1.0],[1.0,)", "[1.0]", "[1.0]", None),
+                ("(,1.0),(1.0,)", "[,)", "(,1.0),(1.0,)", None),
+                ("[1.0,2.0]", "[2.0,3.0)", "[2.0]", None),
+                ("[1.0,2.0)", "[2.0,3.0)", "", None),
+                ("[1.0,2.0)", "[3.0,4.0)", "", None),
+                ):
+            vr = VersionRange(spec).restrict(VersionRange(other))
+            restrictions = ",".join(str(r) for r in vr.restrictions)
+            if vr.version is not None:
+                assert version == str(vr.version), \
+                    "%s restricted by %s recommends %s" % (spec, other,
+                                                           vr.version)
+            else:
+                assert version is None
+                assert expected == restrictions, \
+                    "%s restricted by %s is %s, wanted %s" % (
+                        spec, other, restrictions, expected)
+            assert vr.is_empty == (expected == "")
+
+        vr = VersionRange("1.5").restrict("[1.0,2.0)")
+        assert "1.5" in vr and "2.0" not in vr
+        assert vr == pickle.loads(pickle.dumps(vr))
+
+    def test_union(self):
+        for spec, other, expected in (
+                ("[1.0,2.0)", "[2.0,3.0]", "[1.0,3.0]"),
+                ("[1.0,2.0)", "(2.0,3.0]", "[1.0,2.0),(2.0,3.0]"),
+                ("[1.0,2.0]", "(1.5,3.0)", "[1.0,3.0)"),
+                ("(,1.0)", "[0.5,)", "(,)"),
+                ("[1.0],[3.0,4.0)", "[1.5,2.0]", "[1.0],[1.5,2.0],[3.0,4.0)"),
+                ("[1.0],[3.0,4.0)", "(1.0,3.0)", "[1.0,4.0)"),
+                ):
+            vr = VersionRange(spec)
+            actual = str(vr.union(VersionRange(other)))
+            assert expected == actual, "%s | %s is %s, wanted %s" % (
+                spec, other, actual, expected)
+
+
+class TestVersionIndex(unittest.TestCase):
+    VERSIONS = ("2.0", "1.0-SNAPSHOT", "1.0", "1.1", "1.0.0", "3.0-alpha-1",
+                "0.9", "2.1", "3.0", "1.5")
+
+    def test_matching(self):
+        index = VersionIndex(self.VERSIONS)
+        assert len(self.VERSIONS) == len(index)
+        for spec in ("[1.0,2.0)", "(1.0,2.0]", "[1.0]", "(,1.0]", "(,1.0)",
+                     "[1.1,)", "(1.1,)", "(,1.0),(1.0,2.0),[3.0,)", "[,)",
+                     "[4.0,)", "(,0.1]", "1.0"):
+            vr = VersionRange(spec)
+            expected = sorted((v for v in self.VERSIONS if v in vr),
+                              key=Version)
+            actual = index.matching(vr)
+            assert expected == actual, \
+                "%s: wanted %s, got %s" % (spec, expected, actual)
+            assert vr.match_version(index) == vr.match_version(self.VERSIONS)
+            if expected:
+                assert expected[-1] == index.highest(vr)
+            else:
+                assert index.highest(vr) is None
+
+    def test_items(self):
+        from pymaven import Artifact
+        artifacts = [Artifact("foo:bar:%s" % v) for v in self.VERSIONS]
+        index = VersionIndex(artifacts)
+        assert Artifact("foo:bar:3.0-alpha-1") == \
+            index.highest(VersionRange("[2.0,3.0)"))
+        assert Artifact("foo:bar:2.1") == \
+            index.highest(VersionRange("[2.0,3.0-alpha)"))
+        versions = [Version(v) for v in self.VERSIONS]
+        index = VersionIndex(versions)
+        assert index.highest(VersionRange("(,1.0)")) is versions[1]
+        assert index.highest(VersionRange("(,1.0-SNAPSHOT)")) is versions[6]
+        assert [versions[5], versions[8]] == \
+            index.matching(VersionRange("[3.0-alpha,)"))
+
+
+class TestInterning(unittest.TestCase):
+    def setUp(self):
+        INTERN_CACHE.clear()
+
+    def test_fromstring(self):
+        for cls, spec in ((Version, "1.0"),
+                          (VersionRange, "[1.0,2.0),(3.0,)"),
+                          (VersionRange, "1.0"),
+                          (Restriction, "[1.0,2.0)")):
+            obj = cls.fromstring(spec)
+            assert obj is cls.fromstring(spec)
+            assert obj == cls(spec)
+
+        # the restrictions and versions of ranges are shared too
+        vr = VersionRange.fromstring("[1.0,2.0)")
+        assert vr.restrictions[0] is Restriction.fromstring("[1.0,2.0)")
+        assert vr.restrictions[0].lower_bound is Version.fromstring("1.0")
+
+        stats = INTERN_CACHE.stats()
+        assert stats["size"] == len(INTERN_CACHE)
+        assert stats["hits"] > 0
+        assert 0 < INTERN_CACHE.hit_ratio < 1
+
+    def test_immutable(self):
+        v = Version.fromstring("1.0")
+        self.assertRaises(AttributeError, setattr, v, "_unparsed", "2.0")
+        self.assertRaises(AttributeError, setattr, v, "foo", "2.0")
+        vr = VersionRange.fromstring("[1.0,2.0)")
+        self.assertRaises(AttributeError, setattr, vr, "version", v)
+        self.assertRaises(AttributeError, delattr, vr, "restrictions")
+        r = vr.restrictions[0]
+        self.assertRaises(AttributeError, setattr, r, "lower_bound", v)
+
+    def test_pickle(self):
+        for obj in (Version.fromstring("1.0-SNAPSHOT"),
+                    VersionRange.fromstring("[1.0,2.0),(3.0,)"),
+                    VersionRange.fromstring("1.0"),
+                    Restriction.fromstring("(,1.0]"),
+                    Restriction.fromstring(None)):
+            restored = pickle.loads(pickle.dumps(obj))
+            assert restored == obj
+            assert restored is obj.__class__.fromstring(str(obj))